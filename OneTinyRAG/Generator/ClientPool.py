@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+生成器共用的长连接 HTTP 客户端池：
+    1. 按 generator.params 构造 httpx.Limits（最大连接数 / keep-alive 连接数 / 空闲过期时间）
+    2. PoolMetrics 统计请求数、并发中请求、峰值并发、失败数、耗时与平均 prompt token 数
+    3. 连接数（活跃 / 空闲）从 httpx 连接池读取，读取失败时返回 None
+    4. DualTransport：ollama 客户端只接受 httpx 参数，连接池以 transport 形式传入并由生成器持有、关闭
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+
+def make_limits(max_connections: int = 20, max_keepalive_connections: int = 10,
+                keepalive_expiry: float = 30.0):
+    import httpx
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+
+
+class DualTransport:
+    """
+    同时实现 httpx 同步 / 异步 transport 接口，各自持有一个按 limits 构造的连接池
+    ollama 的同步与异步客户端共用同一份 client_kwargs，传入同一个 DualTransport 即可各用各的连接池
+    """
+
+    def __init__(self, limits):
+        import httpx
+        self.sync_transport = httpx.HTTPTransport(limits=limits)
+        self.async_transport = httpx.AsyncHTTPTransport(limits=limits)
+
+    def handle_request(self, request):
+        return self.sync_transport.handle_request(request)
+
+    async def handle_async_request(self, request):
+        return await self.async_transport.handle_async_request(request)
+
+    def close(self) -> None:
+        self.sync_transport.close()
+
+    async def aclose(self) -> None:
+        await self.async_transport.aclose()
+
+
+def pool_connections(http_client) -> Optional[Dict[str, int]]:
+    """读取 httpx(同步/异步) 客户端或 transport 底层 httpcore 连接池的连接数（私有属性，尽力而为）"""
+    try:
+        transport = getattr(http_client, "_transport", http_client)
+        connections = list(transport._pool.connections)
+    except AttributeError:
+        return None
+    idle = sum(1 for conn in connections if conn.is_idle())
+    return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+
+class PoolMetrics:
+    """线程安全的请求计数器，同步与异步调用共用"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.prompt_tokens = 0
+
+    @contextmanager
+    def track(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            cost = time.perf_counter() - start
+            with self._lock:
+                self.in_flight -= 1
+                self.total_seconds += cost
+
+    def record_prompt(self, tokens: int) -> None:
+        with self._lock:
+            self.prompt_tokens += tokens
+
+    def snapshot(self, **connections: Any) -> Dict[str, Any]:
+        with self._lock:
+            done = self.requests - self.in_flight
+            return {
+                "requests": self.requests,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "errors": self.errors,
+                "avg_latency": round(self.total_seconds / done, 4) if done else None,
+                "avg_prompt_tokens": round(self.prompt_tokens / self.requests, 1) if self.requests else None,
+                **connections,
+            }
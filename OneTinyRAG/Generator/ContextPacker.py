@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+生成前的上下文组装：
+    1. 只取 chunk 正文，metadata 不进入 prompt
+    2. 按检索得分排序（无得分时保持检索顺序）
+    3. 去除重叠：同一文档的 span 区间只保留未被覆盖的部分；无 span 时按文本包含 / 首尾重叠去重
+    4. 按 token 预算装箱，超出预算即停止，并统计 prompt token 数
+"""
+
+import math
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from Tools.Tokens import TOKEN_PATTERN as _TOKEN_PATTERN
+
+
+def _estimate_weight(piece: str) -> int:
+    # BPE 下长英文单词 / 数字约 4 个字符一个 token
+    return max(1, math.ceil(len(piece) / 4)) if piece[0].isalnum() and piece.isascii() else 1
+
+
+class TokenCounter:
+    """token 计数：默认用正则估算，配置 tokenizer 时用 HuggingFace tokenizer 精确计数"""
+
+    def __init__(self, tokenizer: Optional[str] = None):
+        self.tokenizer = None
+        if tokenizer:
+            from transformers import AutoTokenizer
+            self.tokenizer = AutoTokenizer.from_pretrained(tokenizer)
+
+    def count(self, text: str) -> int:
+        if self.tokenizer is not None:
+            return len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+        return sum(_estimate_weight(m.group()) for m in _TOKEN_PATTERN.finditer(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """截断到不超过 max_tokens 个 token"""
+        if max_tokens <= 0:
+            return ""
+        if self.tokenizer is not None:
+            offsets = self.tokenizer(text, add_special_tokens=False,
+                                     return_offsets_mapping=True)["offset_mapping"]
+            return text if len(offsets) <= max_tokens else text[:offsets[max_tokens - 1][1]]
+        used = 0
+        for m in _TOKEN_PATTERN.finditer(text):
+            used += _estimate_weight(m.group())
+            if used > max_tokens:
+                return text[:m.start()]
+        return text
+
+
+@dataclass
+class PackedContext:
+    """组装结果：context 文本、完整 prompt 及统计信息"""
+    context: str
+    prompt: str
+    prompt_tokens: int
+    stats: Dict[str, Any] = field(default_factory=dict)
+
+
+def _chunk_text(chunk) -> str:
+    if isinstance(chunk, str):
+        return chunk
+    if isinstance(chunk, Mapping):  # dict 或 SpanChunk
+        return chunk.get("page_content", "")
+    return getattr(chunk, "page_content", str(chunk))
+
+
+def _chunk_score(chunk) -> Optional[float]:
+    if isinstance(chunk, Mapping):
+        scores = chunk.get("scores")
+        if isinstance(scores, Mapping) and scores.get("hybrid") is not None:
+            return float(scores["hybrid"])
+        if chunk.get("score") is not None:
+            return float(chunk["score"])
+    return None
+
+
+def _chunk_span(chunk) -> Optional[Tuple[Any, int, int]]:
+    """(文档标识, start, end)；同一文档的 chunk 共享 metadata 对象，无 doc_id 时以其作为文档标识"""
+    if not isinstance(chunk, Mapping) or chunk.get("span") is None:
+        return None
+    start, end = chunk["span"]
+    doc_key = chunk.get("doc_id")
+    doc_key = ("doc", doc_key) if doc_key is not None else ("meta", id(chunk.get("metadata")))
+    return doc_key, start, end
+
+
+def _uncovered(start: int, end: int, covered: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """[start, end) 中未被 covered 区间覆盖的部分"""
+    pieces, cursor = [], start
+    for c_start, c_end in sorted(covered):
+        if c_end <= cursor or c_start >= end:
+            continue
+        if c_start > cursor:
+            pieces.append((cursor, c_start))
+        cursor = max(cursor, c_end)
+    if cursor < end:
+        pieces.append((cursor, end))
+    return pieces
+
+
+class ContextPacker:
+    def __init__(
+        self,
+        max_tokens: int = 2048,        # 整个 prompt（模板 + 问题 + 上下文）的 token 预算
+        min_chunk_tokens: int = 8,     # 去重叠后剩余不足该 token 数的片段直接丢弃
+        min_overlap_chars: int = 20,   # 无 span 时判定首尾重叠的最短字符数
+        tokenizer: str = None,         # HuggingFace tokenizer 名称，默认正则估算
+    ):
+        self.max_tokens = max_tokens
+        self.min_chunk_tokens = min_chunk_tokens
+        self.min_overlap_chars = min_overlap_chars
+        self.counter = TokenCounter(tokenizer)
+
+    def _strip_text_overlap(self, text: str, selected: List[str]) -> str:
+        """无 span 时：被已选片段包含则丢弃，与已选片段首尾重叠的部分裁掉"""
+        k = self.min_overlap_chars
+        for other in selected:
+            if text in other:
+                return ""
+            if len(text) < k or len(other) < k:
+                continue
+            # other 的尾部 == text 的头部
+            pos = other.find(text[:k])
+            if pos >= 0 and text.startswith(other[pos:]):
+                text = text[len(other) - pos:]
+            # text 的尾部 == other 的头部
+            pos = text.find(other[:k])
+            if pos >= 0 and other.startswith(text[pos:]):
+                text = text[:pos]
+        return text
+
+    def _dedupe(self, chunks: List) -> Tuple[List[str], int]:
+        """返回去重叠后的文本片段与被裁剪/丢弃的 chunk 数"""
+        covered: Dict[Any, List[Tuple[int, int]]] = {}
+        texts, trimmed = [], 0
+        for chunk in chunks:
+            text = _chunk_text(chunk)
+            span = _chunk_span(chunk)
+            if span is not None:
+                doc_key, start, end = span
+                pieces = _uncovered(start, end, covered.get(doc_key, []))
+                covered.setdefault(doc_key, []).append((start, end))
+                new_text = "".join(text[p_start - start:p_end - start] for p_start, p_end in pieces)
+            else:
+                new_text = self._strip_text_overlap(text, texts)
+            new_text = new_text.strip()
+            if new_text != text.strip():
+                trimmed += 1
+            if new_text and self.counter.count(new_text) >= min(self.min_chunk_tokens, self.counter.count(text)):
+                texts.append(new_text)
+        return texts, trimmed
+
+    def pack(self, query: str, chunks: List, template: str) -> PackedContext:
+        """
+        Args:
+            query: 用户问题
+            chunks: 检索结果（str / dict / SpanChunk / Document）
+            template: 含 {query} 与 {context} 的 prompt 模板
+        """
+        # 得分降序；无得分的 chunk 保持检索器给出的顺序
+        order = sorted(range(len(chunks)),
+                       key=lambda i: (-(_chunk_score(chunks[i]) or 0.0), i))
+        texts, trimmed = self._dedupe([chunks[i] for i in order])
+
+        budget = self.max_tokens - self.counter.count(template.format(query=query, context=""))
+        parts, used, truncated = [], 0, False
+        for text in texts:
+            header = f"reference infomation {len(parts) + 1}: \n"
+            cost = self.counter.count(header + text)
+            if used + cost > budget:
+                if not parts:
+                    # 单个 chunk 就超出预算时截断，保证至少有一条参考
+                    text = self.counter.truncate(text, budget - used - self.counter.count(header))
+                    truncated = bool(text)
+                    if text:
+                        parts.append(header + text + "\n\n")
+                break
+            parts.append(header + text + "\n\n")
+            used += cost
+
+        context = "".join(parts)
+        prompt = template.format(query=query, context=context)
+        prompt_tokens = self.counter.count(prompt)
+        return PackedContext(
+            context=context,
+            prompt=prompt,
+            prompt_tokens=prompt_tokens,
+            stats={
+                "chunks_in": len(chunks),
+                "chunks_used": len(parts),
+                "chunks_trimmed": trimmed,
+                "chunks_over_budget": len(texts) - len(parts),
+                "truncated": truncated,
+                "prompt_tokens": prompt_tokens,
+                "max_tokens": self.max_tokens,
+            },
+        )
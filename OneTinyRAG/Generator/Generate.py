@@ -2,71 +2,572 @@
 # -*- coding: utf-8 -*-
 
 """
-    @Copyright: © 2025 Junqiang Huang. 
+    @Copyright: © 2025 Junqiang Huang.
     @Version: OneRAG v3
     @Author: Junqiang Huang
     @Time: 2025-06-12 23:41:04
-    
 
 """
 
-from abc import ABC, abstractmethod
-from typing import List
-from langchain.docstore.document import Document
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings, OpenAIEmbeddings
-from sentence_transformers import SentenceTransformer
-import faiss 
-import numpy as np 
-from openai import OpenAI
+import os
+import time
+import asyncio
+from typing import AsyncIterator, Iterator, List, Optional, Union
 from langchain_core.prompts import PromptTemplate
-from langchain_ollama import OllamaLLM
-from langchain.chains.combine_documents.stuff import StuffDocumentsChain
-from langchain.chains import RetrievalQA
+from .ClientPool import DualTransport, PoolMetrics, make_limits, pool_connections
+from .ContextPacker import ContextPacker, PackedContext
 
-class DeepseekAPIGenerator:
-    def __init__(self):
+
+class PackingMixin:
+    """检索结果 -> 按 token 预算组装的上下文；已组装的 PackedContext 直接复用"""
+    template = "{query}\n\n{context}"
+
+    def pack(self, query, retrievalChunks: Union[List, PackedContext]) -> PackedContext:
+        if isinstance(retrievalChunks, PackedContext):
+            return retrievalChunks
+        packed = self.packer.pack(query, retrievalChunks, self.template)
+        self.metrics.record_prompt(packed.prompt_tokens)
+        return packed
+
+
+class DeepseekAPIGenerator(PackingMixin):
+    """
+    OpenAI 兼容接口生成器：实例持有长连接的同步 / 异步 OpenAI 客户端，跨请求复用 keep-alive 连接
+    """
+    template = "根据参考文档回答问题：{query}\n\n{context}"
+
+    def __init__(
+        self,
+        api_key: str = None,                    # 默认读取环境变量 DEEPSEEK_API_KEY
+        base_url: str = "https://api.deepseek.com",
+        model: str = "deepseek-reasoner",
+        timeout: float = 120.0,
+        max_retries: int = 2,
+        max_connections: int = 20,              # 连接池上限，超出的请求排队等待空闲连接
+        max_keepalive_connections: int = 10,    # 保持的空闲长连接数
+        keepalive_expiry: float = 30.0,         # 空闲连接过期时间（秒）
+        context: dict = None,                   # ContextPacker 参数，如 {"max_tokens": 2048}
+    ):
         super().__init__()
+        import httpx
+        from openai import OpenAI
+
+        self.api_key = api_key or os.environ.get("DEEPSEEK_API_KEY", "sk-xxx")
+        self.base_url = base_url
+        self.llm_model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.limits = make_limits(max_connections, max_keepalive_connections, keepalive_expiry)
+        self.http_client = httpx.Client(limits=self.limits, timeout=timeout)
+        self.client = OpenAI(api_key=self.api_key, base_url=base_url, max_retries=max_retries,
+                             http_client=self.http_client)
+        self.async_http_client = None
+        self.async_client = None
+        self.metrics = PoolMetrics()
+        self.packer = ContextPacker(**(context or {}))
+
+    def _get_async_client(self):
+        # 异步客户端绑定事件循环，首次 agenerate 时再创建
+        if self.async_client is None:
+            import httpx
+            from openai import AsyncOpenAI
+            self.async_http_client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+            self.async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                            max_retries=self.max_retries, http_client=self.async_http_client)
+        return self.async_client
+
+    def _messages(self, query, retrievalChunks: Union[List, PackedContext]) -> List[dict]:
+        prompt = self.pack(query, retrievalChunks).prompt
+        return [{"role": "system", "content": ""},
+                {"role": "user", "content": prompt},]
+
     def generate(self, query, retrievalChunks: List[str]) -> str:
-        client = OpenAI(api_key="sk-xxx", base_url="https://api.deepseek.com")
-        llm_model = "deepseek-reasoner"
-        context = ""
-        for i, chunk in enumerate(retrievalChunks):
-            context += f"reference infomation {i+1}: \n{chunk}\n\n"
-
-        prompt = f"根据参考文档回答问题：{query}\n\n{context}"
-        messages=[{"role": "system", "content": ""},
-                {"role": "user", "content": f"{prompt}"},]
-
-        try:
-            response = client.chat.completions.create(
-                model=llm_model,
-                messages=messages,
-                stream=False
-            )
+        messages = self._messages(query, retrievalChunks)
+        try:
+            with self.metrics.track():
+                response = self.client.chat.completions.create(
+                    model=self.llm_model,
+                    messages=messages,
+                    stream=False
+                )
             return response
         except Exception as e:
             raise ValueError(f"DeepseekAPIGenerator_retrieval error: {e}")
 
+    async def agenerate(self, query, retrievalChunks: List[str]) -> str:
+        messages = self._messages(query, retrievalChunks)
+        client = self._get_async_client()
+        try:
+            with self.metrics.track():
+                response = await client.chat.completions.create(
+                    model=self.llm_model,
+                    messages=messages,
+                    stream=False
+                )
+            return response
+        except Exception as e:
+            raise ValueError(f"DeepseekAPIGenerator_retrieval error: {e}")
+
+    @staticmethod
+    def _delta_text(chunk) -> str:
+        if not chunk.choices:
+            return ""
+        return chunk.choices[0].delta.content or ""
+
+    def stream(self, query, retrievalChunks: List[str]) -> Iterator[str]:
+        """流式生成：逐段产出模型返回的文本增量"""
+        messages = self._messages(query, retrievalChunks)
+        try:
+            with self.metrics.track():
+                response = self.client.chat.completions.create(
+                    model=self.llm_model,
+                    messages=messages,
+                    stream=True
+                )
+                for chunk in response:
+                    text = self._delta_text(chunk)
+                    if text:
+                        yield text
+        except Exception as e:
+            raise ValueError(f"DeepseekAPIGenerator_stream error: {e}")
+
+    async def astream(self, query, retrievalChunks: List[str]) -> AsyncIterator[str]:
+        messages = self._messages(query, retrievalChunks)
+        client = self._get_async_client()
+        try:
+            with self.metrics.track():
+                response = await client.chat.completions.create(
+                    model=self.llm_model,
+                    messages=messages,
+                    stream=True
+                )
+                async for chunk in response:
+                    text = self._delta_text(chunk)
+                    if text:
+                        yield text
+        except Exception as e:
+            raise ValueError(f"DeepseekAPIGenerator_stream error: {e}")
+
+    def pool_stats(self) -> dict:
+        return self.metrics.snapshot(
+            connections=pool_connections(self.http_client),
+            async_connections=pool_connections(self.async_http_client) if self.async_http_client else None,
+        )
+
+    def close(self) -> None:
+        self.client.close()
+
+    async def aclose(self) -> None:
+        if self.async_client is not None:
+            await self.async_client.close()
 
-class DeepseekOllamaGenerator:
-    def __init__(self):
+
+class DeepseekOllamaGenerator(PackingMixin):
+    """
+    Ollama 生成器：OllamaLLM 与 prompt chain 在初始化时构建一次，底层 ollama 客户端的 httpx 连接池跨请求复用
+    """
+    template = "根据参考文档回答问题{query}\n\n{context}"
+
+    def __init__(
+        self,
+        model: str = "deepseek-r1:7b",
+        base_url: str = None,                   # 默认 OLLAMA_HOST 或 http://localhost:11434
+        timeout: float = 300.0,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        llm_kwargs: dict = None,                # 透传给 OllamaLLM，如 temperature / num_ctx
+        context: dict = None,                   # ContextPacker 参数，如 {"max_tokens": 2048}
+    ):
         super().__init__()
-    def generate(self, query, retrievalChunks: List[str]) -> str:
-        llm = OllamaLLM(model="deepseek-r1:7b")
-        context = ""
-        for i, chunk in enumerate(retrievalChunks):
-            context += f"reference infomation {i+1}: \n{chunk}\n\n"
+        from langchain_ollama import OllamaLLM
 
-        templatel_prompt = "根据参考文档回答问题{query}\n\n{context}"
+        self.limits = make_limits(max_connections, max_keepalive_connections, keepalive_expiry)
+        # client_kwargs 同时用于 ollama 的同步与异步客户端并透传给 httpx，连接池由 transport 持有
+        self.transport = DualTransport(self.limits)
+        self.llm = OllamaLLM(
+            model=model,
+            base_url=base_url,
+            client_kwargs={"transport": self.transport, "timeout": timeout},
+            **(llm_kwargs or {}),
+        )
         # 创建 RAG Prompt 模板（LCEL）
-        QA_PROMPT = PromptTemplate(input_variables=["query", "context"], template=templatel_prompt)
-        chain = QA_PROMPT | llm
+        QA_PROMPT = PromptTemplate(input_variables=["query", "context"], template=self.template)
+        self.chain = QA_PROMPT | self.llm
+        self.metrics = PoolMetrics()
+        self.packer = ContextPacker(**(context or {}))
 
+    def generate(self, query, retrievalChunks: List[str]) -> str:
+        context = self.pack(query, retrievalChunks).context
         try:
-            response = chain.invoke({"context": context, "query": query})
+            with self.metrics.track():
+                response = self.chain.invoke({"context": context, "query": query})
             return response
         except Exception as e:
-            raise ValueError(f"DeepseekAPIGenerator_retrieval error: {e}")
+            raise ValueError(f"DeepseekOllamaGenerator_retrieval error: {e}")
+
+    async def agenerate(self, query, retrievalChunks: List[str]) -> str:
+        context = self.pack(query, retrievalChunks).context
+        try:
+            with self.metrics.track():
+                response = await self.chain.ainvoke({"context": context, "query": query})
+            return response
+        except Exception as e:
+            raise ValueError(f"DeepseekOllamaGenerator_retrieval error: {e}")
+
+    def stream(self, query, retrievalChunks: List[str]) -> Iterator[str]:
+        """流式生成：逐段产出 Ollama 返回的 token"""
+        context = self.pack(query, retrievalChunks).context
+        try:
+            with self.metrics.track():
+                for token in self.chain.stream({"context": context, "query": query}):
+                    if token:
+                        yield token
+        except Exception as e:
+            raise ValueError(f"DeepseekOllamaGenerator_stream error: {e}")
+
+    async def astream(self, query, retrievalChunks: List[str]) -> AsyncIterator[str]:
+        context = self.pack(query, retrievalChunks).context
+        try:
+            with self.metrics.track():
+                async for token in self.chain.astream({"context": context, "query": query}):
+                    if token:
+                        yield token
+        except Exception as e:
+            raise ValueError(f"DeepseekOllamaGenerator_stream error: {e}")
+
+    def pool_stats(self) -> dict:
+        return self.metrics.snapshot(
+            connections=pool_connections(self.transport.sync_transport),
+            async_connections=pool_connections(self.transport.async_transport),
+        )
+
+    def close(self) -> None:
+        self.transport.close()
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class RoutedOllamaGenerator(PackingMixin):
+    """
+    多 Ollama 后端生成器：按 least_outstanding / ewma 选择后端，失败换后端重试，慢请求对冲
+        - 每个后端一个 OllamaLLM（各自的长连接池）
+        - max_attempts 为单次请求最多使用的后端数（含重试与对冲）
+        - hedge_after 秒内首个后端未返回（流式为首个 token 未到）时，向另一后端再发一次，取先返回者，另一个取消；
+          hedge_after="auto" 时取最近成功请求耗时的 p95，对冲数受 hedge_budget 比例限制
+        - 流式生成只在首个 token 之前重试 / 对冲，已开始输出后出错直接抛出
+    """
+    template = "根据参考文档回答问题{query}\n\n{context}"
+
+    def __init__(
+        self,
+        endpoints: List[str] = None,            # 如 ["http://gpu1:11434", "http://gpu2:11434"]，默认 OLLAMA_HOST
+        model: str = "deepseek-r1:7b",
+        policy: str = "least_outstanding",      # least_outstanding / ewma
+        max_attempts: int = 2,
+        hedge_after: Union[float, str] = None,  # 对冲等待时间（秒）或 "auto"，None 关闭对冲
+        hedge_budget: float = 0.1,              # 对冲请求占总请求数的上限比例
+        max_failures: int = 3,                  # 连续失败多少次摘除后端
+        eject_seconds: float = 10.0,            # 首次摘除时长，之后指数退避
+        timeout: float = 300.0,
+        max_connections: int = 20,              # 每个后端的连接池上限
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        llm_kwargs: dict = None,
+        context: dict = None,
+    ):
+        super().__init__()
+        from langchain_ollama import OllamaLLM
+        from .Router import Backend, BackendRouter
+
+        endpoints = endpoints or [os.environ.get("OLLAMA_HOST", "http://localhost:11434")]
+        self.limits = make_limits(max_connections, max_keepalive_connections, keepalive_expiry)
+        # 每个后端一个 transport（同步 + 异步连接池），与 backends 一一对应
+        self.transports = [DualTransport(self.limits) for _ in endpoints]
+        backends = [
+            Backend(url, OllamaLLM(model=model, base_url=url,
+                                   client_kwargs={"transport": transport, "timeout": timeout},
+                                   **(llm_kwargs or {})))
+            for url, transport in zip(endpoints, self.transports)
+        ]
+        self.router = BackendRouter(backends, policy=policy, max_failures=max_failures,
+                                    eject_seconds=eject_seconds, hedge_budget=hedge_budget)
+        self.max_attempts = max(1, max_attempts)
+        self.hedge_after = hedge_after
+        self._executor = None
+        self.metrics = PoolMetrics()
+        self.packer = ContextPacker(**(context or {}))
+
+    # ---------------- 单后端调用 ----------------
+    def _call(self, backend, prompt: str) -> str:
+        start = time.perf_counter()
+        try:
+            result = backend.client.invoke(prompt)
+        except Exception:
+            self.router.release(backend, time.perf_counter() - start, ok=False)
+            raise
+        self.router.release(backend, time.perf_counter() - start)
+        return result
+
+    async def _acall(self, backend, prompt: str) -> str:
+        start = time.perf_counter()
+        try:
+            result = await backend.client.ainvoke(prompt)
+        except asyncio.CancelledError:
+            self.router.release(backend, None)
+            raise
+        except Exception:
+            self.router.release(backend, time.perf_counter() - start, ok=False)
+            raise
+        self.router.release(backend, time.perf_counter() - start)
+        return result
+
+    async def _astream_one(self, backend, prompt: str) -> AsyncIterator[str]:
+        start, ok = time.perf_counter(), None
+        try:
+            async for token in backend.client.astream(prompt):
+                if token:
+                    yield token
+            ok = True
+        except Exception:
+            ok = False
+            raise
+        finally:
+            # ok 为 None：被取消 / 提前关闭（对冲落败或客户端断开）
+            self.router.release(backend, None if ok is None else time.perf_counter() - start, ok=bool(ok))
+
+    # ---------------- 重试与对冲 ----------------
+    def _hedge_timeout(self, tried: List, hedged: bool) -> Optional[float]:
+        if self.hedge_after is None or hedged or len(tried) >= self.max_attempts:
+            return None
+        if self.hedge_after == "auto":
+            return self.router.latency_quantile(0.95)
+        return self.hedge_after
+
+    def _exhausted(self, last_error: Optional[BaseException]) -> BaseException:
+        """重试用尽：返回最后一次失败的异常；一次都没能发出（没有可用后端）时返回明确的 RuntimeError"""
+        self.router.count("exhausted")
+        if last_error is None:
+            return RuntimeError("RoutedOllamaGenerator -> No backend available")
+        return last_error
+
+    def _start_hedge(self, launch):
+        """预算内向另一后端发出对冲请求，返回新任务；超出预算或无可用后端时返回 None"""
+        if not self.router.allow_hedge():
+            return None
+        return launch()
+
+    def _routed(self, prompt: str) -> str:
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.limits.max_connections or 20,
+                                                thread_name_prefix="ollama-router")
+        tried, pending, hedges, hedged, last_error = [], set(), set(), False, None
+        self.router.count("routed")
+
+        def launch():
+            backend = self.router.acquire(exclude=tried)
+            if backend is None:
+                return None
+            tried.append(backend)
+            future = self._executor.submit(self._call, backend, prompt)
+            pending.add(future)
+            return future
+
+        launch()
+        while pending:
+            done, _ = wait(pending, timeout=self._hedge_timeout(tried, hedged), return_when=FIRST_COMPLETED)
+            if not done:
+                # 对冲：已发出的请求仍未返回，向另一后端再发一次（线程中的落败请求无法取消，返回后丢弃）
+                hedged = True
+                future = self._start_hedge(launch)
+                if future is not None:
+                    hedges.add(future)
+                continue
+            for future in done:
+                pending.discard(future)
+                if future.exception() is None:
+                    if future in hedges:
+                        self.router.count("hedge_wins")
+                    return future.result()
+                last_error = future.exception()
+            if not pending and len(tried) < self.max_attempts and launch() is not None:
+                self.router.count("retries")
+        raise self._exhausted(last_error)
+
+    async def _arouted(self, prompt: str) -> str:
+        tried, pending, hedges, hedged, last_error = [], set(), set(), False, None
+        self.router.count("routed")
+
+        def launch() -> Optional[asyncio.Task]:
+            backend = self.router.acquire(exclude=tried)
+            if backend is None:
+                return None
+            tried.append(backend)
+            task = asyncio.ensure_future(self._acall(backend, prompt))
+            pending.add(task)
+            return task
+
+        launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=self._hedge_timeout(tried, hedged),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    task = self._start_hedge(launch)
+                    if task is not None:
+                        hedges.add(task)
+                    continue
+                for task in done:
+                    pending.discard(task)
+                    if task.exception() is None:
+                        if task in hedges:
+                            self.router.count("hedge_wins")
+                        return task.result()
+                    last_error = task.exception()
+                if not pending and len(tried) < self.max_attempts and launch() is not None:
+                    self.router.count("retries")
+            raise self._exhausted(last_error)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _astream_routed(self, prompt: str) -> AsyncIterator[str]:
+        tried, attempts, hedges, hedged, last_error = [], {}, set(), False, None  # attempts: 首 token 任务 -> 流
+        self.router.count("routed")
+
+        def launch() -> Optional[asyncio.Task]:
+            backend = self.router.acquire(exclude=tried)
+            if backend is None:
+                return None
+            tried.append(backend)
+            tokens = self._astream_one(backend, prompt)
+            task = asyncio.ensure_future(tokens.__anext__())
+            attempts[task] = tokens
+            return task
+
+        launch()
+        winner = None
+        try:
+            while attempts and winner is None:
+                done, _ = await asyncio.wait(attempts, timeout=self._hedge_timeout(tried, hedged),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    task = self._start_hedge(launch)
+                    if task is not None:
+                        hedges.add(task)
+                    continue
+                for task in done:
+                    error = task.exception()
+                    if error is None or isinstance(error, StopAsyncIteration):
+                        winner = task
+                        break
+                    attempts.pop(task)
+                    last_error = error
+                if winner is None and not attempts and len(tried) < self.max_attempts and launch() is not None:
+                    self.router.count("retries")
+        finally:
+            # 关闭落败的流：未完成的首 token 任务取消后，流内 finally 归还后端计数
+            losers = [task for task in attempts if task is not winner]
+            for task in losers:
+                task.cancel()
+            for task in losers:
+                try:
+                    await task
+                except BaseException:
+                    pass
+                await attempts[task].aclose()
+
+        if winner is None:
+            raise self._exhausted(last_error)
+        if winner in hedges:
+            self.router.count("hedge_wins")
+        tokens = attempts[winner]
+        try:
+            if winner.exception() is None:
+                yield winner.result()
+                async for token in tokens:
+                    yield token
+        finally:
+            await tokens.aclose()
+
+    # ---------------- 生成接口 ----------------
+    def generate(self, query, retrievalChunks: List[str]) -> str:
+        prompt = self.pack(query, retrievalChunks).prompt
+        try:
+            with self.metrics.track():
+                return self._routed(prompt)
+        except Exception as e:
+            raise ValueError(f"RoutedOllamaGenerator_retrieval error: {e}")
+
+    async def agenerate(self, query, retrievalChunks: List[str]) -> str:
+        prompt = self.pack(query, retrievalChunks).prompt
+        try:
+            with self.metrics.track():
+                return await self._arouted(prompt)
+        except Exception as e:
+            raise ValueError(f"RoutedOllamaGenerator_retrieval error: {e}")
+
+    def stream(self, query, retrievalChunks: List[str]) -> Iterator[str]:
+        """同步流式：首个 token 之前失败则换后端重试，不做对冲"""
+        prompt = self.pack(query, retrievalChunks).prompt
+        tried, last_error = [], None
+        self.router.count("routed")
+        try:
+            with self.metrics.track():
+                while len(tried) < self.max_attempts:
+                    backend = self.router.acquire(exclude=tried)
+                    if backend is None:
+                        break
+                    if tried:
+                        self.router.count("retries")
+                    tried.append(backend)
+                    start, started, ok = time.perf_counter(), False, None
+                    try:
+                        for token in backend.client.stream(prompt):
+                            if token:
+                                started = True
+                                yield token
+                        ok = True
+                    except Exception as e:
+                        ok = False
+                        if started:
+                            raise
+                        last_error = e
+                    finally:
+                        self.router.release(backend, None if ok is None else time.perf_counter() - start,
+                                            ok=bool(ok))
+                    if ok:
+                        return
+                raise self._exhausted(last_error)
+        except Exception as e:
+            raise ValueError(f"RoutedOllamaGenerator_stream error: {e}")
+
+    async def astream(self, query, retrievalChunks: List[str]) -> AsyncIterator[str]:
+        prompt = self.pack(query, retrievalChunks).prompt
+        try:
+            with self.metrics.track():
+                async for token in self._astream_routed(prompt):
+                    yield token
+        except Exception as e:
+            raise ValueError(f"RoutedOllamaGenerator_stream error: {e}")
+
+    def pool_stats(self) -> dict:
+        routing = self.router.snapshot()
+        for info, transport in zip(routing["backends"], self.transports):
+            info["connections"] = pool_connections(transport.sync_transport)
+            info["async_connections"] = pool_connections(transport.async_transport)
+        return self.metrics.snapshot(routing=routing)
 
+    def close(self) -> None:
+        for transport in self.transports:
+            transport.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
 
+    async def aclose(self) -> None:
+        for transport in self.transports:
+            await transport.aclose()
@@ -8,21 +8,10 @@
     @Time: 2025-06-08 23:33:50
 """
 
-from abc import ABC, abstractmethod
-from typing import List
-from langchain.docstore.document import Document
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings, OpenAIEmbeddings
-from sentence_transformers import SentenceTransformer
-import faiss 
-import numpy as np 
-from openai import OpenAI
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from langchain_community.llms import Ollama
-from langchain.chains.combine_documents.stuff import StuffDocumentsChain
-from langchain.chains import RetrievalQA
+import asyncio
+from typing import Any, AsyncIterator, Iterator, List, Optional, Sequence, Tuple
 from Mappers.Mappers import GENERATOR_MAPPING
+from .ContextPacker import PackedContext
 
 
 
@@ -43,9 +32,16 @@ class Generator:
         generator = GENERATOR_MAPPING.get(generator_type)
         if generator is None:
             raise ValueError(f"Indexer_get_chunker -> Unknown chunker type: {generator_type}")
-        # 实例化
-        return generator()
+        # 实例化：连接池 / 模型 / 超时等从 generator.params 读取
+        return generator(**params)
+
+    def pack(self, query, retrievalChunks: List) -> PackedContext:
+        """按 token 预算组装上下文，结果可直接传给 generate / stream，并用于统计 prompt token"""
+        return self.Generator.pack(query, self._text_chunks(retrievalChunks))
+
     def generate(self, query, retrievalChunks: List[str]) -> str:
+        if isinstance(retrievalChunks, PackedContext):
+            return self.Generator.generate(query, retrievalChunks)
         [txtChunks, imgChunks] = retrievalChunks
 
         if txtChunks is not None and imgChunks is None:
@@ -57,4 +53,83 @@ class Generator:
         else:
             raise ValueError(f"Generator_generate -> Unknown generator type: {self.Generator}")
 
+    async def agenerate(self, query, retrievalChunks: List[str]) -> str:
+        """异步版本，复用生成器的异步连接池，不阻塞事件循环"""
+        return await self.Generator.agenerate(query, self._text_chunks(retrievalChunks))
+
+    async def agenerate_batch(self, queries: Sequence[str], retrievalChunks_list: Sequence[List],
+                              concurrency: int = 4) -> AsyncIterator[Tuple[int, Any, Optional[Exception]]]:
+        """
+        批量生成：最多 concurrency 个请求同时进行，按完成顺序产出 (下标, 结果, 异常)
+
+        Args:
+            queries: 问题列表
+            retrievalChunks_list: 与 queries 对齐的检索结果（Retriever.retrieval_batch 的输出）
+            concurrency: 同时进行的生成数
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i: int, query, retrievalChunks):
+            async with semaphore:
+                try:
+                    return i, await self.agenerate(query, retrievalChunks), None
+                except Exception as e:
+                    return i, None, e
+
+        tasks = [asyncio.ensure_future(one(i, query, chunks))
+                 for i, (query, chunks) in enumerate(zip(queries, retrievalChunks_list))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def generate_batch(self, queries: Sequence[str], retrievalChunks_list: Sequence[List],
+                       concurrency: int = 4) -> List[Any]:
+        """
+        同步版本：返回与 queries 对齐的结果列表，失败项为异常对象
+        内部用 asyncio.run 执行，不能在运行中的事件循环（FastAPI 接口、notebook）里调用，此时请使用 agenerate_batch
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("Generator.generate_batch -> Called from a running event loop, "
+                               "use `async for ... in agenerate_batch(...)` instead")
+
+        async def collect():
+            results = [None] * len(queries)
+            async for i, result, error in self.agenerate_batch(queries, retrievalChunks_list, concurrency):
+                results[i] = error if error is not None else result
+            return results
+        return asyncio.run(collect())
+
+    def _text_chunks(self, retrievalChunks: List) -> List:
+        if isinstance(retrievalChunks, PackedContext):
+            return retrievalChunks
+        [txtChunks, imgChunks] = retrievalChunks
+        if txtChunks is not None and imgChunks is None:
+            return txtChunks
+        raise ValueError(f"Generator_stream -> Unsupported retrieval chunks for: {self.Generator}")
+
+    def stream(self, query, retrievalChunks: List[str]) -> Iterator[str]:
+        """流式生成：token 到达即产出"""
+        return self.Generator.stream(query, self._text_chunks(retrievalChunks))
+
+    def astream(self, query, retrievalChunks: List[str]) -> AsyncIterator[str]:
+        return self.Generator.astream(query, self._text_chunks(retrievalChunks))
+
+    def pool_stats(self) -> dict:
+        return self.Generator.pool_stats() if hasattr(self.Generator, "pool_stats") else {}
+
+    def close(self) -> None:
+        if hasattr(self.Generator, "close"):
+            self.Generator.close()
+
+    async def aclose(self) -> None:
+        if hasattr(self.Generator, "aclose"):
+            await self.Generator.aclose()
+
 
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多后端路由：在多个 LLM 服务地址之间分配请求
+    1. 负载均衡：least_outstanding（进行中请求最少）或 ewma（延迟 EWMA × (进行中 + 1)，未观测的后端优先试探）
+    2. 被动健康检查：连续失败 max_failures 次即摘除，摘除时长按连续摘除次数指数退避；
+       到期后放行一次试探请求，成功即恢复，失败立即再次摘除
+    3. 全部后端被摘除时放行最早恢复的一个，不直接拒绝
+    4. 选中即计入进行中请求，释放时记录耗时与成败；被取消的请求（对冲落败）不影响延迟与健康状态
+    5. 对冲预算：对冲请求数不超过总请求数的 hedge_budget 比例，避免后端整体变慢时对冲放大负载
+"""
+
+import time
+import itertools
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class Backend:
+    """单个后端的地址、客户端与运行状态"""
+
+    def __init__(self, url: str, client: Any):
+        self.url = url
+        self.client = client
+        self.outstanding = 0
+        self.ewma: Optional[float] = None
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.strikes = 0               # 连续摘除次数，决定退避时长
+        self.ejected_until = 0.0
+        self.ejections = 0
+
+    def available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+
+class BackendRouter:
+    POLICIES = ("least_outstanding", "ewma")
+
+    def __init__(
+        self,
+        backends: List[Backend],
+        policy: str = "least_outstanding",
+        ewma_alpha: float = 0.3,
+        max_failures: int = 3,           # 连续失败多少次摘除
+        eject_seconds: float = 10.0,     # 首次摘除时长
+        max_eject_seconds: float = 120.0,
+        hedge_budget: float = 0.1,       # 对冲请求占总请求数的上限比例
+    ):
+        if not backends:
+            raise ValueError("BackendRouter -> At least one backend is required")
+        if policy not in self.POLICIES:
+            raise ValueError(f"BackendRouter -> Unknown policy: {policy}, expected one of {self.POLICIES}")
+        self.backends = backends
+        self.policy = policy
+        self.ewma_alpha = ewma_alpha
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.hedge_budget = hedge_budget
+        self._lock = threading.Lock()
+        self._rr = itertools.count()     # 得分相同时轮转，避免总落在第一个后端
+        self._latencies = deque(maxlen=256)
+        self.stats = {"routed": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "hedges_denied": 0, "exhausted": 0}
+
+    def _score(self, backend: Backend):
+        if self.policy == "least_outstanding":
+            return backend.outstanding, backend.ewma or 0.0
+        return (backend.ewma or 0.0) * (backend.outstanding + 1), backend.outstanding
+
+    def acquire(self, exclude: Iterable[Backend] = ()) -> Optional[Backend]:
+        """选出一个后端并计入进行中请求；exclude 之外没有后端时返回 None"""
+        with self._lock:
+            candidates = [b for b in self.backends if b not in exclude]
+            if not candidates:
+                return None
+            now = time.monotonic()
+            healthy = [b for b in candidates if b.available(now)]
+            if healthy:
+                offset = next(self._rr) % len(healthy)
+                backend = min(healthy[offset:] + healthy[:offset], key=self._score)
+            else:
+                backend = min(candidates, key=lambda b: b.ejected_until)
+            backend.outstanding += 1
+            return backend
+
+    def release(self, backend: Backend, seconds: Optional[float], ok: bool = True) -> None:
+        """seconds 为 None 表示请求被取消，只归还进行中计数"""
+        with self._lock:
+            backend.outstanding -= 1
+            if seconds is None:
+                return
+            backend.requests += 1
+            if ok:
+                backend.consecutive_failures = 0
+                backend.strikes = 0
+                backend.ejected_until = 0.0
+                backend.ewma = seconds if backend.ewma is None else \
+                    backend.ewma + self.ewma_alpha * (seconds - backend.ewma)
+                self._latencies.append(seconds)
+                return
+            backend.failures += 1
+            backend.consecutive_failures += 1
+            # 已在摘除期内的后端，摘除前发出的请求陆续失败不再重复计入
+            if backend.consecutive_failures >= self.max_failures and backend.available(time.monotonic()):
+                duration = min(self.max_eject_seconds, self.eject_seconds * 2 ** backend.strikes)
+                backend.ejected_until = time.monotonic() + duration
+                backend.strikes += 1
+                backend.ejections += 1
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def latency_quantile(self, q: float) -> Optional[float]:
+        """最近成功请求耗时的分位数，样本不足时返回 None"""
+        with self._lock:
+            if len(self._latencies) < 20:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def allow_hedge(self) -> bool:
+        with self._lock:
+            if self.stats["hedges"] + 1 > self.hedge_budget * max(self.stats["routed"], 1):
+                self.stats["hedges_denied"] += 1
+                return False
+            self.stats["hedges"] += 1
+            return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "policy": self.policy,
+                **self.stats,
+                "backends": [{
+                    "url": b.url,
+                    "healthy": b.available(now),
+                    "outstanding": b.outstanding,
+                    "latency_ewma": round(b.ewma, 4) if b.ewma is not None else None,
+                    "requests": b.requests,
+                    "failures": b.failures,
+                    "ejections": b.ejections,
+                    "ejected_for": round(max(0.0, b.ejected_until - now), 1),
+                } for b in self.backends],
+            }
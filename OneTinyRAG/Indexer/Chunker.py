@@ -9,7 +9,13 @@
 """
 
 from pathlib import Path
-from typing import List, Optional
+import re
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from collections.abc import Mapping
+from typing import Iterator, List, Optional, Tuple
 from typing import Union
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter, CharacterTextSplitter
@@ -30,28 +36,46 @@ try:
 except Exception:
     nltk = None
     sent_tokenize = None
-import jieba
 from tqdm import tqdm
+from .SpanChunk import DocumentBuffer, SpanChunk, locate_spans
+from Tools.Tokens import TOKEN_PATTERN as _TOKEN_PATTERN
 
 class Chunker(ABC):
+    # 为 True 时 chunk() 只遍历一次输入，可直接接收 DataProcessor(stream=True) 的生成器
+    streaming = False
+
     @abstractmethod
     def chunk(self, docs: List[Document]) -> List[Document]:
         pass
 
 class RecursiveChunker(Chunker):
-    def __init__(self, chunk_size=512, chunk_overlap=64):
+    def __init__(self, chunk_size=512, chunk_overlap=64, span_mode: bool = False):
         self.splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             separators=["\n\n## ", "\n# ", "\n\n", "\n", "。", "!", "?", " ", ""]
         )
+        # span_mode: chunk 以 (doc_id, start, end) 指向共享缓冲区，不复制文本
+        self.span_mode = span_mode
+        self.buffer = DocumentBuffer()
+
+    def span_chunks(self, text: str, metadata: dict = None) -> List[SpanChunk]:
+        doc_id = self.buffer.add(text)
+        spans = locate_spans(text, self.splitter.split_text(text))
+        return [SpanChunk(self.buffer, doc_id, start, end, metadata) for start, end in spans]
 
     def chunk(self, docs: Union[str, List[str], List[Document]]) -> List:
         if isinstance(docs, str):
+            if self.span_mode:
+                return self.span_chunks(docs)
             return self.splitter.split_text(docs)
-        elif isinstance(docs, List[str]): 
+        elif isinstance(docs, list) and all(isinstance(doc, str) for doc in docs):
+            if self.span_mode:
+                return [self.span_chunks(doc) for doc in docs]
             return [self.splitter.split_text(doc) for doc in docs]
-        elif isinstance(docs, List[Document]):
+        elif isinstance(docs, list) and all(isinstance(doc, Document) for doc in docs):
+            if self.span_mode:
+                return [chunk for doc in docs for chunk in self.span_chunks(doc.page_content, doc.metadata.copy())]
             chunked_docs = []
             for doc in docs:
                 chunks = self.splitter.split_text(doc.page_content)
@@ -74,6 +98,25 @@ class TokenChunker(Chunker):
     def chunk(self, docs: List[Document]) -> List[Document]:
         return self.splitter.split_documents(docs)
 
+# 超长文档切窗时优先使用的边界字符
+_WINDOW_BOUNDARIES = ("\n", "。", "！", "？", ".", "!", "?")
+
+
+def _split_windows(text: str, window_size: int) -> List[str]:
+    """把超长文本切成不超过 window_size 的窗口，尽量在换行/句末处切分"""
+    windows = []
+    start = 0
+    while start < len(text):
+        end = min(start + window_size, len(text))
+        if end < len(text):
+            cut = max(text.rfind(ch, start, end) for ch in _WINDOW_BOUNDARIES)
+            if cut > start:
+                end = cut + 1
+        windows.append(text[start:end])
+        start = end
+    return windows
+
+
 class SemanticSpacyChunker(Chunker):
     """基于spaCy语义分析的智能文本分割器"""
     def __init__(
@@ -81,23 +124,63 @@ class SemanticSpacyChunker(Chunker):
         model_name: str = "zh_core_web_sm",  # 支持中英文模型切换： en_core_web_sm
         chunk_size: int = 512,
         chunk_overlap: int = 64,
-        use_sentence: bool = True  # 是否基于句子拆分
+        use_sentence: bool = True,  # 是否基于句子拆分
+        batch_size: int = 64,       # nlp.pipe 的 batch 大小
+        n_process: int = 1,         # nlp.pipe 的进程数
+        window_size: int = 100000   # 超长文档按窗口切分，避免触发 spaCy max_length
     ):
         if spacy is None:
             raise ImportError("spaCy 未安装或加载失败，无法使用 SemanticSpacyChunker")
-        self.nlp = spacy.load(model_name)
+        self.nlp = self._load_pipeline(model_name, use_sentence)
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.use_sentence = use_sentence
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.window_size = min(window_size, self.nlp.max_length)
 
-    def split_text(self, text: str) -> List[str]:
-        """核心分割逻辑"""
-        doc = self.nlp(text)
-        
-        if self.use_sentence:
-            sentences = [sent.text for sent in doc.sents]
+    @staticmethod
+    def _load_pipeline(model_name: str, use_sentence: bool):
+        """只保留分句所需组件：优先 senter，其次 parser，都没有则加 sentencizer"""
+        nlp = spacy.load(model_name)
+        if not use_sentence:
+            keep = set()                      # 仅需 tokenizer
+        elif "senter" in nlp.component_names:
+            keep = {"senter"}
+        elif "parser" in nlp.component_names:
+            keep = {"parser", "tok2vec", "transformer"}
         else:
-            sentences = [token.text for token in doc if not token.is_punct]
+            keep = set()
+            nlp.add_pipe("sentencizer")
+            keep.add("sentencizer")
+        for name in nlp.component_names:
+            if name in keep:
+                nlp.enable_pipe(name)
+            else:
+                nlp.disable_pipe(name)
+        return nlp
+
+    def _units(self, doc) -> List[str]:
+        if self.use_sentence:
+            return [sent.text for sent in doc.sents]
+        return [token.text for token in doc if not token.is_punct]
+
+    def _iter_units(self, texts: List[str]):
+        """批量 nlp.pipe，超长文档先切窗；按输入顺序产出每篇文档的句子/词块列表"""
+        windows = []
+        owners = []
+        for idx, text in enumerate(texts):
+            for window in _split_windows(text, self.window_size):
+                windows.append(window)
+                owners.append(idx)
+
+        units = [[] for _ in texts]
+        docs = self.nlp.pipe(windows, batch_size=self.batch_size, n_process=self.n_process)
+        for owner, doc in zip(owners, docs):
+            units[owner] += self._units(doc)
+        return units
+
+    def _merge(self, sentences: List[str]) -> List[str]:
         # 动态合并句子/词块
         current_chunk = []
         current_length = 0
@@ -133,10 +216,40 @@ class SemanticSpacyChunker(Chunker):
             chunks.append("".join(current_chunk))
         return chunks
 
-    def chunk(self, docs: str) -> List[str]:
-        """文档处理入口"""
-        chunks = self.split_text(docs)
-        return chunks
+    def split_text(self, text: str) -> List[str]:
+        """核心分割逻辑"""
+        return self._merge(self._iter_units([text])[0])
+
+    def chunk(self, docs: Union[str, List[str], List[Document]]) -> List:
+        """文档处理入口：文档列表走批量 nlp.pipe"""
+        if isinstance(docs, str):
+            return self.split_text(docs)
+        texts = [doc.page_content if isinstance(doc, Document) else doc for doc in docs]
+        chunked_docs = []
+        for doc, units in zip(docs, self._iter_units(texts)):
+            chunks = self._merge(units)
+            if isinstance(doc, Document):
+                chunked_docs += [Document(page_content=chunk, metadata=doc.metadata.copy()) for chunk in chunks]
+            else:
+                chunked_docs += chunks
+        return chunked_docs
+
+# 中文句末标点（可连续出现，如 "！？"、"……"），句末后的右引号/右括号归入本句
+_CHINESE_SENTENCE_PATTERN = re.compile(r"[^。！？；…]+(?:[。！？；…]+[”’」』）)]*|$)|[。！？；…]+[”’」』）)]*")
+
+
+@lru_cache(maxsize=None)
+def _ensure_punkt() -> bool:
+    """每个进程只检查/下载一次 punkt_tab，之后 sent_tokenize 走 NLTK 自带的 tokenizer 缓存"""
+    try:
+        nltk.data.find('tokenizers/punkt_tab')
+    except LookupError:
+        try:
+            nltk.download('punkt_tab', quiet=True)
+        except Exception:
+            return False
+    return True
+
 
 class SemanticNLTKChunker(Chunker):
     """基于NLTK的智能语义分块器，支持中英文混合文本"""
@@ -145,36 +258,22 @@ class SemanticNLTKChunker(Chunker):
         chunk_size: int = 500,
         chunk_overlap: int = 50,
         language: str = "chinese",
-        use_jieba: bool = True
+        use_jieba: bool = True,   # 兼容旧配置：为 False 时中文不分句
+        n_jobs: int = 1           # 文档列表并行分块的进程数
     ):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.language = language
         self.use_jieba = use_jieba
+        self.n_jobs = n_jobs
 
-        # 初始化中文分词器
-        if self.language == "chinese" and self.use_jieba:
-            jieba.initialize()
         if self.language != "chinese" and nltk is None:
             raise ImportError("NLTK 未安装或加载失败，无法使用英文分句功能")
     def _chinese_sentence_split(self, text: str) -> List[str]:
-        """基于结巴分词的智能分句"""
+        """基于预编译正则的中文分句，无需整段分词"""
         if not self.use_jieba:
             return [text]
-            
-        delimiters = {'。', '！', '？', '；', '…'}
-        sentences = []
-        buffer = []
-        
-        for word in jieba.cut(text):
-            buffer.append(word)
-            if word in delimiters:
-                sentences.append(''.join(buffer))
-                buffer = []
-        
-        if buffer:  # 处理末尾无标点的句子
-            sentences.append(''.join(buffer))
-        return sentences
+        return _CHINESE_SENTENCE_PATTERN.findall(text)
 
     def split_text(self, text: str) -> List[str]:
         """多语言分句逻辑"""
@@ -184,10 +283,7 @@ class SemanticNLTKChunker(Chunker):
         else:
             if nltk is None or sent_tokenize is None:
                 raise ImportError("NLTK 未安装或加载失败，无法进行英文分句")
-            try:
-                nltk.download('punkt_tab')
-            except Exception:
-                pass
+            _ensure_punkt()
             sentences = sent_tokenize(text, language=self.language)
 
         """动态合并句子并保留字符重叠"""
@@ -224,99 +320,282 @@ class SemanticNLTKChunker(Chunker):
             chunks.append("".join(current_chunk))
         return chunks
 
-    def chunk(self, docs: str) -> List[str]:
-        chunks = self.split_text(docs)
-        return chunks
+    def chunk(self, docs: Union[str, List[str], List[Document]]) -> List:
+        if isinstance(docs, str):
+            return self.split_text(docs)
+        texts = [doc.page_content if isinstance(doc, Document) else doc for doc in docs]
+        if self.n_jobs > 1 and len(texts) > 1:
+            # 与 EmbeddingPool 一致使用 spawn，避免在已加载 torch 的进程里 fork
+            ctx = mp.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=self.n_jobs, mp_context=ctx) as executor:
+                chunksize = max(1, len(texts) // (self.n_jobs * 4))
+                results = list(executor.map(self.split_text, texts, chunksize=chunksize))
+        else:
+            results = [self.split_text(text) for text in texts]
+
+        chunked_docs = []
+        for doc, chunks in zip(docs, results):
+            if isinstance(doc, Document):
+                chunked_docs += [Document(page_content=chunk, metadata=doc.metadata.copy()) for chunk in chunks]
+            else:
+                chunked_docs += chunks
+        return chunked_docs
 
 class TxtAbstractChunker(Chunker):
     def __init__(self, chunk_size=512, chunk_overlap=64):
         pass
 
 class PaperChunker(Chunker):
-    def __init__(self, chunk_size=512, chunk_overlap=64):
+    def __init__(self, chunk_size=512, chunk_overlap=64, span_mode: bool = False):
         self.splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             separators=["\n\n## ", "\n# ", "\n\n", "\n", "。", "!", "?", " ", ""]
         )
         self.metaData = None
+        self.span_mode = span_mode
+        self.buffer = DocumentBuffer()
 
-    def chunk(self, docs: str) -> List:
-        return self.splitter.split_text(docs)
+    def chunk(self, docs: Union[str, List[str], List[Document]]) -> List:
+        if not isinstance(docs, str):
+            # stream=True 的逐段 Document：逐段切分
+            return [chunk for doc in docs
+                    for chunk in self.chunk(doc.page_content if isinstance(doc, Document) else doc)]
+        pieces = self.splitter.split_text(docs)
+        if not self.span_mode:
+            return pieces
+        doc_id = self.buffer.add(docs)
+        return [SpanChunk(self.buffer, doc_id, start, end) for start, end in locate_spans(docs, pieces)]
 
 class MetaDataChunker(Chunker):
+    streaming = True
+
     def __init__(
         self,
         chunk_size: int = 256,
         language: str = "english",
-    
+        span_mode: bool = False,   # chunk 以 (doc_id, start, end) 指向共享缓冲区，不复制文本
     ):
         self.chunk_size = chunk_size
         self.language = language
-        self.separators = ["\n", "。", "!", "?", ".", "?", "!", "," ]
+        self.span_mode = span_mode
+        self.buffer = DocumentBuffer()
+        self.separators = ["\n", "。", "！", "？", "!", "?", ".", ",", "，"]
+        self._separator_set = set(self.separators)
 
     # 所有的特例都塞这里
     def exceptprocess(self, text:str)->bool:
         if text == '':
             return False
-        if len(text.split(' ')) < self.chunk_size + 1 and text[-1] not in self.separators:
+        # 不以分隔符结尾且不超过 chunk_size 个 token 的短文本（标题、残句）跳过；
+        # 与 split_text 同样按 _TOKEN_PATTERN 计数，最多数到 chunk_size + 1 个即可判断
+        if text[-1] not in self._separator_set and \
+                sum(1 for _ in islice(_TOKEN_PATTERN.finditer(text), self.chunk_size + 1)) <= self.chunk_size:
             return False
         return True
     def check(self, chunk: Document) -> bool:
-        return len(chunk["page_content"].split(' ')) <= self.chunk_size + 1 
+        return len(_TOKEN_PATTERN.findall(chunk["page_content"])) <= self.chunk_size
 
- 
-    def split_text(self, texts: List[Document]) -> List[str]:
+    def iter_spans(self, text: str) -> Iterator[Tuple[int, int]]:
         """
-        1. 多语言分句逻辑
-        2. 默认每句话不会超过chunk_size
-        3. 按照句子级别进行分块
+        单遍扫描，按 token 计数，惰性产出 chunk 的字符区间 [start, end)
+        1. 优先在窗口内最后一个分隔符处切分
+        2. 窗口内没有分隔符时在 chunk_size 处硬切，保证每个 chunk 不超过 chunk_size 个 token
         """
-        chunks = []
+        chunk_start = None      # 当前 chunk 起点
+        count = 0               # 当前 chunk 的 token 数
+        last_end = 0            # 上一个 token 的结束位置
+        boundary_end = None     # 当前 chunk 内最后一个分隔符的结束位置
+        boundary_count = 0      # 截至该分隔符的 token 数
+        boundary_next = None    # 分隔符后第一个 token 的起点（下一个 chunk 的起点）
+        after_boundary = False
+
+        for match in _TOKEN_PATTERN.finditer(text):
+            start, end = match.span()
+            if chunk_start is None:
+                chunk_start = start
+            if after_boundary:
+                boundary_next = start
+                after_boundary = False
+            count += 1
+
+            if count > self.chunk_size:
+                if boundary_end is not None:
+                    yield chunk_start, boundary_end
+                    chunk_start = boundary_next
+                    count -= boundary_count
+                else:
+                    yield chunk_start, last_end
+                    chunk_start = start
+                    count = 1
+                boundary_end = None
+
+            if match.group() in self._separator_set:
+                boundary_end = end
+                boundary_count = count
+                after_boundary = True
+            last_end = end
+
+        if chunk_start is not None and count > 0:
+            yield chunk_start, last_end
+
+    def iter_chunks(self, texts) -> Iterator[dict]:
+        """惰性产出 chunk：{"page_content", "metadata", "span"}，span_mode 下为 SpanChunk"""
         # 兼容字符串输入：统一转为单元素列表
         if isinstance(texts, str):
             texts = [Document(page_content=texts, metadata={})]
-        
-        for sent in tqdm(texts, desc="Processing Chunker"):
-            metadata = sent.metadata if isinstance(sent, Document) else {}
-            sent = sent.page_content if isinstance(sent, Document) else sent
-            if self.exceptprocess(sent) == False:
+
+        for doc in tqdm(texts, desc="Processing Chunker"):
+            metadata = doc.metadata if isinstance(doc, Document) else {}
+            text = doc.page_content if isinstance(doc, Document) else doc
+            if self.exceptprocess(text) == False:
                 continue
-            sent = sent.split(' ')
-            sent_len = len(sent)
-            current_chunk = ""
-            fast = 0
-            slow = 0
-            spt_index = []
-            
-            for fast in range(0, sent_len):
-                if len(sent[fast]) and sent[fast][-1] in self.separators:
-                    spt_index.append(fast)
-                elif fast - slow + 1 > self.chunk_size:
-                    tmp = []
-                    for i in spt_index[::-1]:
-                        if i - slow + 1 <= self.chunk_size:
-                            ck = " ".join(sent[slow:i+1])
-                            current_chunk = {
-                                "page_content": ck,
-                                "metadata": metadata
-                            }
-                            chunks.append(current_chunk)
-                            slow = i + 1
-                            spt_index = tmp[::-1]
-                            break
-                        tmp.append(i)
-            if slow <= fast:
-                ck = " ".join(sent[slow:fast+1])
-                current_chunk = {
-                    "page_content": ck,
-                    "metadata": metadata
+            if self.span_mode:
+                doc_id = self.buffer.add(text)
+                for start, end in self.iter_spans(text):
+                    yield SpanChunk(self.buffer, doc_id, start, end, metadata)
+                continue
+            for start, end in self.iter_spans(text):
+                yield {
+                    "page_content": text[start:end],
+                    "metadata": metadata,
+                    "span": (start, end),
                 }
-                chunks.append(current_chunk)
-        return chunks
+
+    def split_text(self, texts: List[Document]) -> List[dict]:
+        """
+        1. 多语言分句逻辑，长度按 token（中文按字、英文按词）计算
+        2. 线性时间单遍扫描
+        3. 按照句子级别进行分块
+        """
+        return list(self.iter_chunks(texts))
 
     
     def chunk(self, docs) -> List[str]:
         chunks = self.split_text(docs)
         return chunks
 
+
+class EmbedderTokenChunker(Chunker):
+    """
+    按向量模型自身 tokenizer 计量的分块器：保证每个 chunk 不超过模型窗口，避免被模型静默截断
+    """
+    streaming = True
+
+    def __init__(
+        self,
+        model_name: str = "BAAI/bge-small-zh-v1.5",  # 与 embedder 使用同一个模型
+        max_tokens: int = None,     # chunk token 上限（含特殊 token），默认取模型窗口
+        chunk_overlap: int = 32,    # 相邻 chunk 重叠的 token 数
+        batch_size: int = 256,      # 批量分词的文档数
+        span_mode: bool = False,
+    ):
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+        if not self.tokenizer.is_fast:
+            raise ValueError(f"EmbedderTokenChunker -> {model_name} has no fast tokenizer")
+        model_max = self.tokenizer.model_max_length
+        if model_max is None or model_max > 100000:  # 未配置时 transformers 返回一个极大值
+            model_max = 512
+        self.max_tokens = min(max_tokens or model_max, model_max)
+        # 预留 [CLS]/[SEP] 等特殊 token
+        self.budget = self.max_tokens - self.tokenizer.num_special_tokens_to_add()
+        self.chunk_overlap = min(chunk_overlap, self.budget // 2)
+        self.batch_size = batch_size
+        self.span_mode = span_mode
+        self.buffer = DocumentBuffer()
+        self.boundaries = set("\n。！？；.!?;")
+        self.stats = {}
+
+    def _token_windows(self, text: str, offsets: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """在 token 序列上滑窗，优先在窗口后半段的句末处切分，返回字符区间"""
+        spans = []
+        n = len(offsets)
+        start = 0
+        while start < n:
+            end = min(start + self.budget, n)
+            if end < n:
+                for k in range(end - 1, start + self.budget // 2, -1):
+                    tok_end = offsets[k][1]
+                    if tok_end > 0 and text[tok_end - 1] in self.boundaries:
+                        end = k + 1
+                        break
+            spans.append((offsets[start][0], offsets[end - 1][1]))
+            if end >= n:
+                break
+            start = max(end - self.chunk_overlap, start + 1)
+        return spans
+
+    def _fit(self, text: str, span: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """重新分词校验；子串边界处 token 合并方式不同导致超窗时，按比例收缩后重切"""
+        start, end = span
+        length = len(self.tokenizer(text[start:end], add_special_tokens=True)["input_ids"])
+        if length <= self.max_tokens or end - start <= 1:
+            return [span]
+        cut = start + max(1, (end - start) * self.max_tokens // length - 1)
+        return self._fit(text, (start, cut)) + self._fit(text, (cut, end))
+
+    def measure_truncation(self, chunks: List) -> dict:
+        """统计任意 chunk 列表在本模型窗口下会被截断的 token，可用来对比其他分块器"""
+        texts = [c if isinstance(c, str) else c["page_content"] if isinstance(c, Mapping) else c.page_content
+                 for c in chunks]
+        truncated_chunks = 0
+        truncated_tokens = 0
+        total_tokens = 0
+        for i in range(0, len(texts), self.batch_size):
+            encoded = self.tokenizer(texts[i:i + self.batch_size], add_special_tokens=True)
+            for ids in encoded["input_ids"]:
+                total_tokens += len(ids)
+                if len(ids) > self.max_tokens:
+                    truncated_chunks += 1
+                    truncated_tokens += len(ids) - self.max_tokens
+        return {
+            "chunks": len(texts),
+            "tokens": total_tokens,
+            "truncated_chunks": truncated_chunks,
+            "truncated_tokens": truncated_tokens,
+            "truncated_ratio": truncated_tokens / max(total_tokens, 1),
+        }
+
+    def iter_chunks(self, docs) -> Iterator:
+        if isinstance(docs, str):
+            docs = [Document(page_content=docs, metadata={})]
+        documents = 0
+        chunks = 0
+        doc_tokens = 0
+        avoided = 0
+        # 按 batch_size 从任意可迭代对象（含生成器）中取批，只遍历一次
+        docs = iter(docs)
+        for batch in tqdm(iter(lambda: list(islice(docs, self.batch_size)), []), desc="Processing Chunker"):
+            texts = [doc.page_content if isinstance(doc, Document) else doc for doc in batch]
+            encoded = self.tokenizer(texts, add_special_tokens=False, return_offsets_mapping=True)
+            for doc, text, offsets in zip(batch, texts, encoded["offset_mapping"]):
+                if not offsets:
+                    continue
+                documents += 1
+                doc_tokens += len(offsets)
+                # 整篇送入模型时会被截掉的 token 数
+                avoided += max(0, len(offsets) - self.budget)
+                metadata = doc.metadata if isinstance(doc, Document) else {}
+                doc_id = self.buffer.add(text) if self.span_mode else None
+                for window in self._token_windows(text, offsets):
+                    for start, end in self._fit(text, window):
+                        chunks += 1
+                        if self.span_mode:
+                            yield SpanChunk(self.buffer, doc_id, start, end, metadata)
+                        else:
+                            yield {"page_content": text[start:end], "metadata": metadata, "span": (start, end)}
+        self.stats = {
+            "documents": documents,
+            "chunks": chunks,
+            "document_tokens": doc_tokens,
+            "max_tokens": self.max_tokens,
+            "truncation_avoided_tokens": avoided,
+        }
+        print(f"✂️ EmbedderTokenChunker: {documents} 篇文档 → {chunks} 个 chunk (≤{self.max_tokens} tokens)，"
+              f"避免截断 {avoided}/{doc_tokens} tokens")
+
+    def chunk(self, docs) -> List:
+        return list(self.iter_chunks(docs))
+
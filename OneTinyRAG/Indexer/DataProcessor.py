@@ -8,8 +8,16 @@
     @Time: 2025-06-08 23:33:50
 """
 
+import io
+import os
+import mmap
+import time
+import threading
+import multiprocessing as mp
+from collections import deque
+from multiprocessing.connection import wait
 from abc import ABC, abstractmethod
-from typing import List, Union
+from typing import Iterator, List, Union
 from langchain.docstore.document import Document
 import re
 from typing import Tuple, List
@@ -18,6 +26,11 @@ import random
 from PIL import Image
 from PyPDF2 import PdfReader
 import json
+try:
+    import orjson  # 可选的高速 JSON 后端
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 from langchain_community.document_loaders import (
     PyPDFLoader, 
     PDFPlumberLoader,
@@ -33,48 +46,223 @@ from langchain_community.document_loaders import (
 
 class DataProcessor(ABC):
     """Base class for all data processors"""
+    # 解析逻辑变化时递增，使 ParseCache 中的旧结果失效
+    version = 1
+
     @abstractmethod
     def process(self, file_path: str) -> List[Document]:
         pass
 
+# worker 进程内缓存已打开的 PdfReader，避免每页重复解析 xref
+_PDF_READERS = {}
+
+
+def _extract_pdf_page(file_path: str, page_index: int) -> str:
+    reader = _PDF_READERS.get(file_path)
+    if reader is None:
+        # worker 跨文件常驻，只保留当前文件的 reader
+        _PDF_READERS.clear()
+        reader = _PDF_READERS[file_path] = PdfReader(file_path)
+    return reader.pages[page_index].extract_text() or ''
+
+
+def _pdf_page_worker(conn) -> None:
+    """常驻 worker：逐个接收 (文件, 页码) 并回传 (是否成功, 文本或错误信息)"""
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        try:
+            conn.send((True, _extract_pdf_page(*task)))
+        except Exception as e:
+            conn.send((False, str(e)))
+
+
+class _PageWorker:
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_pdf_page_worker, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.page = None      # 正在处理的页码，None 表示空闲
+        self.started = 0.0    # 该页开始处理的时间
+
+    def stop(self) -> None:
+        self.process.terminate()
+        self.process.join()
+        self.conn.close()
+
+
+class _PageWorkerPool:
+    """
+    跨文件复用的页提取进程池，进程数有上限且按需创建
+        1. 每个 worker 同时只处理一页，超时从该页派发给 worker 时开始计算
+        2. 超时或崩溃的 worker 立即 terminate，并补一个新进程，不会被卡住的页长期占用
+        3. 同一时间只服务一个文件，其余调用方排队
+    """
+
+    def __init__(self, processes: int):
+        # worker 只做纯 python 的 PDF 解析，fork 即可，避免 spawn 重新导入主模块
+        methods = mp.get_all_start_methods()
+        self.ctx = mp.get_context("fork" if "fork" in methods else "spawn")
+        self.processes = processes
+        self.workers: List[_PageWorker] = []
+        self._lock = threading.Lock()
+
+    def _replace(self, index: int) -> None:
+        self.workers[index].stop()
+        self.workers[index] = _PageWorker(self.ctx)
+
+    def extract(self, file_path: str, num_pages: int, timeout: float) -> Iterator[Tuple[int, str, str]]:
+        """按完成顺序产出 (页码, 文本, 错误信息)，成功时错误信息为 None"""
+        with self._lock:
+            while len(self.workers) < min(self.processes, num_pages):
+                self.workers.append(_PageWorker(self.ctx))
+            pages = deque(range(num_pages))
+            try:
+                while True:
+                    for worker in self.workers:
+                        if worker.page is None and pages:
+                            worker.page, worker.started = pages.popleft(), time.monotonic()
+                            worker.conn.send((file_path, worker.page))
+                    busy = [worker for worker in self.workers if worker.page is not None]
+                    if not busy:
+                        return
+                    deadline = min(worker.started for worker in busy) + timeout
+                    ready = wait([worker.conn for worker in busy], timeout=max(0.0, deadline - time.monotonic()))
+                    for i, worker in enumerate(self.workers):
+                        page = worker.page
+                        if page is None:
+                            continue
+                        if worker.conn in ready:
+                            worker.page = None
+                            try:
+                                ok, payload = worker.conn.recv()
+                            except EOFError:
+                                self._replace(i)
+                                yield page, '', "worker 异常退出"
+                                continue
+                            yield (page, payload, None) if ok else (page, '', payload)
+                        elif time.monotonic() - worker.started >= timeout and not worker.conn.poll():
+                            self._replace(i)
+                            yield page, '', "超时"
+            finally:
+                # 调用方提前停止迭代时，回收仍在处理页面的 worker
+                for i, worker in enumerate(self.workers):
+                    if worker.page is not None:
+                        self._replace(i)
+
+    def close(self) -> None:
+        with self._lock:
+            for worker in self.workers:
+                worker.stop()
+            self.workers = []
+
+
+_PAGE_POOLS = {}
+_PAGE_POOLS_LOCK = threading.Lock()
+
+
+def _page_pool(processes: int) -> _PageWorkerPool:
+    """PdfProcessor 按文件实例化，进程池按进程数在模块级共享"""
+    with _PAGE_POOLS_LOCK:
+        pool = _PAGE_POOLS.get(processes)
+        if pool is None:
+            pool = _PAGE_POOLS[processes] = _PageWorkerPool(processes)
+        return pool
+
+
 class PdfProcessor(DataProcessor):
-    def process(self, file_path: str) -> Union[str, List[str], List[Document]]:
-        # rand_num = random.randint(1, 3)
-        rand_num = 1
+    def __init__(
+        self,
+        workers: int = None,        # 页级并行的进程数，默认 min(cpu_count, 8)，进程池跨文件复用
+        page_timeout: float = 60,   # 单页提取超时（秒），超时页记为空并跳过，卡住的 worker 被 terminate 后替换
+        min_parallel_pages: int = 8 # 页数少于该值时在主进程顺序提取
+    ):
+        self.workers = workers or min(os.cpu_count() or 1, 8)
+        self.page_timeout = page_timeout
+        self.min_parallel_pages = min_parallel_pages
+
+    def _page_document(self, file_path: str, page_index: int, text: str) -> Document:
+        return Document(page_content=clean_text(text), metadata={"source": file_path, "page": page_index + 1})
+
+    def iter_pages(self, file_path: str) -> Iterator[Document]:
+        """按页码顺序产出 Document(page_content=清洗后文本, metadata={source, page})"""
+        reader = PdfReader(file_path)
+        num_pages = len(reader.pages)
+        if self.workers <= 1 or num_pages < self.min_parallel_pages:
+            for i in range(num_pages):
+                yield self._page_document(file_path, i, reader.pages[i].extract_text() or '')
+            return
+        del reader
+
+        # 页面按完成顺序返回，缓存乱序到达的页，按页码顺序产出
+        done, next_page = {}, 0
+        for i, text, error in _page_pool(self.workers).extract(file_path, num_pages, self.page_timeout):
+            if error is not None:
+                print(f"PdfProcessor: {file_path} 第 {i + 1} 页提取失败（{error}），已跳过")
+            done[i] = text
+            while next_page in done:
+                yield self._page_document(file_path, next_page, done.pop(next_page))
+                next_page += 1
+
+    def process(self, file_path: str, stream: bool = False) -> Union[str, Iterator[Document]]:
+        """
+        stream=False: 返回整篇文本（页文本线性拼接）
+        stream=True : 返回逐页 Document 的生成器，metadata 中保留页码
+        """
         try:
-            if rand_num == 1:
-                # 返回 文本
-                loader = PyPDFLoader(file_path)
-                documents = [doc.page_content for doc in tqdm(loader.load())]
-                text = ''
-                for document in documents:
-                    text += clean_text(document)
-                return text
-            elif rand_num == 2:
-                # 返回 Document 对象
-                def get_pdf_metadata(file_path):
-                    reader = PdfReader(file_path)
-                    metadata = reader.metadata
-                    return {k : v for k, v in metadata.items() if v != ''}
-                metadata = get_pdf_metadata(file_path)
-                documents = [Document(page_content=doc["text"], metadata=metadata) for doc in tqdm(loader.load())]
-                return documents
-            else:
-                # 返回每页的文本列表
-                loader = PyPDFLoader(file_path)
-                documents = [doc["text"] for doc in tqdm(loader.load())]
-                return documents
+            if stream:
+                return self.iter_pages(file_path)
+            pages = tqdm(self.iter_pages(file_path), desc="Processing Pdf")
+            return ''.join(page.page_content for page in pages)
         except Exception as e:
             raise ValueError(f"PdfProcessor error: {e}")
 
 class TxtProcessor(DataProcessor):
-    def process(self, file_path: str=None, encoding='utf8') -> str:
+    def __init__(self, block_size: int = 4 * 1024 * 1024):
+        # 每次从 mmap 读取并清洗的块大小（字节），块在换行处对齐
+        self.block_size = block_size
+
+    def iter_segments(self, file_path: str, encoding: str = 'utf8') -> Iterator[Document]:
+        """
+        mmap 流式读取：按块清洗后逐段产出，chunker 可以在文件读完之前开始工作
+        清洗结果与逐行 clean_text 后拼接一致
+        """
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                size = len(mm)
+                start = 0
+                segment = 0
+                while start < size:
+                    end = min(start + self.block_size, size)
+                    if end < size:
+                        # 在换行处切块，保证不截断多字节字符，也不把一行拆到两个块
+                        newline = mm.rfind(b'\n', start, end)
+                        if newline < start:
+                            # 超长单行：向后延伸到行尾
+                            newline = mm.find(b'\n', end)
+                        end = newline + 1 if newline >= 0 else size
+                    text = _LINE_JOIN_PATTERN.sub('', mm[start:end].decode(encoding)).strip()
+                    start = end
+                    if text:
+                        yield Document(page_content=text, metadata={"source": file_path, "segment": segment})
+                        segment += 1
+
+    def process(self, file_path: str=None, encoding='utf8', stream: bool = False) -> Union[str, Iterator[Document]]:
+        """
+        stream=False: 返回整篇清洗后的文本
+        stream=True : 返回有界文本段 Document 的生成器
+        """
         try:
-            with open(file_path, 'r', encoding=encoding) as f:
-                text = ''
-                for line in f:
-                    text += clean_text(line)
-            return text
+            if stream:
+                return self.iter_segments(file_path, encoding)
+            return ''.join(segment.page_content for segment in self.iter_segments(file_path, encoding))
         except Exception as e:
             raise ValueError(f"TxtProcessor error: {e}")
 
@@ -108,6 +296,10 @@ class AutoProcessor(DataProcessor):
         else:
             raise ValueError(f"no match processor error: {e}")
 
+# JsonProcessor 判断 JSONL 时读取的字节数上限
+_JSONL_SNIFF_BYTES = 64 * 1024
+
+
 class JsonProcessor(DataProcessor):
     """
     This class is a placeholder for JSON processing about abstract.
@@ -129,57 +321,158 @@ class JsonProcessor(DataProcessor):
         "pmcid": "PMC11147085"
     }
     """
-    def process(self, file_path: str) -> Union[str, List[str], List[Document]]:
-        def parse_json_objects(json_str):
-            decoder = json.JSONDecoder()
-            offset = 0
-            parsed_objects = []
-            while offset < len(json_str):
+    def __init__(self, block_size: int = 1024 * 1024, max_record_size: int = 64 * 1024 * 1024):
+        self.block_size = block_size            # 每次读取的字符数
+        self.max_record_size = max_record_size  # 单条记录上限，超过视为格式错误，避免缓冲区无限增长
+
+    @staticmethod
+    def _record_document(item: dict) -> Document:
+        # 摘要信息 -> text，标题，作者，机构 -> metadata
+        if 'abstract' in item:
+            doc = clean_text(item['abstract'])
+        else:
+            doc = ''
+        metadata = {
+            # 一次过滤的Tag
+            'title': item.get('title', ''),                # chunk上下文标题
+            'authors': item.get('authors', []),            # chunk上下文作者信息
+            'journal_info': item.get('journal_info', ''),  # chunk上下文杂志信息
+            'pub_info': item.get('pub_info', ''),          # chunk上下文出版信息
+            'doi': item.get('doi', ''),                    # chunk上下文DOI
+            'pmid': item.get('pmid', ''),                  # chunk上下文PMID
+            'pmcid': item.get('pmcid', ''),                # chunk上下文PMCID
+            'institutes': [author.get('institute', []) for author in item.get('authors', [])],  # chunk上下文作者机构
+            "author_names": [author.get('name', '') for author in item.get('authors', [])],     # chunk上下文作者姓名
+            
+            # 二次过滤的tag
+            'keywords': item.get('keywords', []), 
+        }
+        return Document(page_content=doc, metadata=metadata)
+
+    @staticmethod
+    def _is_jsonl(file_path: str) -> bool:
+        """
+        只读取文件开头 _JSONL_SNIFF_BYTES 字节判断格式，避免单行的压缩 JSON 被整行读入内存：
+        首个 JSON 值在一行内解析完、且同一行没有其他内容时按 JSONL 处理；
+        首个值超出嗅探范围时按首尾相接的 JSON 处理（该路径同样能解析 JSONL）
+        """
+        with open(file_path, 'rb') as f:
+            head = f.read(_JSONL_SNIFF_BYTES)
+        # 截断位置可能落在多字节字符中间
+        text = head.decode('utf8', errors='ignore').lstrip()
+        if not text:
+            return False
+        try:
+            _, end = json.JSONDecoder().raw_decode(text)
+        except ValueError:
+            return False
+        if '\n' in text[:end]:
+            return False  # 多行缩进的 JSON
+        rest = text[end:]
+        line_end = rest.find('\n')
+        if line_end == -1:
+            # 首个值之后没有换行：文件已读完且只剩空白时即单行 JSONL
+            return len(head) < _JSONL_SNIFF_BYTES and not rest.strip()
+        return not rest[:line_end].strip()
+
+    @staticmethod
+    def _continues_beyond_line(line: bytes) -> bool:
+        """
+        解析失败的行是否其实不是 JSONL：行内有多个首尾相接的值，或值在行尾被截断（多行缩进的 JSON）；
+        否则视为一行坏记录
+        """
+        text = line.decode('utf8', errors='ignore').strip()
+        try:
+            json.JSONDecoder().raw_decode(text)
+            return True
+        except json.JSONDecodeError as e:
+            return e.pos >= len(text)
+
+    def _iter_jsonl(self, file_path: str) -> Iterator:
+        """逐行解析；格式只按文件开头嗅探，后面出现非 JSONL 内容时从该行起改按首尾相接的 JSON 解析"""
+        offset = 0
+        with open(file_path, 'rb') as f:
+            for lineno, line in enumerate(f, 1):
+                start, offset = offset, offset + len(line)
+                if not line.strip():
+                    continue
+                try:
+                    yield _json_loads(line)
+                except ValueError as e:
+                    if self._continues_beyond_line(line):
+                        break
+                    print(f"解析错误，第 {lineno} 行: {e}")  # JSONL 可以按行跳过坏记录
+            else:
+                return
+        yield from self._iter_concatenated(file_path, start)
+
+    def _iter_concatenated(self, file_path: str, start: int = 0) -> Iterator:
+        """从字节偏移 start 起按块读取首尾相接的 JSON 对象，缓冲区只保留未解析的尾部"""
+        decoder = json.JSONDecoder()
+        buffer = ''
+        offset = 0
+        eof = False
+        read_size = self.block_size
+        raw = open(file_path, 'rb')
+        raw.seek(start)
+        with io.TextIOWrapper(raw, encoding='utf8') as f:
+            while True:
                 # 跳过空白字符（如换行、空格）
-                while offset < len(json_str) and json_str[offset].isspace():
+                while offset < len(buffer) and buffer[offset].isspace():
                     offset += 1
-                if offset >= len(json_str):
-                    break
+                if offset >= len(buffer):
+                    if eof:
+                        return
+                    buffer, offset = f.read(read_size), 0
+                    eof = len(buffer) < read_size
+                    continue
                 try:
                     # 解析单个JSON对象并更新偏移量
-                    obj, offset = decoder.raw_decode(json_str, idx=offset)
-                    parsed_objects.append(obj)
+                    obj, offset = decoder.raw_decode(buffer, idx=offset)
+                    read_size = self.block_size
+                    yield obj
                 except json.JSONDecodeError as e:
-                    print(f"解析错误，位置 {offset}: {e}")
-                    break  # 遇到错误时终止，可根据需要调整
-            return parsed_objects
+                    if eof or len(buffer) - offset > self.max_record_size:
+                        print(f"解析错误，位置 {offset}: {e}")
+                        return  # 遇到错误时终止，与旧版行为一致
+                    # 记录跨块：丢弃已解析部分，追加下一块后重试；连续失败时加倍读取量
+                    chunk = f.read(read_size)
+                    eof = len(chunk) < read_size
+                    buffer, offset = buffer[offset:] + chunk, 0
+                    read_size *= 2
+
+    def iter_records(self, file_path: str) -> Iterator[dict]:
+        """逐条产出记录，兼容 JSONL 与首尾相接的 JSON 对象；顶层数组会被展开"""
+        records = self._iter_jsonl(file_path) if self._is_jsonl(file_path) else self._iter_concatenated(file_path)
+        for record in records:
+            if isinstance(record, list):
+                yield from (item for item in record if isinstance(item, dict))
+            elif isinstance(record, dict):
+                yield record
+
+    def iter_documents(self, file_path: str) -> Iterator[Document]:
+        for record in self.iter_records(file_path):
+            yield self._record_document(record)
+
+    def process(self, file_path: str, stream: bool = False) -> Union[List[Document], Iterator[Document]]:
+        """
+        stream=False: 返回 Document 列表
+        stream=True : 返回逐条 Document 的生成器，内存占用与文件大小无关
+        """
+        if stream:
+            return self.iter_documents(file_path)
         try:
-            with open(file_path, 'r', encoding='utf8') as f:
-                content = f.read()
-            data = parse_json_objects(content)
-            documents = []
-            if isinstance(data, list):
-                for item in data:
-                    # 摘要信息 -> text，标题，作者，机构 -> metadata
-                    if 'abstract' in item:
-                        doc = clean_text(item['abstract'])
-                    else:
-                        doc = ''
-                    metadata = {
-                        # 一次过滤的Tag
-                        'title': item.get('title', ''),                # chunk上下文标题
-                        'authors': item.get('authors', []),            # chunk上下文作者信息
-                        'journal_info': item.get('journal_info', ''),  # chunk上下文杂志信息
-                        'pub_info': item.get('pub_info', ''),          # chunk上下文出版信息
-                        'doi': item.get('doi', ''),                    # chunk上下文DOI
-                        'pmid': item.get('pmid', ''),                  # chunk上下文PMID
-                        'pmcid': item.get('pmcid', ''),                # chunk上下文PMCID
-                        'institutes': [author.get('institute', []) for author in item.get('authors', [])],  # chunk上下文作者机构
-                        "author_names": [author.get('name', '') for author in item.get('authors', [])],     # chunk上下文作者姓名
-                        
-                        # 二次过滤的tag
-                        'keywords': item.get('keywords', []), 
-                    }
-                    documents.append(Document(page_content=doc, metadata=metadata))
+            documents = list(self.iter_documents(file_path))
         except Exception as e:
             raise ValueError(f"JsonProcessor error: {e}")
         return documents
 
+# 预编译的清洗规则
+_HYPHEN_NEWLINE_PATTERN = re.compile(r'-\n')
+_NEWLINE_PATTERN = re.compile(r'\n')
+# 块级清洗：连字符换行直接拼接，普通换行连同两侧空白一起去掉（等价于逐行 clean_text 后拼接）
+_LINE_JOIN_PATTERN = re.compile(r'[^\S\n]*-\n\s*|\s*\n\s*')
+
 def clean_text(text: str) -> str:
     """
     文本清洗函数：
@@ -187,9 +480,9 @@ def clean_text(text: str) -> str:
     2. 将换行符转换为空格
     """
     # 第一步：处理连字符换行
-    text = re.sub(r'-\n', '', text)
+    text = _HYPHEN_NEWLINE_PATTERN.sub('', text)
     
     # 第二步：处理普通换行
-    text = re.sub(r'\n', ' ', text)
+    text = _NEWLINE_PATTERN.sub(' ', text)
     
-    return text.strip()
\ No newline at end of file
+    return text.strip()
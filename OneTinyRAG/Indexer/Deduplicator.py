@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Chunk 去重：位于 Chunker.chunk 与 Embedder.embed 之间
+    1. 精确去重：规范化文本的 sha1
+    2. 近似去重：字符 n-gram MinHash + LSH 分桶，候选对再用签名估计 Jaccard 相似度确认
+    3. 重复的 chunk 合并为一个，来源记录在 metadata["duplicate_sources"]
+"""
+
+import re
+import zlib
+import hashlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain.docstore.document import Document
+from .SpanChunk import SpanChunk
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_WHITESPACE = re.compile(r"\s+")
+
+# 用于标识来源的 metadata 字段
+SOURCE_KEYS = ("source", "doi", "pmid", "pmcid", "title", "page")
+
+
+def _chunk_text(chunk) -> str:
+    if isinstance(chunk, dict):
+        return chunk.get("page_content", "")
+    if isinstance(chunk, (Document, SpanChunk)):
+        return chunk.page_content
+    return str(chunk)
+
+
+def _chunk_metadata(chunk) -> Optional[Dict[str, Any]]:
+    if isinstance(chunk, dict):
+        return chunk.get("metadata") or {}
+    if isinstance(chunk, (Document, SpanChunk)):
+        return chunk.metadata
+    return None  # 纯字符串 chunk 无法挂载来源信息
+
+
+def _set_metadata(chunk, metadata: Dict[str, Any]) -> None:
+    if isinstance(chunk, dict):
+        chunk["metadata"] = metadata
+    elif isinstance(chunk, (Document, SpanChunk)):
+        chunk.metadata = metadata
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # 保留靠前的 chunk 作为代表
+            if ra < rb:
+                self.parent[rb] = ra
+            else:
+                self.parent[ra] = rb
+
+
+class ChunkDeduplicator:
+    """精确哈希 + MinHash/LSH 的 chunk 去重器"""
+
+    def __init__(
+        self,
+        threshold: float = 0.85,   # 估计 Jaccard 相似度阈值
+        num_perm: int = 128,       # MinHash 置换数
+        bands: int = 32,           # LSH 分带数，num_perm 需能被整除
+        shingle_size: int = 5,     # 字符 n-gram 长度，中英文通用
+        seed: int = 42,
+    ):
+        if num_perm % bands != 0:
+            raise ValueError(f"ChunkDeduplicator -> num_perm({num_perm}) must be divisible by bands({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.stats = {}
+
+    def _normalize(self, text: str) -> str:
+        return _WHITESPACE.sub(" ", text).strip().lower()
+
+    def _minhash(self, text: str) -> np.ndarray:
+        k = self.shingle_size
+        shingles = {text[i:i + k] for i in range(max(1, len(text) - k + 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) & _MERSENNE_PRIME for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        # (a * h + b) mod p，按置换取最小值
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+    def _source_ref(self, idx: int, chunk) -> Dict[str, Any]:
+        metadata = _chunk_metadata(chunk) or {}
+        ref = {k: metadata[k] for k in SOURCE_KEYS if metadata.get(k)}
+        return ref or {"chunk_index": idx}
+
+    def dedup(self, chunks: List) -> List:
+        n = len(chunks)
+        texts = [self._normalize(_chunk_text(chunk)) for chunk in chunks]
+        uf = _UnionFind(n)
+
+        # 1. 精确去重
+        exact = {}
+        candidates = []
+        for i, text in enumerate(texts):
+            digest = hashlib.sha1(text.encode("utf-8")).digest()
+            if digest in exact:
+                uf.union(exact[digest], i)
+            else:
+                exact[digest] = i
+                candidates.append(i)
+        exact_dups = n - len(candidates)
+
+        # 2. MinHash + LSH 近似去重（只对精确去重后的代表计算签名）
+        signatures = {i: self._minhash(texts[i]) for i in candidates}
+        buckets = {}
+        for i in candidates:
+            sig = signatures[i]
+            for band in range(self.bands):
+                key = (band, sig[band * self.rows:(band + 1) * self.rows].tobytes())
+                buckets.setdefault(key, []).append(i)
+        # 同桶内两两比较：只与桶内第一个比较会漏掉“首个与其余都不像、其余彼此相似”的情况
+        checked = set()
+        for members in buckets.values():
+            for x, a in enumerate(members):
+                for b in members[x + 1:]:
+                    if (a, b) in checked or uf.find(a) == uf.find(b):
+                        continue
+                    checked.add((a, b))
+                    similarity = float(np.mean(signatures[a] == signatures[b]))
+                    if similarity >= self.threshold:
+                        uf.union(a, b)
+
+        # 3. 合并：保留每组最靠前的 chunk，记录其余来源
+        groups = {}
+        for i in range(n):
+            groups.setdefault(uf.find(i), []).append(i)
+        results = []
+        for root in sorted(groups):
+            members = groups[root]
+            chunk = chunks[root]
+            metadata = _chunk_metadata(chunk)
+            if len(members) > 1 and metadata is not None:
+                # 同一文档的 chunk 共享 metadata 对象，复制后再写入
+                metadata = dict(metadata)
+                metadata["duplicate_sources"] = [self._source_ref(i, chunks[i]) for i in members]
+                _set_metadata(chunk, metadata)
+            results.append(chunk)
+
+        self.stats = {
+            "input": n,
+            "exact_duplicates": exact_dups,
+            "near_duplicates": n - exact_dups - len(results),
+            "output": len(results),
+        }
+        print(f"🧹 Chunk 去重: {n} → {len(results)} "
+              f"(精确重复 {self.stats['exact_duplicates']}, 近似重复 {self.stats['near_duplicates']})")
+        return results
@@ -18,6 +18,9 @@ import faiss
 import numpy as np 
 import torch
 from tqdm import tqdm
+from .EmbeddingPool import EmbeddingPool, encode_texts
+from .OnnxEncoder import load_encoder
+from .SpanChunk import SpanChunk
 
 class Embedder(ABC):
     """Base class for embedding models"""
@@ -26,19 +29,30 @@ class Embedder(ABC):
         pass
 
 class BAAIEmbedder(Embedder):
-    def __init__(self, model_name="sentence-transformers/all-mpnet-base-v2"):
-        self.embedder = SentenceTransformer(model_name)
-    def embed(self, chunks: List) -> List:
-        embedder = []
+    def __init__(
+        self,
+        model_name="sentence-transformers/all-mpnet-base-v2",
+        backend: str = "torch",        # torch | onnx
+        quantize: bool = False,        # onnx 后端下启用 int8 动态量化
+        onnx_dir: str = None,          # onnx 导出目录，默认 Models/onnx
+        batch_size: int = 32,
+        max_batch_tokens: int = None,  # 按 token 长度分桶，每个 batch 的 token 上限（如 8192）；为空时按 batch_size 固定切分
+    ):
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.embedder = load_encoder(model_name, backend, quantize=quantize, onnx_dir=onnx_dir)
+    def vectors(self, chunks: List) -> np.ndarray:
+        """chunk -> 向量矩阵，供增量索引直接追加到已有 FAISS 索引"""
+        texts = []
         for chunk in chunks:
             if isinstance(chunk, str):
-                embedding = self.embedder.encode(chunk, normalize_embeddings=True)
-            elif isinstance(chunk, Document):
-                embedding = self.embedder.encode(chunk['text'], normalize_embeddings=True)
-            else:
-                continue
-            embedder.append(embedding)
-        embedder = np.array(embedder)
+                texts.append(chunk)
+            elif isinstance(chunk, (Document, SpanChunk)):
+                texts.append(chunk.page_content)
+        return encode_texts(self.embedder, texts, self.batch_size, self.max_batch_tokens)
+
+    def embed(self, chunks: List) -> List:
+        embedder = self.vectors(chunks)
         dimension = embedder.shape[1]
         index = faiss.IndexFlatIP(dimension)
         index.add(embedder)
@@ -59,24 +73,53 @@ class HuggingFaceEmbedder(Embedder):
         return index
 
 class MetaDataEmbedder(Embedder):
-    def __init__(self, model_name="sentence-transformers/all-mpnet-base-v2"):
-        self.embedder = SentenceTransformer(model_name)
-    def embed(self, chunks: List) -> List:
-        assert len(chunks)
-        embedder = []
-        for chunk in tqdm(chunks, desc="Processing Embedder"):
+    def __init__(
+        self,
+        model_name="sentence-transformers/all-mpnet-base-v2",
+        batch_size: int = 32,
+        max_batch_tokens: int = None,  # 按 token 长度分桶，每个 batch 的 token 上限（如 8192）；为空时按 batch_size 固定切分
+        num_workers: int = 1,          # >1 时启用多进程向量化
+        torch_threads: int = None,     # 每个 worker 的 torch 线程数，默认 cpu_count // num_workers
+        backend: str = "torch",        # torch | onnx
+        quantize: bool = False,        # onnx 后端下启用 int8 动态量化
+        onnx_dir: str = None,          # onnx 导出目录，默认 Models/onnx
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.num_workers = num_workers
+        backend_kwargs = {"backend": backend, "quantize": quantize, "onnx_dir": onnx_dir}
+        # 先在主进程加载（onnx 后端会在此完成一次性导出），worker 直接复用导出结果
+        self.embedder = load_encoder(model_name, **backend_kwargs)
+        self.pool = EmbeddingPool(model_name, num_workers, torch_threads, backend_kwargs) if num_workers > 1 else None
+
+    def _chunk_texts(self, chunks: List) -> List[str]:
+        texts = []
+        for chunk in chunks:
             if isinstance(chunk, str):
-                embedding = self.embedder.encode(chunk, normalize_embeddings=True)
-            elif isinstance(chunk, Document):
-                embedding = self.embedder.encode(chunk['text'], normalize_embeddings=True)
+                texts.append(chunk)
+            elif isinstance(chunk, (Document, SpanChunk)):
+                texts.append(chunk.page_content)
             elif isinstance(chunk, dict):
-                embedding = self.embedder.encode(chunk['page_content'], normalize_embeddings=True)
-            else:
-                continue
-            embedder.append(embedding)
-        embedder = np.array(embedder)
+                texts.append(chunk['page_content'])
+        return texts
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """按 batch 编码；单进程与多进程使用相同的 batch 切分，结果一致"""
+        return encode_texts(self.embedder, texts, self.batch_size, self.max_batch_tokens, self.pool)
+
+    def vectors(self, chunks: List) -> np.ndarray:
+        """chunk -> 向量矩阵，供增量索引直接追加到已有 FAISS 索引"""
+        return self.encode(self._chunk_texts(chunks))
+
+    def embed(self, chunks: List) -> List:
+        assert len(chunks)
+        embedder = self.vectors(chunks)
         dimension = embedder.shape[1]
         index = faiss.IndexFlatIP(dimension)
         index.add(embedder)
         return index
 
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多进程 CPU 向量化进程池：
+    1. 每个 worker 进程持有一份独立的编码模型（torch 或 onnx），并设置各自的 torch 线程数
+    2. 父进程切分 batch（可按 token 长度分桶），分发给 worker
+    3. worker 直接把向量写入共享内存，父进程不再反序列化 numpy 数组
+"""
+
+import os
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+# worker 进程内的全局模型（每个进程一份）
+_worker_model = None
+
+
+def _load_model(model_name: str, torch_threads: int, backend_kwargs: dict):
+    import torch
+    from .OnnxEncoder import load_encoder
+
+    torch.set_num_threads(torch_threads)
+    return load_encoder(model_name, num_threads=torch_threads, device="cpu", **backend_kwargs)
+
+
+def _worker_init(model_name: str, torch_threads: int, backend_kwargs: dict,
+                 loader: Optional[Callable] = None) -> None:
+    global _worker_model
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    _worker_model = (loader or _load_model)(model_name, torch_threads, backend_kwargs)
+
+
+def _worker_encode(task: Tuple[str, Tuple[int, int], int, List[str]]) -> int:
+    """把一个 batch 的向量写入共享内存的 [start, start+len(texts)) 行"""
+    shm_name, shape, start, texts = task
+    embeddings = encode_batch(_worker_model, texts)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        out[start:start + len(texts)] = embeddings
+        del out
+    finally:
+        shm.close()
+    return len(texts)
+
+
+def encode_batch(model, texts: List[str]) -> np.ndarray:
+    """单个 batch 的编码；单进程与多进程路径共用，保证输出一致"""
+    return model.encode(
+        texts,
+        batch_size=len(texts),
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+        show_progress_bar=False,
+    ).astype(np.float32, copy=False)
+
+
+def iter_batches(n: int, batch_size: int):
+    """按固定 batch_size 切分 [0, n)，返回 (start, end)"""
+    for start in range(0, n, batch_size):
+        yield start, min(start + batch_size, n)
+
+
+def token_lengths(model, texts: List[str]) -> List[int]:
+    """用模型自身的 tokenizer 批量计算 token 长度（截断到模型窗口）"""
+    max_length = getattr(model, "max_seq_length", None)
+    encoded = model.tokenizer(
+        texts,
+        add_special_tokens=True,
+        truncation=max_length is not None,
+        max_length=max_length,
+    )
+    return [len(ids) for ids in encoded["input_ids"]]
+
+
+def plan_batches(
+    lengths: List[int],
+    max_batch_tokens: int,
+    batch_size: Optional[int] = None,
+) -> Tuple[List[int], List[Tuple[int, int]]]:
+    """
+    按长度排序后切分 batch，使每个 batch 的 padding 后 token 数 (条数 × 最长长度) 不超过 max_batch_tokens
+    batch_size 不为空时每个 batch 同时不超过 batch_size 条，避免大量短文本拼成超大 batch
+
+    Returns:
+        order: 排序后的位置 -> 原始下标
+        batches: 排序后序列上的 (start, end)
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches = []
+    start = 0
+    for pos, idx in enumerate(order):
+        # 升序排列，当前元素即 batch 内最长
+        if pos > start and (lengths[idx] * (pos - start + 1) > max_batch_tokens
+                            or (batch_size and pos - start >= batch_size)):
+            batches.append((start, pos))
+            start = pos
+    if start < len(order):
+        batches.append((start, len(order)))
+    return order, batches
+
+
+def encode_texts(
+    model,
+    texts: List[str],
+    batch_size: int = 32,
+    max_batch_tokens: Optional[int] = None,
+    pool: Optional["EmbeddingPool"] = None,
+) -> np.ndarray:
+    """
+    文本 -> 向量，输出顺序与输入一致
+
+    Args:
+        model: 主进程编码模型，用于 tokenizer 与单进程编码
+        batch_size: 每个 batch 的条数上限
+        max_batch_tokens: 开启长度分桶，每个 batch 的 padding 后 token 上限；为空时按 batch_size 固定切分
+        pool: 多进程进程池，为 None 时在主进程编码
+    """
+    dimension = model.get_sentence_embedding_dimension()
+    order = None
+    if max_batch_tokens and texts:
+        order, batches = plan_batches(token_lengths(model, texts), max_batch_tokens, batch_size)
+        texts = [texts[i] for i in order]
+    else:
+        batches = list(iter_batches(len(texts), batch_size))
+
+    if pool is not None:
+        embeddings = pool.encode(texts, dimension, batches)
+    else:
+        embeddings = np.zeros((len(texts), dimension), dtype=np.float32)
+        with tqdm(total=len(texts), desc="Processing Embedder") as pbar:
+            for start, end in batches:
+                embeddings[start:end] = encode_batch(model, texts[start:end])
+                pbar.update(end - start)
+
+    if order is not None:
+        # 恢复原始 chunk 顺序
+        restored = np.empty_like(embeddings)
+        restored[order] = embeddings
+        embeddings = restored
+    return embeddings
+
+
+class EmbeddingPool:
+    """多进程向量化进程池，进程在首次使用时启动，可跨多次 embed 复用"""
+
+    def __init__(
+        self,
+        model_name: str,
+        num_workers: int,
+        torch_threads: Optional[int] = None,
+        backend_kwargs: Optional[dict] = None,   # 透传给 load_encoder 的 backend/quantize/onnx_dir
+        loader: Optional[Callable] = None,       # worker 内加载模型的函数 (model_name, torch_threads, backend_kwargs)，需可 pickle，默认 load_encoder
+    ):
+        self.model_name = model_name
+        self.num_workers = num_workers
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // num_workers)
+        self.backend_kwargs = backend_kwargs or {}
+        self.loader = loader
+        self._pool = None
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            # torch 与 fork 不兼容，统一使用 spawn
+            ctx = mp.get_context("spawn")
+            self._pool = ctx.Pool(
+                processes=self.num_workers,
+                initializer=_worker_init,
+                initargs=(self.model_name, self.torch_threads, self.backend_kwargs, self.loader),
+            )
+        return self._pool
+
+    def encode(self, texts: List[str], dimension: int, batches: List[Tuple[int, int]]) -> np.ndarray:
+        """
+        多进程编码
+
+        Args:
+            texts: 待编码文本
+            dimension: 向量维度，用于预分配共享内存
+            batches: (start, end) 列表，每个 batch 作为一个任务
+        """
+        shape = (len(texts), dimension)
+        if len(texts) == 0:
+            return np.zeros(shape, dtype=np.float32)
+
+        pool = self._ensure_pool()
+        nbytes = max(1, int(np.prod(shape)) * np.dtype(np.float32).itemsize)
+        shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        try:
+            tasks = [(shm.name, shape, start, texts[start:end]) for start, end in batches]
+            with tqdm(total=len(texts), desc="Processing Embedder") as pbar:
+                for n in pool.imap_unordered(_worker_encode, tasks):
+                    pbar.update(n)
+            result = np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+        return result
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __del__(self):
+        try:
+            if self._pool is not None:
+                self._pool.terminate()
+        except Exception:
+            pass
@@ -9,14 +9,13 @@
 """
 
 from pathlib import Path
-import importlib
-import pkgutil
-from typing import List
+from typing import List, TYPE_CHECKING
 import os
-from .DataProcessor import PdfProcessor, TxtProcessor, JsonProcessor
-from .Chunker import Chunker, RecursiveChunker, TokenChunker, SemanticSpacyChunker, SemanticNLTKChunker, MetaDataChunker
-from .Embedder import Embedder, HuggingFaceEmbedder, BAAIEmbedder, MetaDataEmbedder
+# 组件由 Mappers 中的惰性注册表按配置导入，这里不再 eager import
 from Mappers.Mappers import LOADER_MAPPING, CHUNER_MAPPING, EMBEDDER_MAPPING
+if TYPE_CHECKING:
+    from .Chunker import Chunker
+    from .Embedder import Embedder
 
 
 class Indexer:
@@ -24,6 +23,8 @@ class Indexer:
         self.config = config
         self.Chunker = None
         self.DocEmbedder = None
+        self.Deduplicator = None
+        self.ParseCache = None
         self._init_components()
 
     def _init_components(self):
@@ -31,6 +32,18 @@ class Indexer:
         chunker_cfg = self.config.get("chunker", {})
         self.Chunker = self._get_chunker(chunker_cfg)
 
+        # init Deduplicator (optional)
+        dedup_cfg = self.config.get("dedup", {})
+        if dedup_cfg.get("enabled", False):
+            from .Deduplicator import ChunkDeduplicator
+            self.Deduplicator = ChunkDeduplicator(**dedup_cfg.get("params", {}))
+
+        # init ParseCache (optional)
+        cache_cfg = self.config.get("parse_cache", {})
+        if cache_cfg.get("enabled", False):
+            from .ParseCache import ParseCache
+            self.ParseCache = ParseCache(cache_cfg.get("dir"))
+
         # init docEmbedder
         embedder_cfg = self.config.get("embedder", {})
         self.DocEmbedder = self._get_Embedder(embedder_cfg)
@@ -60,11 +73,20 @@ class Indexer:
                 loader_mapping_counter += 1
                 return []
             processor, loader_args = loader_mapping
+            # 配置中按后缀覆盖 processor 参数: {"processors": {".pdf": {"init": {...}, "process": {...}}}}
+            processor_cfg = self.config.get("processors", {}).get(ext, {})
+            loader_args = {**loader_args, **processor_cfg.get("process", {})}
+            init_args = processor_cfg.get("init", {})
+            if self.ParseCache is not None:
+                # 文件未变化时直接读取缓存，跳过 DataProcessor
+                data = self.ParseCache.process(processor, file_path, init_args, loader_args)
+            else:
+                data = processor(**init_args).process(file_path, **loader_args)
             # 返回处理后的文件 + 后缀用来表示是图像还是文本
-            return [(processor().process(file_path, **loader_args), file_path.split('.')[-1])]
+            return [(data, file_path.split('.')[-1])]
 
 
-    def _get_chunker(self, config: dict) -> Chunker:
+    def _get_chunker(self, config: dict) -> "Chunker":
         chunker_type = config.get("type", "recursive")
         params = config.get("params", {})
         chunker = CHUNER_MAPPING.get(chunker_type)
@@ -73,7 +95,7 @@ class Indexer:
         # 实例化
         return chunker(**params)
 
-    def _get_Embedder(self, config: dict) -> Embedder:
+    def _get_Embedder(self, config: dict) -> "Embedder":
         docEmbedder_config = config.get("docEmbedder", {})
         docEmbedder_type = docEmbedder_config.get("type", "BAAIEmbedder")
         docParams = docEmbedder_config.get("params", {})
@@ -83,15 +105,40 @@ class Indexer:
             raise ValueError(f"Indexer_get_Embedder -> Unknown embedder type: {docEmbedder_type}")    
         return docEmbedder(**docParams)
     
-    def index(self, file_path: str) -> List:
-        datas = self._get_data_processor(file_path)
+    def _chunk_datas(self, datas: List) -> List:
         chunks = []
         for (data, type) in datas:
             if type in ['jpg', 'jpeg', 'png']:
                 pass # 多模态信息除了图像就是文本, unprocess
             else:
+                if not isinstance(data, (str, list)) and not self.Chunker.streaming:
+                    # stream=True 的生成器：非流式分块器需要多次遍历 / len()，先展开为列表
+                    data = list(data)
                 chunks += self.Chunker.chunk(data)
-        
+        return chunks
+
+    def chunk_file(self, file_path: str) -> List:
+        """单个文件 -> chunk（解析 + 分块 + 可选去重），供增量索引使用"""
+        chunks = self._chunk_datas(self._get_data_processor(file_path))
+        if self.ParseCache is not None:
+            self.ParseCache.flush()
+        if self.Deduplicator is not None and chunks:
+            chunks = self.Deduplicator.dedup(chunks)
+        return chunks
+
+    def index(self, file_path: str) -> List:
+        datas = self._get_data_processor(file_path)
+        chunks = self._chunk_datas(datas)
+
+        if self.ParseCache is not None:
+            # 流式结果在 chunk 消费完后才写入缓存，这里统一落盘索引
+            self.ParseCache.flush()
+            stats = self.ParseCache.stats
+            print(f"📦 解析缓存: 命中 {stats['hits']}, 未命中 {stats['misses']}")
+
+        if self.Deduplicator is not None:
+            chunks = self.Deduplicator.dedup(chunks)
+
         if self.DocEmbedder is not None:
             docEmb = self.DocEmbedder.embed(chunks)
         else:
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ONNX Runtime 推理后端：
+    1. 首次使用时把 SentenceTransformer（transformer + pooling）导出为 ONNX，之后直接复用
+    2. 可选 int8 动态量化
+    3. 提供与 SentenceTransformer.encode 兼容的接口，检索器无需改动
+"""
+
+import os
+import re
+import json
+from typing import List, Optional, Union
+
+import numpy as np
+
+DEFAULT_ONNX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Models", "onnx")
+
+
+def _export_dir(model_name: str, onnx_dir: Optional[str]) -> str:
+    return os.path.join(onnx_dir or DEFAULT_ONNX_DIR, re.sub(r"[^\w.-]+", "_", model_name))
+
+
+def export_onnx(model_name: str, export_dir: str, opset: int = 14) -> str:
+    """导出 fp32 ONNX 模型、tokenizer 和元信息，已存在则跳过"""
+    onnx_path = os.path.join(export_dir, "model.onnx")
+    if os.path.exists(onnx_path):
+        return onnx_path
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    model.eval()
+    tokenizer = model.tokenizer
+    input_names = [name for name in tokenizer.model_input_names
+                   if name in ("input_ids", "attention_mask", "token_type_ids")]
+
+    class _SentenceEmbedding(torch.nn.Module):
+        """transformer + pooling，输出未归一化的句向量"""
+        def __init__(self, st_model):
+            super().__init__()
+            self.st_model = st_model
+
+        def forward(self, *inputs):
+            features = dict(zip(input_names, inputs))
+            return self.st_model(features)["sentence_embedding"]
+
+    dummy = tokenizer(["onnx export"], padding=True, return_tensors="pt")
+    os.makedirs(export_dir, exist_ok=True)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["sentence_embedding"] = {0: "batch"}
+    with torch.no_grad():
+        torch.onnx.export(
+            _SentenceEmbedding(model),
+            tuple(dummy[name] for name in input_names),
+            onnx_path,
+            input_names=input_names,
+            output_names=["sentence_embedding"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+    tokenizer.save_pretrained(export_dir)
+    with open(os.path.join(export_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "dimension": model.get_sentence_embedding_dimension(),
+            "max_seq_length": model.max_seq_length,
+            "input_names": input_names,
+        }, f, ensure_ascii=False, indent=4)
+    return onnx_path
+
+
+def quantize_onnx(onnx_path: str) -> str:
+    """int8 动态量化（仅权重），已存在则跳过"""
+    int8_path = onnx_path.replace(".onnx", ".int8.onnx")
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+class OnnxSentenceEncoder:
+    """onnxruntime 句向量编码器，接口与 SentenceTransformer.encode 保持一致"""
+
+    def __init__(
+        self,
+        model_name: str,
+        quantize: bool = False,
+        onnx_dir: Optional[str] = None,
+        num_threads: Optional[int] = None,
+        batch_size: int = 32,
+    ):
+        try:
+            import onnxruntime as ort
+        except Exception:
+            raise ImportError("onnxruntime 未安装或加载失败，无法使用 onnx 推理后端")
+        from transformers import AutoTokenizer
+
+        export_dir = _export_dir(model_name, onnx_dir)
+        onnx_path = export_onnx(model_name, export_dir)
+        if quantize:
+            onnx_path = quantize_onnx(onnx_path)
+        with open(os.path.join(export_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+        self.max_seq_length = self.meta["max_seq_length"]
+        self.batch_size = batch_size
+        self.onnx_path = onnx_path
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.meta["dimension"]
+
+    def _run(self, texts: List[str]) -> np.ndarray:
+        features = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        inputs = {name: features[name].astype(np.int64) for name in self.meta["input_names"]}
+        return self.session.run(["sentence_embedding"], inputs)[0]
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: Optional[int] = None,
+        normalize_embeddings: bool = False,
+        convert_to_numpy: bool = True,
+        show_progress_bar: bool = False,
+        **kwargs,
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        batch_size = batch_size or self.batch_size
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        embeddings = np.concatenate(
+            [self._run(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        ).astype(np.float32, copy=False)
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+        return embeddings[0] if single else embeddings
+
+
+def load_encoder(
+    model_name: str,
+    backend: str = "torch",
+    quantize: bool = False,
+    onnx_dir: Optional[str] = None,
+    num_threads: Optional[int] = None,
+    device: Optional[str] = None,
+):
+    """按配置加载句向量编码器：torch -> SentenceTransformer, onnx -> OnnxSentenceEncoder"""
+    if backend == "onnx":
+        return OnnxSentenceEncoder(model_name, quantize=quantize, onnx_dir=onnx_dir, num_threads=num_threads)
+    if backend != "torch":
+        raise ValueError(f"load_encoder -> Unknown embedder backend: {backend}")
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device=device)
+
+
+def check_parity(model_name: str, texts: List[str], quantize: bool = False, onnx_dir: Optional[str] = None) -> dict:
+    """对比 torch 与 onnx 句向量：返回最大绝对误差与最小余弦相似度"""
+    torch_model = load_encoder(model_name, "torch")
+    onnx_model = load_encoder(model_name, "onnx", quantize=quantize, onnx_dir=onnx_dir)
+    ref = torch_model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+    out = onnx_model.encode(texts, normalize_embeddings=True)
+    cosine = np.sum(ref * out, axis=1)
+    return {
+        "max_abs_diff": float(np.abs(ref - out).max()),
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+    }
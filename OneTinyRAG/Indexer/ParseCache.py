@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+解析结果缓存：位于文件与 DataProcessor 之间
+    1. 键：(绝对路径, 内容哈希, processor 名称, processor 版本, init/process 参数)
+    2. size + mtime 未变时直接信任已记录的内容哈希，不重新读文件；变化时再算哈希确认
+    3. 结果（整篇文本或 Document 列表）以 zlib 压缩的 JSON 存盘，命中时完全跳过 DataProcessor
+    4. stream=True 的生成器结果边产出边写入 gzip 压缩的 JSONL，完整消费后才 rename 生效；
+       命中时逐行解码，内存占用与文件大小无关
+"""
+
+import os
+import json
+import time
+import gzip
+import zlib
+import hashlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Cache", "parsed")
+INDEX_FILE = "index.json"
+BLOB_SUFFIXES = {"text": ".json.z", "documents": ".json.z", "stream": ".jsonl.gz"}
+
+
+def file_digest(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """流式计算文件内容哈希"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _args_digest(processor_cls, init_args: dict, process_args: dict) -> str:
+    payload = json.dumps({
+        "processor": f"{processor_cls.__module__}.{processor_cls.__qualname__}",
+        "version": getattr(processor_cls, "version", 1),
+        "init": init_args,
+        "process": process_args,
+    }, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _encode(result) -> Optional[bytes]:
+    """整篇文本或 Document 列表 -> 压缩字节；无法序列化时返回 None（不缓存）"""
+    if isinstance(result, str):
+        payload = {"kind": "text", "text": result}
+    else:
+        payload = {"kind": "documents", "items": [[doc.page_content, doc.metadata] for doc in result]}
+    try:
+        return zlib.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"), 6)
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def _decode(blob: bytes):
+    payload = json.loads(zlib.decompress(blob).decode("utf-8"))
+    if payload["kind"] == "text":
+        return payload["text"]
+    from langchain.docstore.document import Document
+    return [Document(page_content=content, metadata=metadata) for content, metadata in payload["items"]]
+
+
+class ParseCache:
+    """DataProcessor 解析结果的磁盘缓存"""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.entries: Dict[str, Dict[str, Any]] = self._load_index()
+        self._by_path: Dict[str, set] = {}
+        for key, entry in self.entries.items():
+            self._by_path.setdefault(entry["path"], set()).add(key)
+        self.stats = {"hits": 0, "misses": 0, "hashed": 0, "bytes_written": 0}
+        self._dirty = False
+
+    # ---------------- 索引 ----------------
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, INDEX_FILE)
+
+    def _blob_path(self, key: str, kind: Optional[str] = None) -> str:
+        if kind is None:
+            kind = self.entries.get(key, {}).get("kind", "documents")
+        return os.path.join(self.cache_dir, key + BLOB_SUFFIXES[kind])
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as f:
+                return json.load(f).get("entries", {})
+        except (OSError, ValueError):
+            return {}
+
+    def flush(self) -> None:
+        """原子写回索引（先写临时文件再 replace）"""
+        if not self._dirty:
+            return
+        tmp_path = self._index_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"entries": self.entries}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self._index_path())
+        self._dirty = False
+
+    def _same_file(self, path: str, args: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """同一文件、同一 processor 参数的全部条目"""
+        return [(key, self.entries[key]) for key in self._by_path.get(path, ())
+                if self.entries[key]["args"] == args]
+
+    def remove(self, key: str) -> None:
+        blob_path = self._blob_path(key)
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self._by_path.get(entry["path"], set()).discard(key)
+        try:
+            os.remove(blob_path)
+        except OSError:
+            pass
+        self._dirty = True
+
+    # ---------------- 查询 / 写入 ----------------
+    def _lookup(self, path: str, st: os.stat_result, args: str) -> Tuple[Optional[str], str]:
+        """返回 (命中的 key, 内容哈希)；内容哈希仅在 size/mtime 变化时才计算"""
+        same_args = self._same_file(path, args)
+        for key, entry in same_args:
+            if entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+                return key, entry["hash"]
+
+        content_hash = file_digest(path)
+        self.stats["hashed"] += 1
+        for key, entry in same_args:
+            if entry["hash"] == content_hash:
+                # 仅 mtime 变化（如 touch / 重新拷贝），内容未变
+                entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+                self._dirty = True
+                return key, content_hash
+        return None, content_hash
+
+    def _read(self, key: str):
+        try:
+            with open(self._blob_path(key), "rb") as f:
+                result = _decode(f.read())
+        except (OSError, ValueError, KeyError, zlib.error):
+            self.remove(key)  # 缓存文件损坏或丢失
+            return None
+        self.entries[key]["last_access"] = time.time()
+        self._dirty = True
+        return result
+
+    def _iter_stream(self, key: str) -> Iterator:
+        """逐行解码 JSONL 缓存；文件损坏时删除该条目并报错"""
+        from langchain.docstore.document import Document
+        try:
+            with gzip.open(self._blob_path(key), "rt", encoding="utf-8") as f:
+                for line in f:
+                    content, metadata = json.loads(line)
+                    yield Document(page_content=content, metadata=metadata)
+        except (OSError, ValueError, EOFError, zlib.error) as e:
+            self.remove(key)
+            raise ValueError(f"ParseCache: 缓存文件损坏，已删除: {e}")
+
+    @staticmethod
+    def _key(path: str, content_hash: str, args: str) -> str:
+        return hashlib.sha1(f"{path}\0{content_hash}\0{args}".encode("utf-8")).hexdigest()
+
+    def _register(self, key: str, path: str, st: os.stat_result, content_hash: str, args: str,
+                  processor_cls, kind: str, size: int) -> None:
+        now = time.time()
+        self.entries[key] = {
+            "path": path,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "hash": content_hash,
+            "processor": processor_cls.__name__,
+            "version": getattr(processor_cls, "version", 1),
+            "args": args,
+            "kind": kind,
+            "bytes": size,
+            "created": now,
+            "last_access": now,
+        }
+        self._by_path.setdefault(path, set()).add(key)
+        self.stats["bytes_written"] += size
+        self._dirty = True
+
+    def _write(self, path: str, st: os.stat_result, content_hash: str, args: str, processor_cls, result) -> None:
+        blob = _encode(result)
+        if blob is None:
+            print(f"ParseCache: {path} 的解析结果无法序列化，未缓存")
+            return
+        key = self._key(path, content_hash, args)
+        kind = "text" if isinstance(result, str) else "documents"
+        # 同一文件、同一参数的旧版本结果直接淘汰
+        for stale, _ in self._same_file(path, args):
+            self.remove(stale)
+        tmp_path = self._blob_path(key, kind) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, self._blob_path(key, kind))
+        self._register(key, path, st, content_hash, args, processor_cls, kind, len(blob))
+
+    def _stream_and_store(self, results: Iterator, path: str, st: os.stat_result, content_hash: str,
+                          args: str, processor_cls) -> Iterator:
+        """
+        流式结果：边产出边写入临时的 gzip JSONL，不在内存中收集；
+        完整消费后 rename 并登记，中途停止或遇到无法序列化的记录时丢弃临时文件
+        """
+        key = self._key(path, content_hash, args)
+        blob_path = self._blob_path(key, "stream")
+        tmp_path = f"{blob_path}.{os.getpid()}.tmp"
+        f = gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6)
+        storable = True
+        try:
+            for doc in results:
+                if storable:
+                    try:
+                        f.write(json.dumps([doc.page_content, doc.metadata], ensure_ascii=False) + "\n")
+                    except (TypeError, ValueError, AttributeError):
+                        print(f"ParseCache: {path} 的解析结果无法序列化，未缓存")
+                        storable = False
+                yield doc
+            f.close()
+            if storable:
+                for stale, _ in self._same_file(path, args):
+                    self.remove(stale)
+                os.replace(tmp_path, blob_path)
+                self._register(key, path, st, content_hash, args, processor_cls, "stream",
+                               os.path.getsize(blob_path))
+        finally:
+            f.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def process(self, processor_cls, file_path: str, init_args: Optional[dict] = None,
+                process_args: Optional[dict] = None):
+        """
+        命中缓存时直接返回结果，否则实例化 processor 解析并写入缓存
+        stream=True 的生成器结果在命中时同样以生成器返回
+        """
+        init_args = init_args or {}
+        process_args = process_args or {}
+        path = os.path.abspath(file_path)
+        st = os.stat(path)
+        args = _args_digest(processor_cls, init_args, process_args)
+
+        key, content_hash = self._lookup(path, st, args)
+        if key is not None and self.entries[key]["kind"] == "stream":
+            if os.path.exists(self._blob_path(key)):
+                self.stats["hits"] += 1
+                self.entries[key]["last_access"] = time.time()
+                self._dirty = True
+                return self._iter_stream(key)
+            self.remove(key)
+        elif key is not None:
+            result = self._read(key)
+            if result is not None:
+                self.stats["hits"] += 1
+                return iter(result) if process_args.get("stream") else result
+
+        self.stats["misses"] += 1
+        result = processor_cls(**init_args).process(file_path, **process_args)
+        if isinstance(result, (str, list)):
+            self._write(path, st, content_hash, args, processor_cls, result)
+            return result
+        return self._stream_and_store(result, path, st, content_hash, args, processor_cls)
+
+    # ---------------- 维护 ----------------
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "files": len({e["path"] for e in self.entries.values()}),
+            "bytes": sum(e["bytes"] for e in self.entries.values()),
+        }
+
+    def prune(self, stale: bool = True, older_than: Optional[float] = None,
+              max_bytes: Optional[int] = None) -> List[str]:
+        """
+        清理缓存，返回被删除的 key
+
+        Args:
+            stale: 删除源文件已不存在或 size/mtime 已变化的条目
+            older_than: 删除超过该秒数未被访问的条目
+            max_bytes: 按最近访问时间淘汰，直到总大小不超过该值
+        """
+        removed = []
+        now = time.time()
+        for key, entry in list(self.entries.items()):
+            if stale:
+                try:
+                    st = os.stat(entry["path"])
+                    changed = st.st_size != entry["size"] or st.st_mtime_ns != entry["mtime_ns"]
+                except OSError:
+                    changed = True
+                if changed:
+                    removed.append(key)
+                    continue
+            if older_than is not None and now - entry["last_access"] > older_than:
+                removed.append(key)
+        for key in removed:
+            self.remove(key)
+
+        if max_bytes is not None:
+            total = sum(e["bytes"] for e in self.entries.values())
+            for key, entry in sorted(self.entries.items(), key=lambda item: item[1]["last_access"]):
+                if total <= max_bytes:
+                    break
+                total -= entry["bytes"]
+                removed.append(key)
+                self.remove(key)
+
+        # 清理索引中不存在的孤立缓存文件
+        for name in os.listdir(self.cache_dir):
+            for suffix in set(BLOB_SUFFIXES.values()):
+                if name.endswith(suffix) and name[:-len(suffix)] not in self.entries:
+                    os.remove(os.path.join(self.cache_dir, name))
+        self.flush()
+        return removed
+
+    def clear(self) -> None:
+        for key in list(self.entries):
+            self.remove(key)
+        self.flush()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+区间 chunk：chunk 只记录 (doc_id, start, end)，指向共享的文档缓冲区
+文本仅在向量化 / 分词 / 返回结果时才切片，chunk_overlap 不再复制语料
+"""
+
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class DocumentBuffer:
+    """
+    共享文档缓冲区：每篇文档只保存一份原文
+    按 doc_id 存放，doc_id 不复用；文档的 chunk 全部移出索引后用 release 释放原文
+    """
+
+    def __init__(self):
+        self.texts: Dict[int, str] = {}
+        self._next_id = 0
+
+    def add(self, text: str) -> int:
+        doc_id = self._next_id
+        self._next_id += 1
+        self.texts[doc_id] = text
+        return doc_id
+
+    def release(self, doc_ids: Iterable[int]) -> None:
+        for doc_id in doc_ids:
+            self.texts.pop(doc_id, None)
+
+    def slice(self, doc_id: int, start: int, end: int) -> str:
+        return self.texts[doc_id][start:end]
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+
+class SpanChunk(Mapping):
+    """
+    指向 DocumentBuffer 的 chunk，兼容 chunk["page_content"] / chunk.page_content 两种访问方式
+    """
+    __slots__ = ("buffer", "doc_id", "start", "end", "metadata")
+
+    def __init__(self, buffer: DocumentBuffer, doc_id: int, start: int, end: int,
+                 metadata: Optional[Dict[str, Any]] = None):
+        self.buffer = buffer
+        self.doc_id = doc_id
+        self.start = start
+        self.end = end
+        self.metadata = metadata if metadata is not None else {}
+
+    @property
+    def page_content(self) -> str:
+        return self.buffer.slice(self.doc_id, self.start, self.end)
+
+    @property
+    def span(self) -> Tuple[int, int]:
+        """文档内字符区间，与 MetaDataChunker 普通 dict chunk 的 "span" 一致"""
+        return self.start, self.end
+
+    @property
+    def ref(self) -> Tuple[int, int, int]:
+        return self.doc_id, self.start, self.end
+
+    def __getitem__(self, key: str):
+        if key == "page_content":
+            return self.page_content
+        if key == "metadata":
+            return self.metadata
+        if key == "span":
+            return self.span
+        if key == "doc_id":
+            return self.doc_id
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(("page_content", "metadata", "span", "doc_id"))
+
+    def __len__(self) -> int:
+        return 4
+
+    def to_dict(self) -> Dict[str, Any]:
+        """物化为普通 dict（切片出文本）"""
+        return {key: self[key] for key in self}
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+
+def locate_spans(text: str, pieces: List[str]) -> List[Tuple[int, int]]:
+    """把 splitter 输出的子串按顺序定位回原文，得到字符区间（允许重叠）"""
+    spans = []
+    search_from = 0
+    for piece in pieces:
+        start = text.find(piece, search_from)
+        if start < 0:
+            start = text.find(piece)
+        if start < 0:
+            raise ValueError("locate_spans -> chunk is not a substring of the source text")
+        spans.append((start, start + len(piece)))
+        search_from = start + 1
+    return spans
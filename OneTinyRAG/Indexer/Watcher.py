@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+监听数据集目录并增量更新索引：
+    1. LiveIndex 按文件记录 chunk 在索引中的区间，新增/修改/删除只处理对应文件
+       FAISS 行与 chunks 列表始终一一对齐（remove_ids 会压缩剩余行并保持顺序）
+    2. IndexWatcher 轮询目录快照（可选 watchdog/inotify 事件提前唤醒），
+       文件 size/mtime 稳定 debounce 秒后才入库，避免处理拷贝到一半的文件
+    3. 记录入库延迟（检测到变化 / 文件写入 -> 可检索）与吞吐量
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from Mappers.Mappers import LOADER_MAPPING
+from .SpanChunk import SpanChunk
+
+Signature = Tuple[int, int]  # (size, mtime_ns)
+
+
+def scan_files(paths: Iterable[str]) -> Dict[str, Signature]:
+    """递归扫描目录，返回受支持后缀文件的 {绝对路径: (size, mtime_ns)}，跳过隐藏文件"""
+    suffixes = set(LOADER_MAPPING)
+    snapshot = {}
+
+    def add(file_path: str) -> None:
+        if os.path.splitext(file_path)[1].lower() not in suffixes:
+            return
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return  # 扫描期间被删除
+        snapshot[os.path.abspath(file_path)] = (st.st_size, st.st_mtime_ns)
+
+    for path in paths:
+        if os.path.isfile(path):
+            add(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for name in files:
+                if not name.startswith('.'):
+                    add(os.path.join(root, name))
+    return snapshot
+
+
+class LiveIndex:
+    """可增量更新的文本索引：chunks 列表与 FAISS 索引按文件分段维护"""
+
+    def __init__(self, indexer):
+        self.indexer = indexer
+        self.index = None
+        self.chunks: List = []
+        self.files: "OrderedDict[str, int]" = OrderedDict()  # 文件 -> chunk 数，顺序与 chunks 一致
+        # 检索与更新互斥：更新只在提交阶段持锁，解析/分块/向量化在锁外完成
+        self.lock = threading.RLock()
+
+    def build(self, paths: Iterable[str]) -> Dict[str, Signature]:
+        """全量构建，返回构建时的文件快照"""
+        snapshot = scan_files(paths)
+        chunks = []
+        for file_path in snapshot:
+            file_chunks = self._chunk_file(file_path)
+            self.files[file_path] = len(file_chunks)
+            chunks += file_chunks
+        with self.lock:
+            self.chunks[:] = chunks
+            self.index = self.indexer.DocEmbedder.embed(chunks) if chunks else None
+        return snapshot
+
+    def _chunk_file(self, file_path: str) -> List:
+        try:
+            return self.indexer.chunk_file(file_path)
+        except ValueError as e:
+            print(f"Skipped {file_path}: {str(e)}")
+            return []
+
+    def _offsets(self) -> Dict[str, Tuple[int, int]]:
+        offsets, start = {}, 0
+        for file_path, count in self.files.items():
+            offsets[file_path] = (start, start + count)
+            start += count
+        return offsets
+
+    def apply(self, upserts: List[str], deletes: List[str],
+              on_commit: Optional[Callable[["LiveIndex", Any], None]] = None,
+              on_prepare: Optional[Callable[[List], Any]] = None) -> Dict[str, int]:
+        """
+        新增/修改的文件重新入库，删除的文件移出索引
+            on_prepare: 锁外调用，参数为提交后的 chunk 列表，用于提前构建依赖 chunks 的结构（如 BM25）
+            on_commit : 在同一把锁内执行，参数为 (LiveIndex, on_prepare 的返回值)，只做引用替换
+        """
+        new_chunks, counts = [], OrderedDict()
+        for file_path in upserts:
+            file_chunks = self._chunk_file(file_path)
+            counts[file_path] = len(file_chunks)
+            new_chunks += file_chunks
+        vectors = self.indexer.DocEmbedder.vectors(new_chunks) if new_chunks else None
+
+        # chunks / files 只在本线程修改，提交后的 chunk 列表可以在锁外算好
+        offsets = self._offsets()
+        removed = np.zeros(len(self.chunks), dtype=bool)
+        for file_path in list(upserts) + list(deletes):
+            if file_path in offsets:
+                start, end = offsets[file_path]
+                removed[start:end] = True
+        chunks = [chunk for chunk, drop in zip(self.chunks, removed) if not drop] + new_chunks
+        # 被移除的区间 chunk 所指向的文档，提交后从共享缓冲区释放
+        released: Dict[Any, set] = {}
+        for chunk, drop in zip(self.chunks, removed):
+            if drop and isinstance(chunk, SpanChunk):
+                released.setdefault(chunk.buffer, set()).add(chunk.doc_id)
+        prepared = on_prepare(chunks) if on_prepare is not None else None
+
+        with self.lock:
+            for file_path in list(upserts) + list(deletes):
+                self.files.pop(file_path, None)
+            if removed.any():
+                self.index.remove_ids(np.flatnonzero(removed).astype(np.int64))
+            if vectors is not None:
+                if self.index is None:
+                    import faiss
+                    self.index = faiss.IndexFlatIP(vectors.shape[1])
+                self.index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+            self.chunks[:] = chunks
+            self.files.update(counts)
+            if on_commit is not None:
+                on_commit(self, prepared)
+            # 检索结果在锁内已切出文本，锁外不再有对这些文档的引用
+            for buffer, doc_ids in released.items():
+                buffer.release(doc_ids)
+        return {"chunks_added": len(new_chunks), "chunks_removed": int(removed.sum())}
+
+
+class IndexWatcher:
+    """后台线程监听目录变化，防抖后把增量提交给 LiveIndex"""
+
+    def __init__(
+        self,
+        live: LiveIndex,
+        paths: List[str],
+        snapshot: Optional[Dict[str, Signature]] = None,
+        interval: float = 2.0,      # 轮询间隔（秒）
+        debounce: float = 1.0,      # 文件 size/mtime 保持不变多久后才入库（秒）
+        use_inotify: bool = True,   # 安装了 watchdog 时用文件系统事件提前唤醒轮询
+        on_update: Optional[Callable[[LiveIndex, Any], None]] = None,  # 每批提交时在锁内回调，如刷新检索器
+        on_prepare: Optional[Callable[[List], Any]] = None,  # 每批提交前在锁外回调，返回值传给 on_update
+    ):
+        self.live = live
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.known = dict(snapshot) if snapshot is not None else scan_files(self.paths)
+        self.interval = interval
+        self.debounce = debounce
+        self.use_inotify = use_inotify
+        self.on_update = on_update
+        self.on_prepare = on_prepare
+        self.pending: Dict[str, dict] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._observer = None
+        self._lags = deque(maxlen=256)
+        self.stats = {
+            "batches": 0, "files_indexed": 0, "files_deleted": 0,
+            "chunks_added": 0, "chunks_removed": 0, "busy_seconds": 0.0, "errors": 0,
+            "last_batch": None,
+        }
+
+    # ---------------- 生命周期 ----------------
+    def start(self) -> "IndexWatcher":
+        if self.use_inotify:
+            self._start_observer()
+        self._thread = threading.Thread(target=self._run, name="IndexWatcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _start_observer(self) -> None:
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            return  # 未安装 watchdog 时退回纯轮询
+
+        wake = self._wake
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                wake.set()
+
+        self._observer = Observer()
+        for path in self.paths:
+            if os.path.isdir(path):
+                self._observer.schedule(_Handler(), path, recursive=True)
+        self._observer.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            # 有待处理文件时缩短等待，保证防抖到期后及时入库
+            timeout = min(self.interval, self.debounce) if self.pending else self.interval
+            self._wake.wait(timeout)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.poll()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"IndexWatcher error: {e}")
+
+    # ---------------- 变化检测 ----------------
+    def poll(self) -> Optional[dict]:
+        """扫描一次；有到期的变化时提交一批并返回该批指标"""
+        now = time.time()
+        current = scan_files(self.paths)
+        for file_path in set(current) | set(self.known) | set(self.pending):
+            signature = current.get(file_path)
+            if signature == self.known.get(file_path):
+                self.pending.pop(file_path, None)  # 改回原样或已提交
+                continue
+            entry = self.pending.get(file_path)
+            if entry is None:
+                self.pending[file_path] = {"signature": signature, "detected": now, "changed": now}
+            elif entry["signature"] != signature:
+                entry.update(signature=signature, changed=now)
+
+        ready = [path for path, entry in self.pending.items() if now - entry["changed"] >= self.debounce]
+        if not ready:
+            return None
+        return self._commit(ready)
+
+    def _commit(self, ready: List[str]) -> dict:
+        entries = {path: self.pending.pop(path) for path in ready}
+        upserts = [path for path, entry in entries.items() if entry["signature"] is not None]
+        deletes = [path for path, entry in entries.items() if entry["signature"] is None]
+
+        start = time.time()
+        result = self.live.apply(upserts, deletes, on_commit=self.on_update, on_prepare=self.on_prepare)
+        done = time.time()
+
+        batch_lags = []
+        for path, entry in entries.items():
+            # 失败的文件同样记为已知，避免反复重试；文件再次变化时会重新入库
+            if entry["signature"] is None:
+                self.known.pop(path, None)
+            else:
+                self.known[path] = entry["signature"]
+            write_time = entry["signature"][1] / 1e9 if entry["signature"] else entry["detected"]
+            batch_lags.append((done - entry["detected"], done - write_time))
+        self._lags.extend(batch_lags)
+
+        cost = done - start
+        batch = {
+            "files_indexed": len(upserts),
+            "files_deleted": len(deletes),
+            **result,
+            "seconds": round(cost, 3),
+            "chunks_per_second": round(result["chunks_added"] / cost, 1) if cost > 0 else None,
+            "max_detect_lag": round(max(lag[0] for lag in batch_lags), 3),
+        }
+        self.stats["batches"] += 1
+        self.stats["files_indexed"] += len(upserts)
+        self.stats["files_deleted"] += len(deletes)
+        self.stats["chunks_added"] += result["chunks_added"]
+        self.stats["chunks_removed"] += result["chunks_removed"]
+        self.stats["busy_seconds"] += cost
+        self.stats["last_batch"] = batch
+        print(f"🔄 增量索引: +{len(upserts)} -{len(deletes)} 文件, "
+              f"+{result['chunks_added']} -{result['chunks_removed']} chunks, {cost:.2f}s")
+        return batch
+
+    # ---------------- 指标 ----------------
+    def metrics(self) -> dict:
+        detect = sorted(lag[0] for lag in self._lags)
+        write = sorted(lag[1] for lag in self._lags)
+
+        def pct(values: List[float], q: float) -> Optional[float]:
+            return round(values[min(len(values) - 1, int(q * len(values)))], 3) if values else None
+
+        busy = self.stats["busy_seconds"]
+        return {
+            **self.stats,
+            "busy_seconds": round(busy, 3),
+            "chunks_per_second": round(self.stats["chunks_added"] / busy, 1) if busy > 0 else None,
+            "pending_files": len(self.pending),
+            "indexed_files": len(self.live.files),
+            "indexed_chunks": len(self.live.chunks),
+            # 检测到变化 -> 可检索（不含轮询间隔）；文件写入(mtime) -> 可检索（端到端）
+            "detect_lag_p50": pct(detect, 0.5),
+            "detect_lag_p95": pct(detect, 0.95),
+            "write_lag_p50": pct(write, 0.5),
+            "write_lag_p95": pct(write, 0.95),
+        }
@@ -10,67 +10,106 @@
 
 """
 
-from Tools.Utils import ApiQuery, OllamaDeepseekQuery
-from Tools.Workflow import task_func_default
+import importlib
+from collections.abc import Mapping
 
-from Indexer.DataProcessor import PdfProcessor, TxtProcessor, JsonProcessor
-from Indexer.Chunker import Chunker, RecursiveChunker, TokenChunker, SemanticSpacyChunker, SemanticNLTKChunker, MetaDataChunker
-from Indexer.Embedder import Embedder, HuggingFaceEmbedder, BAAIEmbedder, MetaDataEmbedder
 
-from Agent.Agent import CodeAutoAgent
+class LazyRegistry(Mapping):
+    """
+    惰性组件注册表：名称 -> "模块路径:属性名"
+    仅在配置选中某个组件时才 import 对应模块，避免启动时加载 spacy/nltk/torch/openai 等重依赖
+    值也可以是 ("模块路径:属性名", 参数) 元组，解析后返回 (对象, 参数)
+    """
+    def __init__(self, paths: dict):
+        self._paths = dict(paths)
+        self._cache = {}
 
-from Retriever.Retrieval import CosinRetriever
-from Retriever.HybridRetriever import HybridRetrievalAdapter
+    @staticmethod
+    def _resolve(path: str):
+        module_name, attr = path.split(":")
+        return getattr(importlib.import_module(module_name), attr)
 
-from Generator.Generate import DeepseekAPIGenerator, DeepseekOllamaGenerator
+    def __getitem__(self, name):
+        if name not in self._cache:
+            entry = self._paths[name]
+            if isinstance(entry, tuple):
+                self._cache[name] = (self._resolve(entry[0]), entry[1])
+            else:
+                self._cache[name] = self._resolve(entry)
+        return self._cache[name]
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def register(self, name, path) -> None:
+        self._paths[name] = path
+        self._cache.pop(name, None)
 
 
 # Query Mapper ======================================
-QUERY_MODEL_MAPPING = {
-    "ApiQuery" : ApiQuery,
-    "OllamaDeepseekQuery" : OllamaDeepseekQuery
-}
+QUERY_MODEL_MAPPING = LazyRegistry({
+    "ApiQuery" : "Tools.Utils:ApiQuery",
+    "OllamaDeepseekQuery" : "Tools.Utils:OllamaDeepseekQuery"
+})
 
-TASK_FUNC_MAPPING = {
-    "task_func_default" : task_func_default
-}
+TASK_FUNC_MAPPING = LazyRegistry({
+    "task_func_default" : "Tools.Workflow:task_func_default"
+})
 
-TASK_LLM_MAPPING = {
-    "ApiQuery" : ApiQuery,
-    "OllamaDeepseekQuery" : OllamaDeepseekQuery
-}
+TASK_LLM_MAPPING = LazyRegistry({
+    "ApiQuery" : "Tools.Utils:ApiQuery",
+    "OllamaDeepseekQuery" : "Tools.Utils:OllamaDeepseekQuery"
+})
 
 
 # Indexer Mapper ======================================
-LOADER_MAPPING = {
-    ".pdf": (PdfProcessor, {}),
-    ".txt": (TxtProcessor, {"encoding": "utf8"}),
-    ".json" : (JsonProcessor, {})
-}
-
-CHUNER_MAPPING = {
-    "recursive": (RecursiveChunker),
-    "token": (TokenChunker),
-    "SemanticSpacyChunker" : (SemanticSpacyChunker),
-    "SemanticNLTKChunker" : (SemanticNLTKChunker),
-    "MetaDataChunker": (MetaDataChunker),
-}
-
-EMBEDDER_MAPPING = {
-    "BAAIEmbedder": (BAAIEmbedder),
-    "HuggingFaceEmbedder": (HuggingFaceEmbedder),
-    "MetaDataEmbedder": (MetaDataEmbedder)
-}
+LOADER_MAPPING = LazyRegistry({
+    ".pdf": ("Indexer.DataProcessor:PdfProcessor", {}),
+    ".txt": ("Indexer.DataProcessor:TxtProcessor", {"encoding": "utf8"}),
+    ".json" : ("Indexer.DataProcessor:JsonProcessor", {})
+})
+
+CHUNER_MAPPING = LazyRegistry({
+    "recursive": "Indexer.Chunker:RecursiveChunker",
+    "token": "Indexer.Chunker:TokenChunker",
+    "SemanticSpacyChunker" : "Indexer.Chunker:SemanticSpacyChunker",
+    "SemanticNLTKChunker" : "Indexer.Chunker:SemanticNLTKChunker",
+    "MetaDataChunker": "Indexer.Chunker:MetaDataChunker",
+    "EmbedderTokenChunker": "Indexer.Chunker:EmbedderTokenChunker",
+})
+
+EMBEDDER_MAPPING = LazyRegistry({
+    "BAAIEmbedder": "Indexer.Embedder:BAAIEmbedder",
+    "HuggingFaceEmbedder": "Indexer.Embedder:HuggingFaceEmbedder",
+    "MetaDataEmbedder": "Indexer.Embedder:MetaDataEmbedder"
+})
 
 # Retriever Mapper ======================================
-RETRIEVER_MAPPING = {
-    "CosinRetriever": (CosinRetriever),
-    "HybridRetriever": (HybridRetrievalAdapter),
-}
+RETRIEVER_MAPPING = LazyRegistry({
+    "CosinRetriever": "Retriever.Retrieval:CosinRetriever",
+    "HybridRetriever": "Retriever.HybridRetriever:HybridRetrievalAdapter",
+})
 
 
 # Generator Mapper ======================================
-GENERATOR_MAPPING = {
-    "DeepseekAPIGenerator": (DeepseekAPIGenerator),
-    "DeepseekOllamaGenerator": (DeepseekOllamaGenerator),
-}
+GENERATOR_MAPPING = LazyRegistry({
+    "DeepseekAPIGenerator": "Generator.Generate:DeepseekAPIGenerator",
+    "DeepseekOllamaGenerator": "Generator.Generate:DeepseekOllamaGenerator",
+    "RoutedOllamaGenerator": "Generator.Generate:RoutedOllamaGenerator",
+})
+
+ALL_MAPPINGS = (
+    QUERY_MODEL_MAPPING, TASK_FUNC_MAPPING, TASK_LLM_MAPPING,
+    LOADER_MAPPING, CHUNER_MAPPING, EMBEDDER_MAPPING,
+    RETRIEVER_MAPPING, GENERATOR_MAPPING,
+)
+
+
+def preload_all() -> None:
+    """一次性导入全部组件（等价于旧的 eager import，用于预热或基准对比）"""
+    for mapping in ALL_MAPPINGS:
+        for name in mapping:
+            mapping[name]
@@ -73,12 +73,12 @@ class HybridRetriever:
         
         return tokens
     
-    def build_bm25_index(self, chunks: List) -> None:
-        """构建BM25索引"""
+    def prepare_bm25_index(self, chunks: List) -> Tuple[List[str], List[List[str]], BM25Okapi]:
+        """构建BM25索引但不替换当前索引，返回 (corpus_texts, tokenized_corpus, bm25_index)"""
         print(f"🔧 构建 BM25 索引，共 {len(chunks)} 个文档片段...")
         
         # 提取文本内容
-        self.corpus_texts = []
+        corpus_texts = []
         for chunk in chunks:
             if isinstance(chunk, dict):
                 text = chunk.get('page_content', str(chunk))
@@ -86,14 +86,23 @@ class HybridRetriever:
                 text = chunk.page_content
             else:
                 text = str(chunk)
-            self.corpus_texts.append(text)
+            corpus_texts.append(text)
         
         # 分词
-        self.tokenized_corpus = [self._tokenize_text(text) for text in self.corpus_texts]
+        tokenized_corpus = [self._tokenize_text(text) for text in corpus_texts]
         
         # 构建BM25索引
-        self.bm25_index = BM25Okapi(self.tokenized_corpus)
+        bm25_index = BM25Okapi(tokenized_corpus)
         print(f"✅ BM25 索引构建完成")
+        return corpus_texts, tokenized_corpus, bm25_index
+    
+    def set_bm25_index(self, prepared: Tuple[List[str], List[List[str]], BM25Okapi]) -> None:
+        """替换为 prepare_bm25_index 构建好的索引"""
+        self.corpus_texts, self.tokenized_corpus, self.bm25_index = prepared
+    
+    def build_bm25_index(self, chunks: List) -> None:
+        """构建BM25索引"""
+        self.set_bm25_index(self.prepare_bm25_index(chunks))
     
     def _bm25_search(self, query: str, top_k: int = 50) -> List[Tuple[int, float]]:
         """BM25检索"""
@@ -106,8 +115,12 @@ class HybridRetriever:
         # BM25评分
         bm25_scores = self.bm25_index.get_scores(query_tokens)
         
-        # 获取top_k结果
-        top_indices = np.argsort(bm25_scores)[::-1][:top_k]
+        # 获取top_k结果：先 argpartition 取候选，再只对候选排序
+        if top_k < len(bm25_scores):
+            candidates = np.argpartition(bm25_scores, -top_k)[-top_k:]
+            top_indices = candidates[np.argsort(bm25_scores[candidates])[::-1]]
+        else:
+            top_indices = np.argsort(bm25_scores)[::-1]
         results = [(idx, bm25_scores[idx]) for idx in top_indices]
         
         return results
@@ -129,6 +142,20 @@ class HybridRetriever:
         
         return results
     
+    def _dense_search_batch(self, queries: List[str], top_k: int = 50,
+                            batch_size: int = 64) -> List[List[Tuple[int, float]]]:
+        """批量密集向量检索：所有查询一次向量化、一次 FAISS 检索"""
+        if self.dense_embedder is None or self.dense_index is None:
+            return [[] for _ in queries]
+        
+        query_embeddings = self.dense_embedder.encode(queries, normalize_embeddings=True, batch_size=batch_size)
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        distances, indices = self.dense_index.search(query_embeddings, top_k)
+        
+        # FAISS 结果不足 top_k 时以 -1 填充
+        return [[(indices[q][i], distances[q][i]) for i in range(len(indices[q])) if indices[q][i] >= 0]
+                for q in range(len(queries))]
+    
     def _normalize_scores(self, scores: List[float], method: str = "min_max") -> List[float]:
         """
         分数归一化到[0,1]
@@ -213,7 +240,8 @@ class HybridRetriever:
                      query: str, 
                      chunks: List,
                      top_k: int = 3,
-                     retrieval_top_k: int = 50) -> List[RetrievalResult]:
+                     retrieval_top_k: int = 50,
+                     dense_results: Optional[List[Tuple[int, float]]] = None) -> List[RetrievalResult]:
         """
         混合检索主函数
         
@@ -222,6 +250,7 @@ class HybridRetriever:
             chunks: 文档片段列表
             top_k: 最终返回的结果数量
             retrieval_top_k: 每个检索器的召回数量
+            dense_results: 已批量计算的密集检索结果，为 None 时单独检索
             
         Returns:
             排序后的检索结果列表
@@ -237,7 +266,8 @@ class HybridRetriever:
         bm25_scores_dict = {idx: score for idx, score in bm25_results}
         
         # Dense检索
-        dense_results = self._dense_search(query, retrieval_top_k)
+        if dense_results is None:
+            dense_results = self._dense_search(query, retrieval_top_k)
         dense_scores_dict = {idx: score for idx, score in dense_results}
         
         # 合并候选集
@@ -302,6 +332,18 @@ class HybridRetriever:
                   f"| {result.content[:60]}...")
         
         return final_results
+    
+    def hybrid_search_batch(self,
+                            queries: List[str],
+                            chunks: List,
+                            top_k: int = 3,
+                            retrieval_top_k: int = 50) -> List[List[RetrievalResult]]:
+        """批量混合检索：密集检索整批完成，BM25 与融合逐条进行"""
+        if self.bm25_index is None:
+            self.build_bm25_index(chunks)
+        dense_batch = self._dense_search_batch(queries, retrieval_top_k)
+        return [self.hybrid_search(query, chunks, top_k, retrieval_top_k, dense_results=dense_results)
+                for query, dense_results in zip(queries, dense_batch)]
 
 class HybridRetrievalAdapter:
     """适配器：让HybridRetriever兼容原有的Retriever接口"""
@@ -343,18 +385,30 @@ class HybridRetrievalAdapter:
             chunks=chunks,
             top_k=top_k
         )
-        
+        return self._to_chunk_dicts(hybrid_results)
+    
+    def retrieval_scored(self, query: str, chunks: List, top_k: int = 3) -> List[Dict[str, Any]]:
+        """带 chunk_id 与 BM25 / dense / hybrid 得分的检索结果"""
+        return self.retrieval_txt(query, chunks, top_k)
+    
+    def retrieval_txt_batch(self, queries: List[str], chunks: List, top_k: int = 3) -> List[List]:
+        """批量文本检索，每条查询的结果格式与 retrieval_txt 相同"""
+        batch_results = self.hybrid_retriever.hybrid_search_batch(queries, chunks, top_k=top_k)
+        return [self._to_chunk_dicts(hybrid_results) for hybrid_results in batch_results]
+    
+    @staticmethod
+    def _to_chunk_dicts(hybrid_results: List[RetrievalResult]) -> List[Dict[str, Any]]:
         # 转换为原有格式
         text_results = []
         for result in hybrid_results:
             chunk_dict = {
                 'page_content': result.content,
                 'metadata': result.metadata or {},
-                'chunk_id': result.chunk_id,
+                'chunk_id': int(result.chunk_id),
                 'scores': {
-                    'bm25': result.bm25_score,
-                    'dense': result.dense_score,
-                    'hybrid': result.hybrid_score
+                    'bm25': float(result.bm25_score),
+                    'dense': float(result.dense_score),
+                    'hybrid': float(result.hybrid_score)
                 }
             }
             text_results.append(chunk_dict)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+查询向量缓存：包装句向量模型的 encode，相同查询文本直接复用向量
+    1. LRU 淘汰，线程安全，/query、/query/stream、/query/batch、/retrieve 共用同一个实例
+    2. 批量 encode 时只对未命中的文本调用模型
+    3. 其余属性透传给被包装的模型
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Union
+
+import numpy as np
+
+
+class CachedQueryEmbedder:
+    def __init__(self, embedder, max_size: int = 4096):
+        self.embedder = embedder
+        self.max_size = max_size
+        self._cache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.embedder, name)
+
+    def encode(self, sentences: Union[str, List[str]], normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        keys = [(text, normalize_embeddings) for text in texts]
+        vectors: List[Any] = [None] * len(texts)
+        missing: Dict[tuple, List[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._cache.get(key)
+                if vector is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    vectors[i] = vector
+            self.hits += len(texts) - sum(len(positions) for positions in missing.values())
+            self.misses += len(missing)
+
+        if missing:
+            encoded = self.embedder.encode([key[0] for key in missing], normalize_embeddings=normalize_embeddings,
+                                           **kwargs)
+            with self._lock:
+                for (key, positions), vector in zip(missing.items(), encoded):
+                    vector = np.asarray(vector, dtype=np.float32)
+                    vector.setflags(write=False)  # 缓存中的向量被多个请求共享
+                    for i in positions:
+                        vectors[i] = vector
+                    self._cache[key] = vector
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.max_size:
+                    self._cache.popitem(last=False)
+
+        return vectors[0] if single else np.stack(vectors)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+            }
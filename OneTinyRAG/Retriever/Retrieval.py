@@ -11,6 +11,7 @@
 """
 
 from abc import ABC, abstractmethod
+from collections.abc import Mapping
 from typing import List, Optional, Union
 from langchain.docstore.document import Document
 from langchain_community.vectorstores import FAISS
@@ -20,6 +21,11 @@ import torch
 import numpy as np 
 
 
+def _detach(chunk):
+    """区间 chunk 在索引锁内切出文本；增量更新释放文档原文后，已返回的结果仍然可用"""
+    return chunk.to_dict() if hasattr(chunk, "to_dict") else chunk
+
+
 class CosinRetriever:
     def __init__(self, embedder=None, index=None):
         self.embedder = embedder
@@ -33,12 +39,42 @@ class CosinRetriever:
         valid_top_k = min(top_k, len(chunks))
         for i in range(valid_top_k):
             # 获取相似文本块的原始内容
-            result_chunk = chunks[indices[0][i]]
+            result_chunk = _detach(chunks[indices[0][i]])
             # 获取相似文本块的相似度得分
             # result_distance = distances[0][i]
             retrievalChunks.append(result_chunk)
         return retrievalChunks
 
+    def retrieval_scored(self, query, chunks: List, top_k: int = 3) -> List[dict]:
+        query_embedding = self.embedder.encode(query, normalize_embeddings=True)
+        distances, indices = self.index.search(np.array([query_embedding]), top_k)
+        results = []
+        for idx, distance in zip(indices[0], distances[0]):
+            if idx < 0 or idx >= len(chunks):
+                continue
+            chunk = chunks[idx]
+            if isinstance(chunk, Mapping):  # dict 或 SpanChunk
+                content, metadata = chunk.get('page_content', str(chunk)), chunk.get('metadata', {})
+            elif hasattr(chunk, 'page_content'):
+                content, metadata = chunk.page_content, getattr(chunk, 'metadata', {})
+            else:
+                content, metadata = str(chunk), {}
+            results.append({
+                'chunk_id': int(idx),
+                'page_content': content,
+                'metadata': metadata or {},
+                'scores': {'bm25': None, 'dense': float(distance), 'hybrid': None},
+            })
+        return results
+
+    def retrieval_txt_batch(self, queries: List[str], chunks: List[str], top_k: int = 3,
+                            batch_size: int = 64) -> List[List]:
+        # 所有查询一次向量化、一次 FAISS 检索
+        query_embeddings = self.embedder.encode(queries, normalize_embeddings=True, batch_size=batch_size)
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        distances, indices = self.index.search(query_embeddings, top_k)
+        return [[_detach(chunks[idx]) for idx in row[:min(top_k, len(chunks))] if idx >= 0] for row in indices]
+
     def retrieval_img(self, query, chunks: List[str], top_k: int = 3) -> List:
         # 图像embedder -> [self.processor, self.model] = self.embedder
         device = self.embedder[1].device
@@ -8,15 +8,9 @@
     @Time: 2025-06-08 23:33:50
 """
 
-from abc import ABC, abstractmethod
 from typing import List, Optional, Union
-from langchain.docstore.document import Document
-from langchain_community.vectorstores import FAISS
-from sentence_transformers import SentenceTransformer
-import faiss 
-import torch
-import numpy as np 
 from Mappers.Mappers import RETRIEVER_MAPPING
+from .QueryCache import CachedQueryEmbedder
 
 class Retriever:
     def __init__(self, DocEmbedder=None, ImgEmbedder=None, textIndex=None, imgIndex=None, config: dict=None):
@@ -28,6 +22,11 @@ class Retriever:
     def _init_components(self, DocEmbedder, ImgEmbedder, txtIndex, imgIndex):
         # init retriever
         retriever_cfg = self.config.get("retriever", {})
+        # 查询向量缓存：各接口共用同一个检索器实例，也就共用缓存
+        cache_cfg = retriever_cfg.get("query_cache", {})
+        self.queryCache = None
+        if DocEmbedder is not None and cache_cfg.get("enabled", True):
+            DocEmbedder = self.queryCache = CachedQueryEmbedder(DocEmbedder, cache_cfg.get("max_size", 4096))
         self.docRetriever = self._get_retriever(DocEmbedder, txtIndex, retriever_cfg)
         self.imgRetriever = self._get_retriever(ImgEmbedder, imgIndex, retriever_cfg)
 
@@ -55,4 +54,66 @@ class Retriever:
         if self.imgRetriever is not None:
             retrievalChunks_img = self.imgRetriever.retrieval_img(query, imgChunks, top_k)
         return [retrievalChunks_txt, retrievalChunks_img]
-    
+
+    def retrieval_scored(self, query, txtChunks: List, top_k: int = 3) -> List[dict]:
+        """
+        只检索文本，返回带得分的结果：
+            [{"chunk_id", "page_content", "metadata", "scores": {"bm25", "dense", "hybrid"}}]
+        chunk_id 为 chunk 在当前 chunk 列表中的下标；检索器不提供的得分为 None
+        """
+        if self.docRetriever is None:
+            return []
+        return self.docRetriever.retrieval_scored(query, txtChunks, top_k)
+
+    def cache_stats(self) -> dict:
+        return self.queryCache.stats() if self.queryCache is not None else {}
+
+    def retrieval_batch(self, queries: List[str], txtChunks: List, imgChunks: List, top_k: int = 3) -> List[List]:
+        """批量检索：查询向量化与 FAISS 检索整批进行，返回与 queries 对齐的 [txt, img] 列表"""
+        if self.docRetriever is not None and hasattr(self.docRetriever, "retrieval_txt_batch"):
+            txt_batch = self.docRetriever.retrieval_txt_batch(queries, txtChunks, top_k)
+        elif self.docRetriever is not None:
+            txt_batch = [self.docRetriever.retrieval_txt(query, txtChunks, top_k) for query in queries]
+        else:
+            txt_batch = [None] * len(queries)
+        results = []
+        for query, retrievalChunks_txt in zip(queries, txt_batch):
+            retrievalChunks_img = None
+            if self.imgRetriever is not None:
+                retrievalChunks_img = self.imgRetriever.retrieval_img(query, imgChunks, top_k)
+            results.append([retrievalChunks_txt, retrievalChunks_img])
+        return results
+
+    def warmup(self, txtChunks: List) -> None:
+        """提前构建惰性结构（BM25 索引），避免首个请求承担构建耗时；多进程模式下在 fork 前调用以便共享"""
+        hybrid = getattr(self.docRetriever, "hybrid_retriever", None)
+        if hybrid is not None and hybrid.bm25_index is None and txtChunks:
+            hybrid.build_bm25_index(txtChunks)
+
+    def prepare_refresh(self, txtChunks: List):
+        """
+        在索引锁外为更新后的 chunks 构建 BM25，结果交给 refresh 替换；
+        构建耗时不计入检索的等待，非混合检索器返回 None
+        """
+        hybrid = getattr(self.docRetriever, "hybrid_retriever", None)
+        if hybrid is None or not txtChunks:
+            return None
+        return hybrid.prepare_bm25_index(txtChunks)
+
+    def refresh(self, textIndex=None, prepared=None) -> None:
+        """
+        文本索引增量更新后同步到检索器（在索引锁内调用）：替换向量索引引用与 prepare_refresh 构建好的 BM25；
+        未提供 prepared 时 BM25 在下次检索时按最新 chunks 重建
+        """
+        if self.docRetriever is None:
+            return
+        if hasattr(self.docRetriever, "hybrid_retriever"):
+            hybrid = self.docRetriever.hybrid_retriever
+            if textIndex is not None:
+                hybrid.dense_index = textIndex
+            if prepared is not None:
+                hybrid.set_bm25_index(prepared)
+            else:
+                hybrid.bm25_index = None
+        elif textIndex is not None:
+            self.docRetriever.index = textIndex
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+LLM 生成前的准入控制：
+    1. 并发上限：同时进行的生成数不超过 max_concurrency
+    2. 有界优先级队列：优先级高者先获得空闲槽位，同优先级先到先得；队列满时挤掉优先级最低的等待者
+    3. 截止时间：预计等待时间（按生成耗时 EWMA 估算）超过请求截止时间时立即拒绝，
+       排队超时同样拒绝，由调用方转换为 503
+"""
+
+import math
+import heapq
+import asyncio
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+
+class Overloaded(Exception):
+    """请求被准入控制拒绝"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"LLM 后端繁忙（{reason}），请 {retry_after:.0f}s 后重试")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrency: int = 2,          # 同时进行的生成数
+        max_queue: int = 32,               # 排队上限
+        default_deadline: float = 30.0,    # 请求未指定截止时间时的默认值（秒，从进入队列开始计）
+        ewma_alpha: float = 0.2,           # 生成耗时 EWMA 的平滑系数
+        initial_service_time: float = 5.0, # 尚无观测值时假定的单次生成耗时（秒）
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.default_deadline = default_deadline
+        self.ewma_alpha = ewma_alpha
+        self.service_time = initial_service_time
+        self.running = 0
+        self._queue: List[list] = []   # 堆：[-priority, seq, future]
+        self._seq = itertools.count()
+        self._waits = deque(maxlen=512)
+        self.stats = {"admitted": 0, "shed_deadline": 0, "shed_queue_full": 0, "displaced": 0, "expired": 0}
+
+    # ---------------- 队列 ----------------
+    def _waiting(self) -> List[list]:
+        """仍在等待的队列项；已取消/已完成的项惰性清理"""
+        live = [entry for entry in self._queue if not entry[2].done()]
+        if len(live) != len(self._queue):
+            self._queue = live
+            heapq.heapify(self._queue)
+        return self._queue
+
+    def expected_wait(self, priority: int = 0) -> float:
+        """按吞吐量估算：排在前面的请求数 / 并发数 × 单次生成耗时"""
+        waiting = self._waiting()
+        if self.running < self.max_concurrency and not waiting:
+            return 0.0
+        ahead = sum(1 for entry in waiting if -entry[0] >= priority)
+        return (ahead + 1) / self.max_concurrency * self.service_time
+
+    def _lowest(self) -> Optional[list]:
+        """优先级最低、最晚到达的等待者"""
+        waiting = self._waiting()
+        return max(waiting, key=lambda entry: (entry[0], entry[1])) if waiting else None
+
+    def check(self, priority: int = 0, deadline: Optional[float] = None) -> None:
+        """不入队的快速检查：预计会被拒绝时直接抛出 Overloaded"""
+        deadline = deadline or self.default_deadline
+        waiting = self._waiting()
+        if self.running < self.max_concurrency and not waiting:
+            return
+        if len(waiting) >= self.max_queue:
+            lowest = self._lowest()
+            if -lowest[0] >= priority:
+                self.stats["shed_queue_full"] += 1
+                raise Overloaded("queue_full", self.expected_wait(priority))
+        wait = self.expected_wait(priority)
+        if wait > deadline:
+            self.stats["shed_deadline"] += 1
+            raise Overloaded("deadline", wait)
+
+    def _release(self) -> None:
+        # 槽位直接转交给优先级最高的等待者，running 不变
+        while self._queue:
+            entry = heapq.heappop(self._queue)
+            if not entry[2].done():
+                entry[2].set_result(None)
+                return
+        self.running -= 1
+
+    def _observe(self, seconds: float) -> None:
+        self.service_time += self.ewma_alpha * (seconds - self.service_time)
+
+    # ---------------- 准入 ----------------
+    @asynccontextmanager
+    async def slot(self, priority: int = 0, deadline: Optional[float] = None):
+        """
+        获取一个生成槽位
+
+        Args:
+            priority: 优先级，越大越优先
+            deadline: 最长排队时间（秒）
+        """
+        loop = asyncio.get_running_loop()
+        deadline = deadline or self.default_deadline
+        enqueued = loop.time()
+        if self.running < self.max_concurrency and not self._waiting():
+            self.running += 1
+        else:
+            self.check(priority, deadline)
+            if len(self._waiting()) >= self.max_queue:
+                lowest = self._lowest()
+                lowest[2].set_exception(Overloaded("displaced", self.expected_wait(-lowest[0])))
+                self.stats["displaced"] += 1
+            future = loop.create_future()
+            heapq.heappush(self._queue, [-priority, next(self._seq), future])
+            try:
+                await asyncio.wait_for(future, timeout=deadline)
+            except asyncio.TimeoutError:
+                self.stats["expired"] += 1
+                raise Overloaded("deadline", self.expected_wait(priority))
+            except asyncio.CancelledError:
+                # 客户端断开：若槽位已转交给本请求，需要归还
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    self._release()
+                raise
+
+        wait = loop.time() - enqueued
+        self._waits.append(wait)
+        self.stats["admitted"] += 1
+        start = loop.time()
+        try:
+            yield wait
+        finally:
+            self._observe(loop.time() - start)
+            self._release()
+
+    # ---------------- 指标 ----------------
+    def metrics(self) -> Dict:
+        waits = sorted(self._waits)
+
+        def pct(q: float) -> Optional[float]:
+            return round(waits[min(len(waits) - 1, int(q * len(waits)))], 3) if waits else None
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self.running,
+            "queue_depth": len(self._waiting()),
+            "max_queue": self.max_queue,
+            "service_time_ewma": round(self.service_time, 3),
+            "expected_wait": round(self.expected_wait(), 3),
+            "wait_p50": pct(0.5),
+            "wait_p95": pct(0.95),
+            "wait_max": round(waits[-1], 3) if waits else None,
+            **self.stats,
+        }
+
+
+def retry_after_header(error: Overloaded) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(error.retry_after)))}
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+性能基准脚本
+用法:
+    python Tools/Benchmark.py onnx --model BAAI/bge-small-zh-v1.5 --data Dataset/sample.txt
+    python Tools/Benchmark.py import
+    python Tools/Benchmark.py chunker --chunk_size 128
+    python Tools/Benchmark.py nltk --limit 20000 --workers 8
+    python Tools/Benchmark.py json --data Dataset/json/1966_2002_abstract1286.json
+    python Tools/Benchmark.py llm --limit 200 --workers 8 --latency 0.02
+    python Tools/Benchmark.py router --limit 300 --workers 16 --latency 0.02
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(current_dir)
+sys.path.append(project_dir)
+
+
+def load_texts(data_path: str, limit: int = 2000, min_len: int = 8) -> List[str]:
+    """读取基准文本：按行切分，过滤过短的行，不足 limit 时循环补齐"""
+    with open(data_path, "r", encoding="utf-8") as f:
+        texts = [line.strip() for line in f if len(line.strip()) >= min_len]
+    if not texts:
+        raise ValueError(f"load_texts -> no usable text in {data_path}")
+    while len(texts) < limit:
+        texts += texts[:limit - len(texts)]
+    return texts[:limit]
+
+
+def timeit(func, *args, repeat: int = 3, **kwargs):
+    """返回 (最优耗时, 最后一次结果)"""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_onnx(args):
+    """torch vs onnx vs onnx-int8：吞吐量与向量一致性"""
+    from Indexer.OnnxEncoder import load_encoder, check_parity
+
+    texts = load_texts(args.data, args.limit)
+    backends = [("torch", {}), ("onnx", {}), ("onnx-int8", {"quantize": True})]
+    print(f"📋 model={args.model} texts={len(texts)} batch_size={args.batch_size}")
+    for name, kwargs in backends:
+        encoder = load_encoder(args.model, name.split("-")[0], **kwargs)
+        encoder.encode(texts[:args.batch_size], batch_size=args.batch_size)  # warmup
+        cost, _ = timeit(encoder.encode, texts, batch_size=args.batch_size,
+                         normalize_embeddings=True, repeat=args.repeat)
+        print(f"  - {name:<10} {cost:.3f}s  {len(texts) / cost:.1f} texts/s")
+
+    sample = texts[:min(len(texts), 256)]
+    for quantize in (False, True):
+        parity = check_parity(args.model, sample, quantize=quantize)
+        tag = "onnx-int8" if quantize else "onnx"
+        print(f"  - parity {tag:<10} max_abs_diff={parity['max_abs_diff']:.2e} "
+              f"min_cosine={parity['min_cosine']:.5f} mean_cosine={parity['mean_cosine']:.5f}")
+
+
+def bench_import(args):
+    """冷启动 import 耗时：惰性注册表 vs 全量预加载（每次新开解释器）"""
+    cases = [
+        ("lazy", "import Indexer.Indexer"),
+        ("eager", "import Indexer.Indexer; from Mappers.Mappers import preload_all; preload_all()"),
+    ]
+    for name, stmt in cases:
+        code = f"import time; t = time.perf_counter(); {stmt}; print(time.perf_counter() - t)"
+        costs = []
+        for _ in range(args.repeat):
+            out = subprocess.run([sys.executable, "-c", code], cwd=project_dir,
+                                 capture_output=True, text=True)
+            if out.returncode != 0:
+                print(f"  - {name:<6} failed: {out.stderr.strip().splitlines()[-1]}")
+                break
+            costs.append(float(out.stdout.strip().splitlines()[-1]))
+        if costs:
+            print(f"  - {name:<6} best={min(costs):.3f}s mean={sum(costs) / len(costs):.3f}s")
+
+
+def _legacy_metadata_split(text: str, chunk_size: int, separators: List[str]) -> List[str]:
+    """旧版 MetaDataChunker.split_text 的核心循环（按空格切词，回溯 spt_index），仅作对照"""
+    chunks = []
+    sent = text.split(' ')
+    fast, slow = 0, 0
+    spt_index = []
+    for fast in range(0, len(sent)):
+        if len(sent[fast]) and sent[fast][-1] in separators:
+            spt_index.append(fast)
+        elif fast - slow + 1 > chunk_size:
+            tmp = []
+            for i in spt_index[::-1]:
+                if i - slow + 1 <= chunk_size:
+                    chunks.append(" ".join(sent[slow:i + 1]))
+                    slow = i + 1
+                    spt_index = tmp[::-1]
+                    break
+                tmp.append(i)
+    if slow <= fast:
+        chunks.append(" ".join(sent[slow:fast + 1]))
+    return chunks
+
+
+def bench_chunker(args):
+    """MetaDataChunker：旧版 vs 单遍扫描版，在不同规模的大文档上对比"""
+    from Indexer.Chunker import MetaDataChunker
+
+    with open(args.data, "r", encoding="utf-8") as f:
+        base = f.read()
+    chunker = MetaDataChunker(chunk_size=args.chunk_size)
+    for scale in (1, 10, 100):
+        text = (base + "\n") * scale * 10
+        legacy_cost, legacy = timeit(_legacy_metadata_split, text, args.chunk_size,
+                                     chunker.separators, repeat=args.repeat)
+        new_cost, spans = timeit(lambda t: list(chunker.iter_spans(t)), text, repeat=args.repeat)
+        print(f"  - {len(text) / 1e6:7.2f}M chars  legacy={legacy_cost:.3f}s ({len(legacy)} chunks)  "
+              f"streaming={new_cost:.3f}s ({len(spans)} chunks)  speedup={legacy_cost / max(new_cost, 1e-9):.1f}x")
+
+
+def _legacy_jieba_sentence_split(text: str) -> List[str]:
+    """旧版 SemanticNLTKChunker 的中文分句：整段 jieba 分词后找句末标点，仅作对照"""
+    import jieba
+    delimiters = {'。', '！', '？', '；', '…'}
+    sentences, buffer = [], []
+    for word in jieba.cut(text):
+        buffer.append(word)
+        if word in delimiters:
+            sentences.append(''.join(buffer))
+            buffer = []
+    if buffer:
+        sentences.append(''.join(buffer))
+    return sentences
+
+
+def bench_nltk(args):
+    """SemanticNLTKChunker：jieba 分句 vs 正则分句，以及文档列表并行分块的吞吐量"""
+    from Indexer.Chunker import SemanticNLTKChunker
+
+    docs = load_texts(args.data, args.limit)
+    total_chars = sum(len(doc) for doc in docs)
+    chunker = SemanticNLTKChunker(chunk_size=args.chunk_size)
+
+    legacy_cost, _ = timeit(lambda: [_legacy_jieba_sentence_split(doc) for doc in docs], repeat=args.repeat)
+    regex_cost, _ = timeit(lambda: [chunker._chinese_sentence_split(doc) for doc in docs], repeat=args.repeat)
+    print(f"  - 分句 jieba={legacy_cost:.3f}s  regex={regex_cost:.3f}s  "
+          f"speedup={legacy_cost / max(regex_cost, 1e-9):.1f}x")
+
+    for n_jobs in sorted({1, 2, args.workers}):
+        chunker.n_jobs = n_jobs
+        cost, chunks = timeit(chunker.chunk, docs, repeat=args.repeat)
+        print(f"  - n_jobs={n_jobs:<3} {cost:.3f}s  {total_chars / cost / 1e6:.2f}M chars/s  ({len(chunks)} chunks)")
+
+
+def _legacy_json_records(file_path: str) -> list:
+    """旧版 JsonProcessor：整个文件读入内存后循环 raw_decode，仅作对照"""
+    with open(file_path, "r", encoding="utf8") as f:
+        content = f.read()
+    decoder = json.JSONDecoder()
+    records, idx = [], 0
+    while idx < len(content):
+        while idx < len(content) and content[idx].isspace():
+            idx += 1
+        if idx >= len(content):
+            break
+        obj, idx = decoder.raw_decode(content, idx=idx)
+        records.append(obj)
+    return records
+
+
+def bench_json(args):
+    """JsonProcessor：整读 vs 流式解析的耗时与 Python 堆峰值"""
+    import tracemalloc
+    from Indexer.DataProcessor import JsonProcessor
+
+    processor = JsonProcessor()
+
+    def consume(iterable) -> int:
+        return sum(1 for _ in iterable)
+
+    cases = [
+        ("legacy", lambda: consume(_legacy_json_records(args.data))),
+        ("stream", lambda: consume(processor.iter_records(args.data))),
+    ]
+    size = os.path.getsize(args.data) / 1e6
+    for name, func in cases:
+        cost, count = timeit(func, repeat=args.repeat)
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"  - {name:<7} {cost:.3f}s  {size / cost:.1f} MB/s  peak={peak / 1e6:.1f}MB  ({count} records)")
+
+
+class _FakeLLMHandler(BaseHTTPRequestHandler):
+    """本地假 OpenAI / Ollama 接口：固定延迟后返回一段回答，记录客户端连接"""
+    protocol_version = "HTTP/1.1"  # 支持 keep-alive
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.connections.add(self.client_address)
+        self.server.requests = getattr(self.server, "requests", 0) + 1
+        time.sleep(self.server.latency)
+        if getattr(self.server, "fail", False):
+            body = json.dumps({"error": "fake backend failure"}).encode("utf-8")
+            self.send_response(500)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.path.endswith("/chat/completions"):
+            payload = {
+                "id": "fake", "object": "chat.completion", "created": 0, "model": "fake",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }
+            body = json.dumps(payload).encode("utf-8")
+            content_type = "application/json"
+        else:  # /api/generate，ollama 客户端按 NDJSON 流读取
+            payload = {"model": "fake", "created_at": "2025-01-01T00:00:00Z", "response": "ok", "done": True}
+            body = (json.dumps(payload) + "\n").encode("utf-8")
+            content_type = "application/x-ndjson"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 对冲落败的请求已被客户端取消
+
+    def log_message(self, *args):
+        pass
+
+
+def _legacy_openai_call(base_url: str, query: str, chunks: List[str]):
+    """旧版 DeepseekAPIGenerator：每次调用新建 OpenAI 客户端，仅作对照"""
+    from openai import OpenAI
+    client = OpenAI(api_key="sk-xxx", base_url=base_url)
+    return client.chat.completions.create(model="fake", messages=[{"role": "user", "content": query}], stream=False)
+
+
+def _legacy_ollama_call(base_url: str, query: str, chunks: List[str]):
+    """旧版 DeepseekOllamaGenerator：每次调用新建 OllamaLLM 与 prompt chain，仅作对照"""
+    from langchain_core.prompts import PromptTemplate
+    from langchain_ollama import OllamaLLM
+    llm = OllamaLLM(model="fake", base_url=base_url)
+    chain = PromptTemplate(input_variables=["query", "context"], template="{query}\n\n{context}") | llm
+    return chain.invoke({"context": "".join(chunks), "query": query})
+
+
+def bench_llm(args):
+    """生成器客户端：每次新建 vs 长连接池（同步线程并发 / 异步并发），对接本地假接口"""
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from Generator.Generate import DeepseekAPIGenerator, DeepseekOllamaGenerator
+
+    server = _start_fake_server(args.latency)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    query, chunks = "西红柿炒蛋怎么做？", ["参考片段"] * 3
+
+    def run_sync(call) -> float:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            list(executor.map(lambda _: call(query, chunks), range(args.limit)))
+        return time.perf_counter() - start
+
+    def run_async(acall) -> float:
+        async def main():
+            semaphore = asyncio.Semaphore(args.workers)
+
+            async def one():
+                async with semaphore:
+                    await acall(query, chunks)
+            await asyncio.gather(*(one() for _ in range(args.limit)))
+        start = time.perf_counter()
+        asyncio.run(main())
+        return time.perf_counter() - start
+
+    pooled_api = DeepseekAPIGenerator(base_url=f"{base_url}/v1", model="fake", max_connections=args.workers)
+    pooled_ollama = DeepseekOllamaGenerator(model="fake", base_url=base_url, max_connections=args.workers)
+    cases = [
+        ("openai legacy", lambda: run_sync(lambda q, c: _legacy_openai_call(f"{base_url}/v1", q, c))),
+        ("openai pooled", lambda: run_sync(pooled_api.generate)),
+        ("openai async", lambda: run_async(pooled_api.agenerate)),
+        ("ollama legacy", lambda: run_sync(lambda q, c: _legacy_ollama_call(base_url, q, c))),
+        ("ollama pooled", lambda: run_sync(pooled_ollama.generate)),
+        ("ollama async", lambda: run_async(pooled_ollama.agenerate)),
+    ]
+    print(f"📋 requests={args.limit} concurrency={args.workers} server_latency={args.latency}s")
+    for name, func in cases:
+        server.connections.clear()
+        cost = func()
+        print(f"  - {name:<14} {cost:.3f}s  {args.limit / cost:7.1f} req/s  "
+              f"tcp_connections={len(server.connections)}")
+    print(f"  - openai pool: {pooled_api.pool_stats()}")
+    print(f"  - ollama pool: {pooled_ollama.pool_stats()}")
+    pooled_api.close()
+    pooled_ollama.close()
+    server.shutdown()
+
+
+def _start_fake_server(latency: float) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeLLMHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.connections = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench_router(args):
+    """多后端路由：快 / 慢（10 倍延迟）/ 故障三个本地假 Ollama 接口，对比各策略的分布、尾延迟与失败数"""
+    import asyncio
+    from Generator.Generate import DeepseekOllamaGenerator, RoutedOllamaGenerator
+
+    servers = {
+        "fast": _start_fake_server(args.latency),
+        "slow": _start_fake_server(args.latency * 10),
+        "broken": _start_fake_server(args.latency),
+    }
+    servers["broken"].fail = True
+    urls = [f"http://127.0.0.1:{server.server_address[1]}" for server in servers.values()]
+    query, chunks = "西红柿炒蛋怎么做？", ["参考片段"] * 3
+
+    def run(generator) -> dict:
+        latencies, errors = [], 0
+
+        async def main():
+            semaphore = asyncio.Semaphore(args.workers)
+
+            async def one():
+                nonlocal errors
+                async with semaphore:
+                    start = time.perf_counter()
+                    try:
+                        await generator.agenerate(query, chunks)
+                        latencies.append(time.perf_counter() - start)
+                    except ValueError:
+                        errors += 1
+            await asyncio.gather(*(one() for _ in range(args.limit)))
+        start = time.perf_counter()
+        asyncio.run(main())
+        latencies.sort()
+        pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else float("nan")
+        return {"cost": time.perf_counter() - start, "p50": pct(0.5), "p99": pct(0.99), "errors": errors}
+
+    cases = [
+        ("single endpoint", lambda: DeepseekOllamaGenerator(model="fake", base_url=urls[1])),
+        ("least_outstanding", lambda: RoutedOllamaGenerator(urls, model="fake", policy="least_outstanding")),
+        ("ewma", lambda: RoutedOllamaGenerator(urls, model="fake", policy="ewma")),
+        ("ewma + hedge", lambda: RoutedOllamaGenerator(urls, model="fake", policy="ewma", hedge_after="auto")),
+    ]
+    print(f"📋 requests={args.limit} concurrency={args.workers} latency fast={args.latency}s "
+          f"slow={args.latency * 10}s broken=500")
+    for name, factory in cases:
+        for server in servers.values():
+            server.requests = 0
+        generator = factory()
+        result = run(generator)
+        spread = " ".join(f"{key}={server.requests}" for key, server in servers.items())
+        print(f"  - {name:<18} {result['cost']:.3f}s  p50={result['p50']:.1f}ms  p99={result['p99']:.1f}ms  "
+              f"errors={result['errors']}  backend_requests: {spread}")
+        routing = generator.pool_stats().get("routing")
+        if routing:
+            print(f"      retries={routing['retries']} hedges={routing['hedges']} hedge_wins={routing['hedge_wins']} "
+                  f"hedges_denied={routing['hedges_denied']} "
+                  f"ejections={[b['ejections'] for b in routing['backends']]}")
+        generator.close()
+    for server in servers.values():
+        server.shutdown()
+
+
+BENCHMARKS = {
+    "onnx": bench_onnx,
+    "import": bench_import,
+    "chunker": bench_chunker,
+    "nltk": bench_nltk,
+    "json": bench_json,
+    "llm": bench_llm,
+    "router": bench_router,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OneTinyRAG 性能基准")
+    parser.add_argument("name", choices=sorted(BENCHMARKS.keys()))
+    parser.add_argument("--model", default="BAAI/bge-small-zh-v1.5")
+    parser.add_argument("--data", default=os.path.join(project_dir, "Dataset/sample.txt"))
+    parser.add_argument("--limit", type=int, default=2000)
+    parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chunk_size", type=int, default=128)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--latency", type=float, default=0.02, help="假 LLM 接口的固定响应延迟（秒）")
+    args = parser.parse_args()
+    BENCHMARKS[args.name](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+解析缓存管理
+用法:
+    python Tools/CacheTool.py stats
+    python Tools/CacheTool.py list
+    python Tools/CacheTool.py prune --older_than 30 --max_size 512
+    python Tools/CacheTool.py clear
+"""
+
+import os
+import sys
+import time
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(current_dir)
+sys.path.append(project_dir)
+
+from Indexer.ParseCache import ParseCache
+
+
+def cmd_stats(cache: ParseCache, args) -> None:
+    summary = cache.summary()
+    print(f"📦 {cache.cache_dir}")
+    print(f"  - 条目 {summary['entries']}  文件 {summary['files']}  大小 {summary['bytes'] / 1e6:.2f}MB")
+
+
+def cmd_list(cache: ParseCache, args) -> None:
+    now = time.time()
+    for key, entry in sorted(cache.entries.items(), key=lambda item: item[1]["path"]):
+        try:
+            st = os.stat(entry["path"])
+            fresh = st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime_ns"]
+            state = "ok" if fresh else "changed"
+        except OSError:
+            state = "missing"
+        idle_days = (now - entry["last_access"]) / 86400
+        print(f"  {key[:12]}  {entry['processor']:<14} v{entry['version']}  {entry['kind']:<9} "
+              f"{entry['bytes'] / 1e3:9.1f}KB  idle={idle_days:5.1f}d  {state:<7}  {entry['path']}")
+
+
+def cmd_prune(cache: ParseCache, args) -> None:
+    removed = cache.prune(
+        stale=not args.keep_stale,
+        older_than=args.older_than * 86400 if args.older_than is not None else None,
+        max_bytes=int(args.max_size * 1e6) if args.max_size is not None else None,
+    )
+    print(f"🧹 已清理 {len(removed)} 条")
+    cmd_stats(cache, args)
+
+
+def cmd_clear(cache: ParseCache, args) -> None:
+    count = len(cache.entries)
+    cache.clear()
+    print(f"🧹 已清空 {count} 条")
+
+
+COMMANDS = {
+    "stats": cmd_stats,
+    "list": cmd_list,
+    "prune": cmd_prune,
+    "clear": cmd_clear,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OneTinyRAG 解析缓存管理")
+    parser.add_argument("command", choices=list(COMMANDS.keys()))
+    parser.add_argument("--dir", default=None, help="缓存目录，默认 Cache/parsed")
+    parser.add_argument("--older_than", type=float, default=None, help="清理超过 N 天未访问的条目")
+    parser.add_argument("--max_size", type=float, default=None, help="按最近访问时间淘汰到 N MB 以内")
+    parser.add_argument("--keep_stale", action="store_true", help="prune 时保留源文件已变化/删除的条目")
+    args = parser.parse_args()
+    COMMANDS[args.command](ParseCache(args.dir), args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+异步服务中阻塞任务的执行池：
+    1. 每类任务一个固定大小的线程池（检索 / 同步 LLM 调用），互不挤占，事件循环只负责调度
+    2. 统计提交数、排队数、运行数、饱和度（运行数 / 线程数）、排队耗时与执行耗时分位数
+"""
+
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+
+class ExecutorPool:
+    def __init__(self, name: str, max_workers: int = 4):
+        if max_workers < 1:
+            raise ValueError(f"ExecutorPool -> max_workers must be >= 1, got {max_workers}")
+        self.name = name
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"pool-{name}")
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=512)
+        self._runs = deque(maxlen=512)
+        self.submitted = 0
+        self.queued = 0
+        self.running = 0
+        self.peak_queued = 0
+        self.completed = 0
+        self.errors = 0
+
+    def _execute(self, submitted_at: float, func: Callable, *args, **kwargs) -> Any:
+        start = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self._waits.append(start - submitted_at)
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self._runs.append(time.perf_counter() - start)
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """在池中执行阻塞函数并等待结果，不阻塞事件循环"""
+        with self._lock:
+            self.submitted += 1
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, partial(self._execute, time.perf_counter(), func, *args, **kwargs))
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            waits, runs = sorted(self._waits), sorted(self._runs)
+            stats = {
+                "max_workers": self.max_workers,
+                "running": self.running,
+                "queued": self.queued,
+                "saturation": round(self.running / self.max_workers, 3),
+                "peak_queued": self.peak_queued,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "errors": self.errors,
+            }
+
+        def pct(values, q: float) -> Optional[float]:
+            return round(values[min(len(values) - 1, int(q * len(values)))], 4) if values else None
+
+        stats.update({
+            "wait_p50": pct(waits, 0.5), "wait_p95": pct(waits, 0.95),
+            "run_p50": pct(runs, 0.5), "run_p95": pct(runs, 0.95),
+        })
+        return stats
+
+    def shutdown(self, wait: bool = False) -> None:
+        self.executor.shutdown(wait=wait, cancel_futures=True)
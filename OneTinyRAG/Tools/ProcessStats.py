@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+进程内存统计：优先读取 /proc/<pid>/smaps_rollup
+    - rss: 常驻内存，写时复制共享的页在每个进程中都会计入
+    - pss: 按共享进程数均摊后的内存，多个 worker 的 pss 之和即实际占用
+    - shared / private: 共享页与私有页
+非 Linux 系统退化为当前进程的峰值 RSS
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+_ROLLUP_FIELDS = {
+    "Rss": "rss", "Pss": "pss",
+    "Shared_Clean": "shared", "Shared_Dirty": "shared",
+    "Private_Clean": "private", "Private_Dirty": "private",
+}
+
+
+def memory_info(pid: Optional[int] = None) -> Dict[str, Any]:
+    """单个进程的内存（MB）"""
+    pid = pid or os.getpid()
+    info: Dict[str, Any] = {"pid": pid}
+    try:
+        kb = {"rss": 0, "pss": 0, "shared": 0, "private": 0}
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in _ROLLUP_FIELDS:
+                    kb[_ROLLUP_FIELDS[name]] += int(value.split()[0])
+        info.update({f"{key}_mb": round(value / 1024, 1) for key, value in kb.items()})
+        return info
+    except FileNotFoundError:
+        info["alive"] = False
+        return info
+    except OSError:
+        pass
+    if pid == os.getpid():
+        import resource
+        # Linux 单位为 KB，macOS 为字节
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        info["max_rss_mb"] = round(max_rss / (1024 * 1024 if os.uname().sysname == "Darwin" else 1024), 1)
+    return info
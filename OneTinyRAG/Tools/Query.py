@@ -8,29 +8,12 @@
     @Time: 2025-06-08 23:33:50
 """
 
-from langchain.docstore.document import Document
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings, OpenAIEmbeddings
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from langchain_community.llms import Ollama
-from langchain.chains.combine_documents.stuff import StuffDocumentsChain
-from langchain.chains import RetrievalQA
-from sentence_transformers import SentenceTransformer
-from collections import deque, defaultdict
-from abc import ABC, abstractmethod
-from typing import List
-from openai import OpenAI
-import faiss 
-import numpy as np 
 import json
-import re
 import asyncio
 import sys
 import os
-from .Workflow import run, analyze_workflow, print_workflow_results,workflow, task_func_default
-from .Utils import format_template, save_dict, extract_json_blocks
-from .Utils import ApiQuery, OllamaDeepseekQuery
+from .Workflow import run, analyze_workflow, print_workflow_results
+from .Utils import format_template, save_dict
 from Mappers.Mappers import QUERY_MODEL_MAPPING, TASK_FUNC_MAPPING, TASK_LLM_MAPPING
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+单飞（single-flight）请求合并：相同 key 的并发请求只执行一次流水线
+    1. do(): 协程结果共享，执行任务与请求解耦（shield），某个客户端断开不影响其他等待者
+    2. stream(): 流式事件广播，后加入的订阅者先回放已产生的事件，再实时接收后续 token
+       所有订阅者都断开时取消执行任务
+    3. 只合并执行中的请求，完成后立即移除，不做结果缓存
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List
+
+
+class EventBroadcast:
+    """单生产者、多订阅者的事件缓冲；事件全部保留以便迟到的订阅者回放"""
+
+    def __init__(self):
+        self.events: List[Any] = []
+        self.done = False
+        self.abandoned = False   # 订阅者全部断开、任务已取消，不再接受新订阅
+        self.subscribers = 0
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        # 每次发布换一个 Event，等待中的订阅者全部唤醒，无需加锁
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def publish(self, event: Any) -> None:
+        self.events.append(event)
+        self._notify()
+
+    def close(self) -> None:
+        self.done = True
+        self._notify()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        self.subscribers += 1
+        index = 0
+        try:
+            while True:
+                while index < len(self.events):
+                    yield self.events[index]
+                    index += 1
+                if self.done:
+                    return
+                await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done and self.task is not None:
+                self.abandoned = True
+                self.task.cancel()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._streams: Dict[Hashable, EventBroadcast] = {}
+        self.stats = {"executions": 0, "coalesced": 0, "stream_executions": 0, "stream_coalesced": 0}
+
+    def in_flight(self) -> Dict[str, int]:
+        return {"calls": len(self._calls), "streams": len(self._streams)}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """key 相同的并发调用共享同一次 func() 的结果（或异常）"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+            self.stats["executions"] += 1
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def stream(self, key: Hashable, producer: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """key 相同的并发流式请求订阅同一个事件流"""
+        broadcast = self._streams.get(key)
+        if broadcast is None or broadcast.abandoned:
+            broadcast = EventBroadcast()
+            self._streams[key] = broadcast
+            broadcast.task = asyncio.ensure_future(self._pump(key, broadcast, producer()))
+            self.stats["stream_executions"] += 1
+        else:
+            self.stats["stream_coalesced"] += 1
+        return broadcast.subscribe()
+
+    async def _pump(self, key: Hashable, broadcast: EventBroadcast, events: AsyncIterator[Any]) -> None:
+        try:
+            async for event in events:
+                broadcast.publish(event)
+        finally:
+            if self._streams.get(key) is broadcast:
+                del self._streams[key]
+            broadcast.close()
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+文本 token 切分规则：MetaDataChunker 按它切块，ContextPacker 按它估算 prompt token 数
+两处共用同一份定义，保证切块大小与装箱预算口径一致
+"""
+
+import re
+
+# 单个中日韩字符 / 英文单词或数字 / 换行 / 其他单个标点
+TOKEN_PATTERN = re.compile(
+    r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]"
+    r"|\d+(?:\.\d+)*"
+    r"|[A-Za-z_]+(?:['’][A-Za-z]+)?"
+    r"|\n"
+    r"|[^\s\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaffA-Za-z0-9_]"
+)
@@ -8,31 +8,10 @@
     @Time: 2025-06-08 23:33:50
 """
 
-from abc import ABC, abstractmethod
-from typing import List
-from langchain.docstore.document import Document
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings, OpenAIEmbeddings
-from sentence_transformers import SentenceTransformer
-import faiss 
-import numpy as np 
-from openai import OpenAI
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from langchain_community.llms import Ollama
-from langchain.chains.combine_documents.stuff import StuffDocumentsChain
-from langchain.chains import RetrievalQA
 import sys
 import os
-from collections import defaultdict, deque
-import asyncio
-from collections import deque
-from typing import Dict, List, Any, Callable, Coroutine, Optional
-import asyncio
 import json
-from typing import Dict, List, Any, Callable, Coroutine
-from openai import OpenAI
-import ollama
+from typing import Dict, List, Any, Callable, Coroutine, Optional
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
@@ -223,6 +202,7 @@ def merge_branch(dict_a: dict, dict_b: dict) -> dict:
 
 
 def ApiQuery(query, llm_model="deepseek-chat", api_key="sk-xxx", base_url="https://api.deepseek.com")->dict:
+    from openai import OpenAI
     client = OpenAI(api_key=api_key, base_url=base_url)
     messages=[{"role": "system", "content": ""},{"role": "user", "content": f"{query}"},]
     
@@ -236,6 +216,7 @@ def ApiQuery(query, llm_model="deepseek-chat", api_key="sk-xxx", base_url="https
     return result
 
 def OllamaDeepseekQuery(query, model_name="deepseek-r1:7b")->dict:
+    import ollama
     response = ollama.generate(
         model=model_name,
         prompt=query
@@ -19,7 +19,6 @@ from typing import Dict, List, Any, Callable, Coroutine, Optional
 import asyncio
 import json
 from typing import Dict, List, Any, Callable, Coroutine
-from openai import OpenAI
 from .Utils import save_dict, format_template, extract_json_blocks
 from .Utils import merge_branch, ApiQuery, OllamaDeepseekQuery
 
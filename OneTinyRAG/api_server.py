@@ -10,9 +10,11 @@ import os
 import sys
 import json
 import time
+import asyncio
 import logging
 from typing import List, Optional, Dict, Any
-from contextlib import asynccontextmanager
+from collections.abc import Mapping
+from contextlib import asynccontextmanager, nullcontext
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
@@ -28,6 +30,10 @@ from Indexer.Indexer import Indexer
 from Retriever.Retriever import Retriever
 from Generator.Generator import Generator
 from Tools.Query import Query
+from Tools.SingleFlight import SingleFlight
+from Tools.Admission import AdmissionController, Overloaded, retry_after_header
+from Tools.Executors import ExecutorPool
+from Tools.ProcessStats import memory_info
 
 # 配置日志
 logging.basicConfig(
@@ -42,6 +48,68 @@ logger = logging.getLogger(__name__)
 
 # 全局变量存储模型组件
 app_state = {}
+# 相同问题的并发请求合并为一次检索 + 生成
+coalescer = SingleFlight()
+
+def load_config(config_path: Optional[str] = None) -> dict:
+    config_path = config_path or os.path.join(current_dir, 'Config/config7.json')
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def build_index_state(config: dict, allow_watch: bool = True) -> Dict[str, Any]:
+    """
+    构建索引、chunk 列表与检索器（含 BM25）
+    
+    单进程模式在 lifespan 中调用；多进程模式（serve.py）在 fork 前调用一次，各 worker 写时复制共享
+    """
+    # 初始化索引器
+    indexer = Indexer(config)
+    dataset_path = os.path.join(current_dir, "Dataset/sample.txt")
+    
+    logger.info("构建向量索引...")
+    watch_cfg = config.get("watch", {})
+    live_index, watcher = None, None
+    if watch_cfg.get("enabled", False) and not allow_watch:
+        logger.warning("多进程模式下各 worker 的索引无法同步增量更新，已忽略 watch 配置")
+    if watch_cfg.get("enabled", False) and allow_watch:
+        # 监听模式：按文件维护索引，数据集目录变化时增量更新
+        from Indexer.Watcher import LiveIndex, IndexWatcher
+        watch_paths = [os.path.join(current_dir, path) for path in watch_cfg.get("paths", [dataset_path])]
+        live_index = LiveIndex(indexer)
+        snapshot = live_index.build(watch_paths)
+        textIndex, txtChunks = live_index.index, live_index.chunks
+    else:
+        textIndex, txtChunks = indexer.index(dataset_path)
+    
+    # 初始化检索器，BM25 等惰性结构提前构建
+    retriever = Retriever(
+        DocEmbedder=indexer.DocEmbedder.embedder, 
+        textIndex=textIndex, 
+        config=config
+    )
+    retriever.warmup(txtChunks)
+    if live_index is not None:
+        watcher = IndexWatcher(
+            live_index,
+            watch_paths,
+            snapshot,
+            interval=watch_cfg.get("interval", 2.0),
+            debounce=watch_cfg.get("debounce", 1.0),
+            use_inotify=watch_cfg.get("use_inotify", True),
+            on_prepare=retriever.prepare_refresh,
+            on_update=lambda live, prepared: retriever.refresh(live.index, prepared),
+        ).start()
+        logger.info(f"已启动目录监听: {watch_paths}")
+    
+    return {
+        'config': config,
+        'indexer': indexer,
+        'retriever': retriever,
+        'txtChunks': txtChunks,
+        'textIndex': textIndex,
+        'watcher': watcher,
+        'index_lock': live_index.lock if live_index is not None else None,
+    }
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -49,36 +117,30 @@ async def lifespan(app: FastAPI):
     logger.info("正在初始化 RAG 系统...")
     
     try:
-        # 加载配置
-        config_path = os.path.join(current_dir, 'Config/config7.json')
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-        
-        # 初始化索引器
-        indexer = Indexer(config)
-        dataset_path = os.path.join(current_dir, "Dataset/sample.txt")
-        
-        logger.info("构建向量索引...")
-        textIndex, txtChunks = indexer.index(dataset_path)
-        
-        # 初始化检索器
-        retriever = Retriever(
-            DocEmbedder=indexer.DocEmbedder.embedder, 
-            textIndex=textIndex, 
-            config=config
-        )
+        if 'retriever' not in app_state:
+            app_state.update(build_index_state(load_config()))
+        else:
+            # serve.py 多进程模式：索引已在 fork 前预加载
+            logger.info(f"worker {os.getpid()} 复用预加载的索引（{len(app_state['txtChunks'])} 个 chunk）")
+        config = app_state['config']
         
+        # 以下组件持有连接池 / 线程，必须在每个进程内创建
         # 初始化生成器
         generator = Generator(config)
+        # LLM 准入控制：并发上限 + 优先级队列 + 截止时间
+        admission = AdmissionController(**config.get("server", {}).get("admission", {}))
+        # 阻塞任务执行池：检索（CPU）与同步 LLM 调用（I/O）分池，避免阻塞事件循环
+        executor_cfg = config.get("server", {}).get("executors", {})
+        executors = {
+            'retrieval': ExecutorPool('retrieval', executor_cfg.get('retrieval_workers', min(4, os.cpu_count() or 1))),
+            'io': ExecutorPool('io', executor_cfg.get('io_workers', 16)),
+        }
         
         # 存储到全局状态
         app_state.update({
-            'config': config,
-            'indexer': indexer,
-            'retriever': retriever,
             'generator': generator,
-            'txtChunks': txtChunks,
-            'textIndex': textIndex
+            'admission': admission,
+            'executors': executors,
         })
         
         logger.info("RAG 系统初始化完成!")
@@ -90,6 +152,13 @@ async def lifespan(app: FastAPI):
     
     # 清理资源
     logger.info("正在清理资源...")
+    if app_state.get('watcher') is not None:
+        app_state['watcher'].stop()
+    for pool in app_state.get('executors', {}).values():
+        pool.shutdown()
+    if app_state.get('generator') is not None:
+        await app_state['generator'].aclose()
+        app_state['generator'].close()
 
 # 创建 FastAPI 应用
 app = FastAPI(
@@ -113,6 +182,32 @@ class QueryRequest(BaseModel):
     query: str = Field(..., description="用户问题", min_length=1, max_length=500)
     top_k: Optional[int] = Field(3, description="检索数量", ge=1, le=10)
     enable_query_optimization: Optional[bool] = Field(False, description="是否启用查询优化")
+    priority: Optional[int] = Field(0, description="生成排队优先级，越大越优先", ge=0, le=9)
+    deadline: Optional[float] = Field(None, description="最长排队时间（秒），预计等待超出时直接返回 503", gt=0, le=600)
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str] = Field(..., description="问题列表", min_length=1, max_length=1000)
+    top_k: Optional[int] = Field(3, description="检索数量", ge=1, le=10)
+    concurrency: Optional[int] = Field(4, description="同时进行的生成数", ge=1, le=32)
+    batch_size: Optional[int] = Field(64, description="每批检索的问题数，检索一批即开始生成", ge=1, le=1000)
+    priority: Optional[int] = Field(0, description="生成排队优先级，越大越优先", ge=0, le=9)
+    deadline: Optional[float] = Field(None, description="单条生成的最长排队时间（秒）", gt=0, le=600)
+
+class RetrieveRequest(BaseModel):
+    query: str = Field(..., description="检索文本", min_length=1, max_length=500)
+    top_k: Optional[int] = Field(5, description="返回数量", ge=1, le=50)
+    metadata_fields: Optional[List[str]] = Field(None, description="返回的 metadata 字段，为空时返回全部")
+
+class ScoredChunk(BaseModel):
+    chunk_id: int
+    content: str
+    scores: Dict[str, Optional[float]]
+    metadata: Dict[str, Any] = {}
+
+class RetrieveResponse(BaseModel):
+    query: str
+    results: List[ScoredChunk]
+    retrieval_time_ms: float
 
 class RetrievalResult(BaseModel):
     content: str
@@ -126,12 +221,77 @@ class QueryResponse(BaseModel):
     retrieved_chunks: List[RetrievalResult]
     processing_time: float
     timestamp: str
+    prompt_tokens: Optional[int] = None
 
 class StreamResponse(BaseModel):
     type: str  # "chunk" | "metadata" | "error" | "done"
     content: str
     metadata: Optional[Dict[str, Any]] = None
 
+def retrieve_chunks(user_query: str, top_k: int) -> List:
+    """检索；监听模式下与增量索引提交互斥，保证 FAISS 行与 chunks 对齐"""
+    lock = app_state.get('index_lock') or nullcontext()
+    with lock:
+        return app_state['retriever'].retrieval(
+            user_query, 
+            app_state['txtChunks'], 
+            imgChunks=None, 
+            top_k=top_k
+        )
+
+async def run_blocking(pool: str, func, *args, **kwargs):
+    """在指定执行池中运行阻塞函数（检索 / 查询优化等），事件循环继续处理其他请求"""
+    executors = app_state.get('executors')
+    if not executors:
+        return func(*args, **kwargs)
+    return await executors[pool].run(func, *args, **kwargs)
+
+def retrieve_scored(user_query: str, top_k: int) -> List[Dict[str, Any]]:
+    """只检索、不生成：带 chunk_id 与各路得分的完整结果"""
+    lock = app_state.get('index_lock') or nullcontext()
+    with lock:
+        return app_state['retriever'].retrieval_scored(user_query, app_state['txtChunks'], top_k=top_k)
+
+def retrieve_chunks_batch(queries: List[str], top_k: int) -> List[List]:
+    """批量检索：一次向量化 + 一次 FAISS 检索；与增量索引提交互斥"""
+    lock = app_state.get('index_lock') or nullcontext()
+    with lock:
+        return app_state['retriever'].retrieval_batch(
+            queries,
+            app_state['txtChunks'],
+            imgChunks=None,
+            top_k=top_k
+        )
+
+def answer_text(answer) -> str:
+    """生成器返回值 -> 文本（OpenAI 格式取第一条回复）"""
+    if hasattr(answer, 'choices'):
+        return answer.choices[0].message.content
+    return answer if isinstance(answer, str) else str(answer)
+
+def format_retrieved(retrieval_chunks: List) -> List[Dict[str, Any]]:
+    """检索结果 -> 返回给客户端的摘要（内容截断到 200 字）"""
+    results = []
+    txt_chunks = retrieval_chunks[0] if retrieval_chunks and retrieval_chunks[0] else []
+    for chunk in txt_chunks:
+        if isinstance(chunk, Mapping):  # dict 或 SpanChunk
+            content = chunk.get('page_content', str(chunk))
+            metadata = chunk.get('metadata', {})
+        else:
+            content = str(chunk)
+            metadata = {}
+        results.append({
+            "content": content[:200] + "..." if len(content) > 200 else content,
+            "metadata": metadata,
+        })
+    return results
+
+def sse_event(event_type: str, content: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+    payload = {'type': event_type, 'content': content}
+    if metadata is not None:
+        payload['metadata'] = metadata
+    return f"data: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+
 # API 路由
 @app.get("/", summary="健康检查")
 async def root():
@@ -161,6 +321,61 @@ async def health_check():
         logger.error(f"健康检查失败: {e}")
         raise HTTPException(status_code=500, detail="系统状态检查失败")
 
+def admission_slot(request: QueryRequest):
+    """生成阶段的准入槽位；超出并发时按优先级排队，预计等待超过截止时间则抛出 Overloaded"""
+    return app_state['admission'].slot(request.priority or 0, request.deadline)
+
+def coalesce_key(request: QueryRequest) -> tuple:
+    """
+    合并键：规范化空白后的问题 + 影响结果的参数 + 准入参数
+    准入在合并后的任务内进行，优先级 / 截止时间不同的请求不能合并，否则首个请求被拒绝时其余请求一同被拒绝
+    """
+    return (" ".join(request.query.split()), request.top_k, bool(request.enable_query_optimization),
+            request.priority or 0, request.deadline)
+
+def coalescing_enabled() -> bool:
+    return app_state.get('config', {}).get("server", {}).get("coalesce", True)
+
+async def run_query_pipeline(request: QueryRequest) -> Dict[str, Any]:
+    """查询优化 -> 检索 -> 上下文组装 -> 生成，结果可被合并的并发请求共享"""
+    # 查询优化（可选）
+    user_query = request.query
+    if request.enable_query_optimization:
+        try:
+            user_query, task_dict, final_dict = await run_blocking(
+                'io', Query,
+                user_query=request.query, 
+                config=app_state['config']
+            )
+            logger.info(f"查询优化完成: {user_query}")
+        except Exception as e:
+            logger.warning(f"查询优化失败，使用原始查询: {e}")
+            user_query = request.query
+    
+    # 检索相关文档
+    retrieval_chunks = await run_blocking('retrieval', retrieve_chunks, user_query, request.top_k)
+    
+    # 构建检索结果
+    retrieved_results = [RetrievalResult(**item) for item in format_retrieved(retrieval_chunks)]
+    
+    # 生成答案：上下文按 token 预算组装
+    prompt_tokens = None
+    try:
+        packed = await run_blocking('retrieval', app_state['generator'].pack, user_query, retrieval_chunks)
+        prompt_tokens = packed.prompt_tokens
+        logger.info(f"上下文组装: {packed.stats}")
+        async with admission_slot(request):
+            answer = await app_state['generator'].agenerate(user_query, packed)
+        # 处理生成器返回的不同格式
+        answer = answer_text(answer)
+    except Overloaded:
+        raise
+    except Exception as e:
+        logger.error(f"生成答案失败: {e}")
+        answer = f"抱歉，生成答案时出现错误: {str(e)}"
+    
+    return {"answer": answer, "retrieved_results": retrieved_results, "prompt_tokens": prompt_tokens}
+
 @app.post("/query", response_model=QueryResponse, summary="同步问答")
 async def query_sync(request: QueryRequest, background_tasks: BackgroundTasks):
     """
@@ -169,6 +384,8 @@ async def query_sync(request: QueryRequest, background_tasks: BackgroundTasks):
     - **query**: 用户问题
     - **top_k**: 检索文档数量 (1-10)
     - **enable_query_optimization**: 是否启用查询优化
+    
+    相同问题的并发请求共享同一次检索与生成
     """
     start_time = time.time()
     
@@ -179,55 +396,10 @@ async def query_sync(request: QueryRequest, background_tasks: BackgroundTasks):
         if not all(key in app_state for key in ['retriever', 'generator']):
             raise HTTPException(status_code=503, detail="系统尚未初始化完成，请稍后重试")
         
-        # 查询优化（可选）
-        user_query = request.query
-        if request.enable_query_optimization:
-            try:
-                user_query, task_dict, final_dict = Query(
-                    user_query=request.query, 
-                    config=app_state['config']
-                )
-                logger.info(f"查询优化完成: {user_query}")
-            except Exception as e:
-                logger.warning(f"查询优化失败，使用原始查询: {e}")
-                user_query = request.query
-        
-        # 检索相关文档
-        retrieval_chunks = app_state['retriever'].retrieval(
-            user_query, 
-            app_state['txtChunks'], 
-            imgChunks=None, 
-            top_k=request.top_k
-        )
-        
-        # 构建检索结果
-        retrieved_results = []
-        txt_chunks = retrieval_chunks[0] if retrieval_chunks and retrieval_chunks[0] else []
-        
-        for i, chunk in enumerate(txt_chunks):
-            if isinstance(chunk, dict):
-                content = chunk.get('page_content', str(chunk))
-                metadata = chunk.get('metadata', {})
-            else:
-                content = str(chunk)
-                metadata = {}
-            
-            retrieved_results.append(RetrievalResult(
-                content=content[:200] + "..." if len(content) > 200 else content,
-                metadata=metadata
-            ))
-        
-        # 生成答案
-        try:
-            answer = app_state['generator'].generate(user_query, retrieval_chunks)
-            # 处理生成器返回的不同格式
-            if hasattr(answer, 'choices'):  # OpenAI 格式
-                answer = answer.choices[0].message.content
-            elif not isinstance(answer, str):
-                answer = str(answer)
-        except Exception as e:
-            logger.error(f"生成答案失败: {e}")
-            answer = f"抱歉，生成答案时出现错误: {str(e)}"
+        if coalescing_enabled():
+            result = await coalescer.do(coalesce_key(request), lambda: run_query_pipeline(request))
+        else:
+            result = await run_query_pipeline(request)
         
         processing_time = time.time() - start_time
         
@@ -235,22 +407,26 @@ async def query_sync(request: QueryRequest, background_tasks: BackgroundTasks):
         background_tasks.add_task(
             log_query_result, 
             request.query, 
-            answer, 
+            result['answer'], 
             processing_time, 
-            len(retrieved_results)
+            len(result['retrieved_results'])
         )
         
         return QueryResponse(
             success=True,
             query=request.query,
-            answer=answer,
-            retrieved_chunks=retrieved_results,
+            answer=result['answer'],
+            retrieved_chunks=result['retrieved_results'],
             processing_time=round(processing_time, 3),
-            timestamp=time.strftime("%Y-%m-%d %H:%M:%S")
+            timestamp=time.strftime("%Y-%m-%d %H:%M:%S"),
+            prompt_tokens=result['prompt_tokens']
         )
         
     except HTTPException:
         raise
+    except Overloaded as e:
+        logger.warning(f"请求被拒绝: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers=retry_after_header(e))
     except Exception as e:
         logger.error(f"查询处理失败: {e}")
         raise HTTPException(status_code=500, detail=f"查询处理失败: {str(e)}")
@@ -260,7 +436,8 @@ async def query_stream(request: QueryRequest):
     """
     流式问答接口 - 实时返回生成过程
     
-    返回 Server-Sent Events (SSE) 格式的流式数据
+    返回 Server-Sent Events (SSE) 格式的流式数据：先发送检索结果，再逐个转发模型 token，
+    done 事件中记录首 token 耗时
     """
     
     async def generate_stream():
@@ -268,62 +445,84 @@ async def query_stream(request: QueryRequest):
         
         try:
             # 发送开始信号
-            yield f"data: {json.dumps({'type': 'start', 'content': '开始处理查询...'})}\n\n"
+            yield sse_event('start', '开始处理查询...')
             
             # 检索阶段
-            yield f"data: {json.dumps({'type': 'retrieval', 'content': '正在检索相关文档...'})}\n\n"
+            yield sse_event('retrieval', '正在检索相关文档...')
             
             user_query = request.query
             if request.enable_query_optimization:
                 try:
-                    user_query, _, _ = Query(user_query=request.query, config=app_state['config'])
-                    yield f"data: {json.dumps({'type': 'optimization', 'content': f'查询优化: {user_query}'})}\n\n"
+                    user_query, _, _ = await run_blocking('io', Query, user_query=request.query, config=app_state['config'])
+                    yield sse_event('optimization', f'查询优化: {user_query}')
                 except Exception as e:
-                    yield f"data: {json.dumps({'type': 'warning', 'content': f'查询优化失败: {str(e)}'})}\n\n"
-            
-            retrieval_chunks = app_state['retriever'].retrieval(
-                user_query, 
-                app_state['txtChunks'], 
-                imgChunks=None, 
-                top_k=request.top_k
-            )
+                    yield sse_event('warning', f'查询优化失败: {str(e)}')
             
-            # 发送检索结果
-            txt_chunks = retrieval_chunks[0] if retrieval_chunks and retrieval_chunks[0] else []
-            yield f"data: {json.dumps({'type': 'retrieval_done', 'content': f'检索到 {len(txt_chunks)} 个相关文档'})}\n\n"
+            retrieval_chunks = await run_blocking('retrieval', retrieve_chunks, user_query, request.top_k)
             
-            # 生成阶段
-            yield f"data: {json.dumps({'type': 'generation', 'content': '正在生成答案...'})}\n\n"
+            # 生成开始前先发送检索结果
+            retrieved = format_retrieved(retrieval_chunks)
+            yield sse_event('retrieval_done', f'检索到 {len(retrieved)} 个相关文档', {
+                'chunks': retrieved,
+                'retrieval_time': round(time.time() - start_time, 3),
+            })
             
+            # 生成阶段：token 到达即转发
+            yield sse_event('generation', '正在生成答案...')
+            generation_start = time.time()
+            first_token_time = None
+            token_count = 0
             try:
-                answer = app_state['generator'].generate(user_query, retrieval_chunks)
-                if hasattr(answer, 'choices'):
-                    answer = answer.choices[0].message.content
-                elif not isinstance(answer, str):
-                    answer = str(answer)
-                
-                # 模拟流式输出（可根据实际生成器调整）
-                words = answer.split()
-                for i, word in enumerate(words):
-                    yield f"data: {json.dumps({'type': 'chunk', 'content': word + ' '})}\n\n"
-                    if i % 5 == 0:  # 每5个词休息一下
-                        time.sleep(0.1)
-                
+                packed = await run_blocking('retrieval', app_state['generator'].pack, user_query, retrieval_chunks)
+                logger.info(f"上下文组装: {packed.stats}")
+                async with admission_slot(request) as queue_wait:
+                    if queue_wait > 0:
+                        yield sse_event('queued', f'排队 {queue_wait:.2f}s 后开始生成')
+                    async for token in app_state['generator'].astream(user_query, packed):
+                        if first_token_time is None:
+                            first_token_time = time.time()
+                        token_count += 1
+                        yield sse_event('chunk', token)
+            except Overloaded as e:
+                yield sse_event('overloaded', str(e), {'retry_after': round(e.retry_after, 3)})
+                return
             except Exception as e:
-                yield f"data: {json.dumps({'type': 'error', 'content': f'生成失败: {str(e)}'})}\n\n"
+                yield sse_event('error', f'生成失败: {str(e)}')
                 return
             
             # 发送完成信号
             processing_time = time.time() - start_time
-            yield f"data: {json.dumps({'type': 'done', 'content': '处理完成', 'metadata': {'processing_time': round(processing_time, 3)}})}\n\n"
+            ttft = round(first_token_time - generation_start, 3) if first_token_time else None
+            logger.info(f"流式查询完成 - 首 token 耗时: {ttft}s | 总耗时: {processing_time:.3f}s | token 段数: {token_count}")
+            yield sse_event('done', '处理完成', {
+                'processing_time': round(processing_time, 3),
+                'time_to_first_token': ttft,
+                'time_to_first_token_from_request': round(first_token_time - start_time, 3) if first_token_time else None,
+                'token_chunks': token_count,
+                'prompt_tokens': packed.prompt_tokens,
+                'context': packed.stats,
+            })
             
         except Exception as e:
             logger.error(f"流式处理失败: {e}")
-            yield f"data: {json.dumps({'type': 'error', 'content': f'处理失败: {str(e)}'})}\n\n"
+            yield sse_event('error', f'处理失败: {str(e)}')
+    
+    if 'admission' in app_state:
+        # 流开始后无法再返回 503，预计排队超出截止时间的请求在此快速拒绝
+        try:
+            app_state['admission'].check(request.priority or 0, request.deadline)
+        except Overloaded as e:
+            raise HTTPException(status_code=503, detail=str(e), headers=retry_after_header(e))
+    
+    if coalescing_enabled():
+        # 相同问题的并发流式请求订阅同一次生成，迟到者先回放已产生的事件
+        events = coalescer.stream(("stream",) + coalesce_key(request), generate_stream)
+    else:
+        events = generate_stream()
     
     return StreamingResponse(
-        generate_stream(),
-        media_type="text/plain",
+        events,
+        media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
@@ -331,6 +530,174 @@ async def query_stream(request: QueryRequest):
         }
     )
 
+@app.post("/retrieve", response_model=RetrieveResponse, summary="仅检索")
+async def retrieve(request: RetrieveRequest):
+    """
+    仅检索接口 - 不调用生成器
+    
+    返回排序后的 chunk：chunk_id、完整内容、BM25 / dense / hybrid 得分（检索器不提供的为 null）
+    与指定的 metadata 字段；与问答接口共用检索器及查询向量缓存
+    """
+    if 'retriever' not in app_state:
+        raise HTTPException(status_code=503, detail="系统尚未初始化完成，请稍后重试")
+    start = time.perf_counter()
+    try:
+        hits = await run_blocking('retrieval', retrieve_scored, request.query, request.top_k)
+    except Exception as e:
+        logger.error(f"检索失败: {e}")
+        raise HTTPException(status_code=500, detail=f"检索失败: {str(e)}")
+    
+    fields = request.metadata_fields
+    results = []
+    for hit in hits:
+        metadata = hit.get('metadata') or {}
+        if fields is not None:
+            metadata = {key: metadata[key] for key in fields if key in metadata}
+        results.append(ScoredChunk(
+            chunk_id=hit['chunk_id'],
+            content=hit['page_content'],
+            scores=hit['scores'],
+            metadata=metadata,
+        ))
+    return RetrieveResponse(
+        query=request.query,
+        results=results,
+        retrieval_time_ms=round((time.perf_counter() - start) * 1000, 3),
+    )
+
+@app.post("/query/batch", summary="批量问答")
+async def query_batch(request: BatchQueryRequest):
+    """
+    批量问答接口 - 适用于评测与离线回填
+    
+    问题按 batch_size 分批检索（每批一次向量化 + FAISS 检索），检索完一批即开始生成，
+    最多 concurrency 条同时生成；结果以 NDJSON 逐行返回，完成一条输出一条（按完成顺序，index 为原始下标），
+    最后一行为汇总
+    """
+    if not all(key in app_state for key in ['retriever', 'generator']):
+        raise HTTPException(status_code=503, detail="系统尚未初始化完成，请稍后重试")
+    
+    async def generate_lines():
+        start_time = time.time()
+        results: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(request.concurrency)
+        tasks = []
+        
+        async def answer_one(index: int, query: str, retrieval_chunks: List, retrieved_at: float):
+            # 无论成功与否每个问题都必须输出一行，否则响应会一直等待
+            line = {'index': index, 'query': query}
+            try:
+                async with semaphore:
+                    line['retrieved_chunks'] = format_retrieved(retrieval_chunks)
+                    packed = await run_blocking('retrieval', app_state['generator'].pack, query, retrieval_chunks)
+                    line['prompt_tokens'] = packed.prompt_tokens
+                    async with admission_slot(request):
+                        answer = await app_state['generator'].agenerate(query, packed)
+                    line['answer'] = answer_text(answer)
+            except Overloaded as e:
+                line['error'] = str(e)
+                line['retry_after'] = round(e.retry_after, 3)
+            except Exception as e:
+                line['error'] = f'生成失败: {str(e)}'
+            finally:
+                line['processing_time'] = round(time.time() - retrieved_at, 3)
+                await results.put(line)
+        
+        async def fail_batch(offset: int, batch: List[str], error: str):
+            for i, query in enumerate(batch):
+                await results.put({'index': offset + i, 'query': query, 'error': error})
+        
+        async def dispatch():
+            # 分批检索，检索完成的批次立即进入生成
+            for offset in range(0, len(request.queries), request.batch_size):
+                batch = request.queries[offset:offset + request.batch_size]
+                try:
+                    batch_chunks = await run_blocking('retrieval', retrieve_chunks_batch, batch, request.top_k)
+                except Exception as e:
+                    logger.error(f"批量检索失败: {e}")
+                    await fail_batch(offset, batch, f'检索失败: {str(e)}')
+                    continue
+                if len(batch_chunks) != len(batch):
+                    # 结果数与问题数不一致时无法对应，整批报错
+                    logger.error(f"批量检索结果数不一致: 期望 {len(batch)}，实际 {len(batch_chunks)}")
+                    await fail_batch(offset, batch, f'检索失败: 期望 {len(batch)} 组结果，实际 {len(batch_chunks)} 组')
+                    continue
+                retrieved_at = time.time()
+                for i, (query, retrieval_chunks) in enumerate(zip(batch, batch_chunks)):
+                    tasks.append(asyncio.ensure_future(answer_one(offset + i, query, retrieval_chunks, retrieved_at)))
+            await asyncio.gather(*tasks)
+        
+        dispatcher = asyncio.ensure_future(dispatch())
+        failed = 0
+        try:
+            for _ in range(len(request.queries)):
+                line = await results.get()
+                failed += 'error' in line
+                yield json.dumps(line, ensure_ascii=False, default=str) + "\n"
+            await dispatcher
+            processing_time = time.time() - start_time
+            logger.info(f"批量问答完成 - 问题数: {len(request.queries)} | 失败: {failed} | 总耗时: {processing_time:.3f}s")
+            yield json.dumps({
+                'done': True,
+                'total': len(request.queries),
+                'failed': failed,
+                'processing_time': round(processing_time, 3),
+            }, ensure_ascii=False) + "\n"
+        finally:
+            # 客户端断开时取消尚未完成的检索与生成
+            dispatcher.cancel()
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(generate_lines(), media_type="application/x-ndjson")
+
+@app.get("/index/status", summary="增量索引状态")
+async def index_status():
+    """监听模式下的增量索引指标：入库延迟、吞吐量、待处理文件数"""
+    watcher = app_state.get('watcher')
+    if watcher is None:
+        return {"watch": False, "indexed_chunks": len(app_state.get('txtChunks') or [])}
+    return {"watch": True, **watcher.metrics()}
+
+@app.get("/generator/pool", summary="生成器连接池状态")
+async def generator_pool():
+    """LLM 客户端连接池指标：请求数、并发、失败数、平均耗时、活跃/空闲连接数"""
+    if 'generator' not in app_state:
+        raise HTTPException(status_code=503, detail="系统尚未初始化")
+    return app_state['generator'].pool_stats()
+
+@app.get("/workers", summary="worker 进程内存")
+async def workers():
+    """
+    各 worker 的内存：rss 含共享页，pss 按共享进程数均摊
+    
+    serve.py 多进程模式下索引在 fork 前预加载，worker 的 pss 明显小于 rss 说明索引页仍在共享
+    """
+    worker_pids = app_state.get('worker_pids')
+    if worker_pids is None:
+        return {"mode": "single", "current_pid": os.getpid(), "workers": [memory_info()]}
+    processes = [memory_info(pid) for pid in worker_pids if pid]
+    return {
+        "mode": "prefork",
+        "current_pid": os.getpid(),
+        "worker_id": app_state.get('worker_id'),
+        "master": memory_info(app_state.get('master_pid')),
+        "workers": processes,
+        "total_pss_mb": round(sum(p.get('pss_mb', 0) for p in processes), 1),
+    }
+
+@app.get("/metrics", summary="服务指标")
+async def metrics():
+    """请求合并、生成器连接池、准入控制（队列深度 / 排队耗时 / 拒绝数）、执行池饱和度等运行指标"""
+    return {
+        "coalescing": {**coalescer.stats, "in_flight": coalescer.in_flight()},
+        "generator_pool": app_state['generator'].pool_stats() if 'generator' in app_state else None,
+        "admission": app_state['admission'].metrics() if 'admission' in app_state else None,
+        "executors": {name: pool.metrics() for name, pool in app_state.get('executors', {}).items()},
+        "query_cache": app_state['retriever'].cache_stats() if 'retriever' in app_state else None,
+        "process": {"worker_id": app_state.get('worker_id'), **memory_info()},
+    }
+
 @app.get("/config", summary="获取系统配置")
 async def get_config():
     """获取当前系统配置信息"""
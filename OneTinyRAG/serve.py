@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多进程部署入口（生产模式）
+    1. 主进程加载配置、构建索引 / chunk 列表 / BM25（只做一次），随后 gc.freeze() 并绑定监听端口
+    2. fork 出 N 个 uvicorn worker 共享同一个监听 socket，预加载的数据按写时复制共享
+    3. 生成器、连接池、执行池等持有线程或连接的组件在各 worker 的 lifespan 中创建
+    4. worker 异常退出时主进程重新 fork；SIGINT / SIGTERM 时通知所有 worker 优雅退出
+    5. 各 worker 的 RSS / PSS 通过 GET /workers 查看
+用法:
+    python serve.py --workers 4 --port 8000
+    python serve.py --workers 8 --threads 1 --config Config/config_hybrid.json
+"""
+
+import os
+import sys
+import gc
+import time
+import signal
+import socket
+import logging
+import argparse
+from multiprocessing import Array
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+import uvicorn
+from api_server import app, app_state, build_index_state, load_config
+from Tools.ProcessStats import memory_info
+
+logger = logging.getLogger("serve")
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def limit_threads(threads: int) -> None:
+    """每个 worker 限制 torch / faiss 的计算线程数，吞吐量靠进程数扩展，避免 N 个进程争抢核心"""
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+    if "faiss" in sys.modules:
+        sys.modules["faiss"].omp_set_num_threads(threads)
+
+
+def run_worker(sock: socket.socket, worker_id: int, args) -> None:
+    # 独立进程组：终端 Ctrl-C 只发给主进程，由主进程统一转发 SIGTERM，避免 worker 收到两次信号被强制退出
+    os.setpgrp()
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    limit_threads(args.threads)
+    app_state['worker_id'] = worker_id
+    config = uvicorn.Config(app, log_level=args.log_level, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OneTinyRAG 多进程服务")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=1, help="每个 worker 的 torch / faiss 计算线程数")
+    parser.add_argument("--config", default=None, help="配置文件路径，默认 Config/config7.json")
+    parser.add_argument("--log_level", default="info")
+    args = parser.parse_args()
+
+    # 预加载：索引、chunk 列表与 BM25 在主进程构建一次；watch 模式不支持多进程
+    start = time.time()
+    app_state.update(build_index_state(load_config(args.config), allow_watch=False))
+    # 各 worker 的 pid 放在共享内存中，任一 worker 都能汇报全部 worker 的内存
+    worker_pids = Array('i', args.workers, lock=False)
+    app_state['worker_pids'] = worker_pids
+    app_state['master_pid'] = os.getpid()
+    # 预加载对象移入永久代：worker 中的 GC 不再遍历它们，避免 GC 改写对象头导致整页被复制（引用计数的改写无法避免）
+    gc.collect()
+    gc.freeze()
+    logger.warning(f"预加载完成，耗时 {time.time() - start:.1f}s，主进程内存: {memory_info()}")
+
+    sock = bind_socket(args.host, args.port)
+
+    def spawn(worker_id: int) -> int:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(sock, worker_id, args)
+            finally:
+                os._exit(0)
+        worker_pids[worker_id] = pid
+        return pid
+
+    workers = {spawn(worker_id): worker_id for worker_id in range(args.workers)}
+    logger.warning(f"已启动 {args.workers} 个 worker，监听 {args.host}:{args.port}")
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        worker_id = workers.pop(pid, None)
+        if worker_id is None or stopping:
+            continue
+        logger.warning(f"worker {worker_id} (pid {pid}) 异常退出，状态 {status}，重新启动")
+        time.sleep(1)
+        workers[spawn(worker_id)] = worker_id
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
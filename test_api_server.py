@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+服务端测试：SingleFlight 请求合并、批量生成与 /query/batch
+"""
+
+import os
+import sys
+import asyncio
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, 'OneTinyRAG'))
+
+from Tools.SingleFlight import SingleFlight
+from Generator.ClientPool import PoolMetrics
+from Generator.ContextPacker import ContextPacker
+from Generator.Generate import PackingMixin
+from Generator.Generator import Generator
+from Mappers.Mappers import GENERATOR_MAPPING
+
+
+def test_single_flight_runs_once_for_concurrent_calls():
+    """N 个相同 key 的并发 do() 只执行一次 func，结果共享，完成后移除 key"""
+    async def main():
+        flight, calls = SingleFlight(), []
+
+        async def func():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"answer": "ok"}
+
+        results = await asyncio.gather(*(flight.do("key", func) for _ in range(10)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats["executions"] == 1 and flight.stats["coalesced"] == 9
+    assert flight.in_flight()["calls"] == 0
+
+
+def test_single_flight_exception_reaches_every_waiter():
+    """func 的异常传给所有等待者并清除 key，下一次调用重新执行"""
+    async def main():
+        flight, calls = SingleFlight(), []
+
+        async def failing():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(*(flight.do("key", failing) for _ in range(5)), return_exceptions=True)
+        in_flight = flight.in_flight()["calls"]
+
+        async def ok():
+            calls.append(1)
+            return "ok"
+
+        return results, in_flight, await flight.do("key", ok), calls
+
+    results, in_flight, retried, calls = asyncio.run(main())
+    assert all(isinstance(result, ValueError) and str(result) == "boom" for result in results)
+    assert in_flight == 0
+    assert retried == "ok" and len(calls) == 2
+
+
+def test_single_flight_cancelled_waiter_does_not_cancel_task():
+    """某个等待者被取消（客户端断开），共享任务继续执行，其余等待者照常拿到结果"""
+    async def main():
+        flight, finished = SingleFlight(), []
+
+        async def func():
+            await asyncio.sleep(0.1)
+            finished.append(1)
+            return "ok"
+
+        first = asyncio.ensure_future(flight.do("key", func))
+        second = asyncio.ensure_future(flight.do("key", func))
+        await asyncio.sleep(0.02)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second, finished
+
+    result, finished = asyncio.run(main())
+    assert result == "ok"
+    assert finished == [1]
+
+
+def test_single_flight_late_stream_subscriber_replays_tokens():
+    """迟到的流式订阅者先回放已产生的 token，再接收后续 token；生产者只运行一次"""
+    async def main():
+        flight, gate, runs = SingleFlight(), asyncio.Event(), []
+
+        async def producer():
+            runs.append(1)
+            for token in ("西红柿", "炒", "蛋"):
+                if token == "蛋":
+                    await gate.wait()
+                yield token
+
+        first = flight.stream("key", producer)
+        head = [await first.__anext__(), await first.__anext__()]
+        late = flight.stream("key", producer)
+        gate.set()
+        rest = [token async for token in first]
+        replayed = [token async for token in late]
+        return flight, runs, head + rest, replayed
+
+    flight, runs, first_tokens, late_tokens = asyncio.run(main())
+    assert first_tokens == ["西红柿", "炒", "蛋"]
+    assert late_tokens == ["西红柿", "炒", "蛋"]
+    assert runs == [1]
+    assert flight.stats["stream_executions"] == 1 and flight.stats["stream_coalesced"] == 1
+    assert flight.in_flight()["streams"] == 0
+
+
+class _StubGenerator(PackingMixin):
+    """替身生成器：问题 "名称#秒数" 按秒数延迟后返回，名称含“失败”时抛出"""
+
+    def __init__(self, context: dict = None):
+        super().__init__()
+        self.packer = ContextPacker(**(context or {}))
+        self.metrics = PoolMetrics()
+
+    async def agenerate(self, query, retrievalChunks) -> str:
+        name, _, delay = query.partition("#")
+        await asyncio.sleep(float(delay or 0))
+        if "失败" in name:
+            raise ValueError(f"{name} 生成失败")
+        return f"答案:{query}"
+
+
+@pytest.fixture
+def stub_generator(monkeypatch):
+    """通过配置（GENERATOR_MAPPING）加载替身生成器"""
+    GENERATOR_MAPPING.register("StubGenerator", f"{__name__}:_StubGenerator")
+    return Generator({"generator": {"type": "StubGenerator", "params": {}}})
+
+
+BATCH_QUERIES = ["慢#0.3", "中#0.15", "失败#0", "快#0.05"]
+
+
+def _retrieved(queries, top_k):
+    return [[[{"page_content": f"片段:{query}", "metadata": {"source": "stub"}}], None] for query in queries]
+
+
+def test_generate_batch_aligns_results_with_queries(stub_generator):
+    """同步批量生成：结果与 queries 对齐，失败项为异常对象"""
+    results = stub_generator.generate_batch(BATCH_QUERIES, _retrieved(BATCH_QUERIES, 1), concurrency=4)
+    assert results[0] == "答案:慢#0.3" and results[3] == "答案:快#0.05"
+    assert isinstance(results[2], ValueError)
+
+
+def test_generate_batch_rejects_running_event_loop(stub_generator):
+    """在运行中的事件循环里调用同步版本时明确提示改用 agenerate_batch"""
+    async def main():
+        with pytest.raises(RuntimeError, match="agenerate_batch"):
+            stub_generator.generate_batch(BATCH_QUERIES, _retrieved(BATCH_QUERIES, 1))
+        return [item async for item in stub_generator.agenerate_batch(BATCH_QUERIES, _retrieved(BATCH_QUERIES, 1))]
+
+    assert sorted(i for i, _, _ in asyncio.run(main())) == [0, 1, 2, 3]
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path, stub_generator):
+    """不启动 lifespan（不建索引），app_state 中只放替身生成器与准入控制"""
+    pytest.importorskip("httpx")
+    monkeypatch.chdir(tmp_path)  # api_server 导入时在当前目录创建 rag_api.log
+    api_server = pytest.importorskip("api_server")
+    from fastapi.testclient import TestClient
+    from Tools.Admission import AdmissionController
+
+    monkeypatch.setitem(api_server.app_state, "generator", stub_generator)
+    monkeypatch.setitem(api_server.app_state, "retriever", object())
+    monkeypatch.setitem(api_server.app_state, "admission", AdmissionController(max_concurrency=4))
+    monkeypatch.delitem(api_server.app_state, "executors", raising=False)
+    monkeypatch.setattr(api_server, "retrieve_chunks_batch", _retrieved)
+    return api_server, TestClient(api_server.app)
+
+
+def _ndjson(response):
+    import json
+    return [json.loads(line) for line in response.text.splitlines() if line.strip()]
+
+
+def test_query_batch_streams_in_completion_order(api):
+    """/query/batch 按完成顺序逐行输出，index 对应原始下标，单条失败只影响该行，最后一行为汇总"""
+    _, client = api
+    response = client.post("/query/batch", json={"queries": BATCH_QUERIES, "batch_size": 2, "concurrency": 4})
+    assert response.status_code == 200
+    lines = _ndjson(response)
+    items, summary = lines[:-1], lines[-1]
+
+    assert [line["index"] for line in items] == [2, 3, 1, 0]
+    for line in items:
+        assert line["query"] == BATCH_QUERIES[line["index"]]
+        assert line["retrieved_chunks"][0]["content"] == f"片段:{line['query']}"
+    failed = [line for line in items if "error" in line]
+    assert [line["index"] for line in failed] == [2]
+    assert failed[0]["error"].startswith("生成失败")
+    assert all(line["answer"] == f"答案:{line['query']}" for line in items if "error" not in line)
+    assert summary["done"] and summary["total"] == 4 and summary["failed"] == 1
+
+
+def test_query_batch_reports_retrieval_count_mismatch(api, monkeypatch):
+    """检索返回的结果数与问题数不一致时整批报错，而不是让响应一直等待"""
+    api_server, client = api
+    monkeypatch.setattr(api_server, "retrieve_chunks_batch", lambda queries, top_k: _retrieved(queries[1:], top_k))
+    lines = _ndjson(client.post("/query/batch", json={"queries": BATCH_QUERIES, "batch_size": 4}))
+    assert sorted(line["index"] for line in lines[:-1]) == [0, 1, 2, 3]
+    assert all(line["error"].startswith("检索失败") for line in lines[:-1])
+    assert lines[-1]["failed"] == 4
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Ollama 生成器测试：使用 Tools/Benchmark.py 中的本地假 Ollama 接口（快 / 慢 / 故障）
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, 'OneTinyRAG'))
+
+pytest.importorskip("langchain_ollama")
+
+from Generator.Generate import DeepseekOllamaGenerator, RoutedOllamaGenerator
+from Tools.Benchmark import _start_fake_server
+
+QUERY, CHUNKS = "西红柿炒蛋怎么做？", ["参考片段"]
+
+
+@pytest.fixture
+def servers():
+    """快 / 慢 / 故障三个假后端，测试结束后关闭"""
+    started = {
+        "fast": _start_fake_server(0.01),
+        "slow": _start_fake_server(1.0),
+        "broken": _start_fake_server(0.01),
+    }
+    started["broken"].fail = True
+    for server in started.values():
+        server.requests = 0
+    yield started
+    for server in started.values():
+        server.shutdown()
+
+
+def url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def backend(generator, server):
+    return next(b for b in generator.router.backends if b.url == url(server))
+
+
+def test_failing_backend_ejected_then_readmitted(servers):
+    """连续失败达到阈值即摘除；退避到期后放行试探请求，成功即恢复"""
+    broken = servers["broken"]
+    generator = RoutedOllamaGenerator([url(broken)], model="fake", max_attempts=1,
+                                      max_failures=1, eject_seconds=0.3)
+    with pytest.raises(ValueError):
+        generator.generate(QUERY, CHUNKS)
+    state = backend(generator, broken)
+    assert state.ejections == 1
+    assert not state.available(time.monotonic())
+
+    broken.fail = False
+    time.sleep(0.35)
+    assert state.available(time.monotonic())
+    assert generator.generate(QUERY, CHUNKS) == "ok"
+    assert state.consecutive_failures == 0 and state.strikes == 0
+    assert generator.router.snapshot()["backends"][0]["healthy"]
+    generator.close()
+
+
+def test_failed_request_retried_on_another_backend(servers):
+    """首选后端失败后换另一个后端重试，请求本身成功"""
+    generator = RoutedOllamaGenerator([url(servers["broken"]), url(servers["fast"])], model="fake",
+                                      max_attempts=2, max_failures=100)
+    answers = [generator.generate(QUERY, CHUNKS) for _ in range(4)]
+    assert answers == ["ok"] * 4
+    assert servers["broken"].requests >= 1
+    assert generator.router.stats["retries"] == servers["broken"].requests
+    assert generator.router.stats["exhausted"] == 0
+    generator.close()
+
+
+def test_hedge_fires_and_wins_when_primary_slow(servers):
+    """首选后端（慢）hedge_after 内未返回时向快后端对冲，取先返回者"""
+    generator = RoutedOllamaGenerator([url(servers["slow"]), url(servers["fast"])], model="fake",
+                                      max_attempts=2, hedge_after=0.1, hedge_budget=1.0)
+
+    async def main():
+        start = time.perf_counter()
+        answer = await generator.agenerate(QUERY, CHUNKS)
+        return answer, time.perf_counter() - start
+
+    answer, elapsed = asyncio.run(main())
+    assert answer == "ok"
+    assert elapsed < 0.8  # 不必等待慢后端的 1 秒
+    assert servers["slow"].requests == 1 and servers["fast"].requests == 1
+    assert generator.router.stats["hedges"] == 1
+    assert generator.router.stats["hedge_wins"] == 1
+    generator.close()
+
+
+def test_exhausted_when_every_backend_ejected(servers):
+    """全部后端被摘除：试探请求同样失败时重试用尽并抛出"""
+    second = _start_fake_server(0.01)
+    second.fail = True
+    try:
+        generator = RoutedOllamaGenerator([url(servers["broken"]), url(second)], model="fake",
+                                          max_attempts=2, max_failures=1, eject_seconds=30)
+        with pytest.raises(ValueError):
+            generator.generate(QUERY, CHUNKS)
+        now = time.monotonic()
+        assert not any(b.available(now) for b in generator.router.backends)
+        with pytest.raises(ValueError):
+            generator.generate(QUERY, CHUNKS)
+        assert generator.router.stats["exhausted"] == 2
+        generator.close()
+    finally:
+        second.shutdown()
+
+
+def test_exhausted_without_any_backend_raises_runtime_error(servers):
+    """一个后端都没能选出时给出明确的错误，而不是 raise None"""
+    generator = RoutedOllamaGenerator([url(servers["fast"])], model="fake")
+    error = generator._exhausted(None)
+    assert isinstance(error, RuntimeError)
+    assert "No backend available" in str(error)
+    generator.router.acquire = lambda exclude=(): None
+    with pytest.raises(ValueError, match="No backend available"):
+        generator.generate(QUERY, CHUNKS)
+    generator.close()
+
+
+def test_ollama_generator_owns_and_closes_connection_pools(servers):
+    """同步 / 异步请求各自复用生成器持有的连接池，close / aclose 直接关闭它们"""
+    generator = DeepseekOllamaGenerator(model="fake", base_url=url(servers["fast"]))
+
+    async def run_async():
+        answer = await generator.agenerate(QUERY, CHUNKS)
+        stats = generator.pool_stats()
+        await generator.aclose()
+        return answer, stats
+
+    assert generator.generate(QUERY, CHUNKS) == "ok"
+    answer, stats = asyncio.run(run_async())
+    assert answer == "ok"
+    assert stats["connections"]["open"] == 1 and stats["async_connections"]["open"] == 1
+    generator.close()
+    assert generator.pool_stats()["connections"]["open"] == 0
+    assert generator.pool_stats()["async_connections"]["open"] == 0
+
+
+def test_ollama_generator_errors_name_the_generator(servers):
+    generator = DeepseekOllamaGenerator(model="fake", base_url=url(servers["broken"]))
+    with pytest.raises(ValueError, match="^DeepseekOllamaGenerator_retrieval error"):
+        generator.generate(QUERY, CHUNKS)
+    with pytest.raises(ValueError, match="^DeepseekOllamaGenerator_retrieval error"):
+        asyncio.run(generator.agenerate(QUERY, CHUNKS))
+    generator.close()
+
+
+def test_routed_generator_closes_every_backend_pool(servers):
+    generator = RoutedOllamaGenerator([url(servers["fast"]), url(servers["slow"])], model="fake")
+    assert generator.generate(QUERY, CHUNKS) == "ok"
+    assert sum(info["connections"]["open"] for info in generator.pool_stats()["routing"]["backends"]) == 1
+    generator.close()
+    asyncio.run(generator.aclose())
+    for info in generator.pool_stats()["routing"]["backends"]:
+        assert info["connections"]["open"] == 0 and info["async_connections"]["open"] == 0
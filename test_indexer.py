@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+索引流水线测试：DataProcessor -> Chunker
+"""
+
+import os
+import sys
+import json
+
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, 'OneTinyRAG'))
+
+from Indexer.Indexer import Indexer
+from Mappers.Mappers import CHUNER_MAPPING, EMBEDDER_MAPPING
+from Indexer.Watcher import LiveIndex
+from Indexer.Deduplicator import ChunkDeduplicator
+from Indexer.EmbeddingPool import EmbeddingPool, encode_texts, plan_batches
+from Indexer.ParseCache import ParseCache
+from Indexer.DataProcessor import DataProcessor, JsonProcessor
+from langchain.docstore.document import Document
+from Indexer.Chunker import MetaDataChunker
+
+SAMPLE_TEXT = "\n".join(
+    f"第{i}段：西红柿炒蛋先把鸡蛋打散炒熟盛出，再炒西红柿出汁后倒回鸡蛋翻炒。Step {i} keeps the eggs soft."
+    for i in range(40)
+) + "\n最后一段结尾标记END_MARKER。"
+
+
+# 可选分块器依赖的库，未安装时跳过
+OPTIONAL_DEPENDENCIES = {
+    "token": "tiktoken",
+    "SemanticSpacyChunker": "spacy",
+    "EmbedderTokenChunker": "transformers",
+}
+
+
+class _ZeroEmbedder:
+    """全零向量的替身 docEmbedder，通过 EMBEDDER_MAPPING 按配置加载"""
+
+    def vectors(self, chunks):
+        return np.zeros((len(chunks), 4), dtype=np.float32)
+
+
+@pytest.fixture
+def stream_indexer():
+    """按最小配置构造 Indexer：指定分块器 + 替身 docEmbedder，txt 按 stream=True 解析成多个小段"""
+    EMBEDDER_MAPPING.register("ZeroEmbedder", f"{__name__}:_ZeroEmbedder")
+    CHUNER_MAPPING.register("PaperChunker", "Indexer.Chunker:PaperChunker")
+
+    def build(chunker_type: str, params: dict) -> Indexer:
+        if chunker_type in OPTIONAL_DEPENDENCIES:
+            pytest.importorskip(OPTIONAL_DEPENDENCIES[chunker_type])
+        config = {
+            "chunker": {"type": chunker_type, "params": params},
+            "embedder": {"docEmbedder": {"type": "ZeroEmbedder"}},
+            "processors": {".txt": {"init": {"block_size": 256}, "process": {"stream": True}}},
+        }
+        try:
+            return Indexer(config)
+        except OSError as e:
+            pytest.skip(f"{chunker_type} 的模型 / tokenizer 不可用: {e}")
+
+    return build
+
+
+def _text(chunk) -> str:
+    if isinstance(chunk, str):
+        return chunk
+    if hasattr(chunk, "page_content"):
+        return chunk.page_content
+    return chunk["page_content"]
+
+
+CHUNKER_CONFIGS = [
+    ("recursive", {"chunk_size": 128, "chunk_overlap": 16}),
+    ("recursive", {"chunk_size": 128, "chunk_overlap": 16, "span_mode": True}),
+    ("PaperChunker", {"chunk_size": 128, "chunk_overlap": 16}),
+    ("MetaDataChunker", {"chunk_size": 64}),
+    ("MetaDataChunker", {"chunk_size": 64, "span_mode": True}),
+    ("SemanticNLTKChunker", {"chunk_size": 64, "chunk_overlap": 8}),
+    ("token", {"chunk_size": 64, "chunk_overlap": 8}),
+    ("SemanticSpacyChunker", {"chunk_size": 64, "chunk_overlap": 8}),
+    ("EmbedderTokenChunker", {"max_tokens": 64, "batch_size": 2}),
+]
+
+
+@pytest.mark.parametrize("chunker_type, params", CHUNKER_CONFIGS)
+def test_stream_file_through_each_chunker(tmp_path, stream_indexer, chunker_type, params):
+    """stream=True 产出的生成器经过任意分块器都不丢内容：每一段按原顺序出现，结尾标记也在"""
+    path = tmp_path / "sample.txt"
+    path.write_text(SAMPLE_TEXT, encoding="utf-8")
+    indexer = stream_indexer(chunker_type, params)
+
+    datas = indexer._get_data_processor(str(path))
+    assert not isinstance(datas[0][0], (str, list))  # 确实是流式结果
+    chunks = indexer._chunk_datas(datas)
+
+    texts = [_text(chunk) for chunk in chunks]
+    assert texts
+    # 分块器可能去掉空白，按无空白文本逐个查找，带 overlap 时重复内容不影响顺序判断
+    joined = "".join("".join(text.split()) for text in texts)
+    pos = 0
+    for marker in [f"第{i}段" for i in range(40)] + ["END_MARKER"]:
+        found = joined.find(marker, pos)
+        assert found >= 0, f"{marker} 缺失或顺序错乱"
+        pos = found + len(marker)
+    for line in SAMPLE_TEXT.split("\n"):
+        assert "".join(line.split()) in joined
+
+
+def test_metadata_chunker_keeps_chinese_without_final_punctuation():
+    """中文文本按 token 计数：超过 chunk_size 的无结尾标点短文档不会被当作残句丢弃"""
+    chunker = MetaDataChunker(chunk_size=16)
+    text = "西红柿炒蛋先把鸡蛋打散炒熟盛出再炒西红柿出汁后倒回鸡蛋翻炒均匀"
+    chunks = chunker.chunk([text])
+    assert "".join(chunk["page_content"] for chunk in chunks) == text
+    assert all(chunker.check(chunk) for chunk in chunks)
+    # 不超过 chunk_size 个 token 且没有结尾标点的残句仍然跳过
+    assert chunker.chunk(["西红柿炒蛋的做法"]) == []
+    assert chunker.chunk(["西红柿炒蛋的做法。"])
+
+
+class _RowIndex:
+    """只记录行数的向量索引替身（FAISS 的 add / remove_ids 接口）"""
+
+    def __init__(self):
+        self.ntotal = 0
+
+    def add(self, vectors):
+        self.ntotal += len(vectors)
+
+    def remove_ids(self, ids):
+        self.ntotal -= len(ids)
+
+
+def test_reindex_releases_document_buffer(tmp_path, stream_indexer):
+    """同一文件反复重新入库，区间 chunk 的共享缓冲区不增长，删除文件后原文全部释放"""
+    indexer = stream_indexer("MetaDataChunker", {"chunk_size": 16, "span_mode": True})
+    chunker = indexer.Chunker
+    live = LiveIndex(indexer)
+    live.index = _RowIndex()
+
+    path = tmp_path / "sample.txt"
+    path.write_text(SAMPLE_TEXT, encoding="utf-8")
+    live.apply([str(path)], [])
+    size = len(chunker.buffer)
+    assert size > 0
+    for _ in range(3):
+        live.apply([str(path)], [])
+        assert len(chunker.buffer) == size
+        assert live.index.ntotal == len(live.chunks)
+    assert "END_MARKER" in "".join(chunk.page_content for chunk in live.chunks)
+
+    live.apply([], [str(path)])
+    assert len(chunker.buffer) == 0
+    assert live.chunks == []
+
+
+def test_dedup_compares_all_bucket_members():
+    """三个相近的 chunk，只有后两个足够相似：首个不像其余两个时，后两个仍要合并"""
+    base = "西红柿炒蛋先把鸡蛋打散炒熟盛出，再炒西红柿出汁后倒回鸡蛋翻炒均匀，最后加盐和少许糖调味即可出锅装盘。"
+    texts = [
+        base[:40] + "青椒肉丝要先腌制",
+        base,
+        base.replace("少许糖", "少量糖"),
+    ]
+    # 小签名 + 固定种子：三者落在同一个 LSH 桶，且首个与后两个的相似度低于阈值
+    deduplicator = ChunkDeduplicator(threshold=0.7, num_perm=16, bands=8, seed=17)
+    signatures = [deduplicator._minhash(deduplicator._normalize(text)) for text in texts]
+    assert (signatures[0] == signatures[1]).mean() < 0.7
+    assert (signatures[0] == signatures[2]).mean() < 0.7
+    assert (signatures[1] == signatures[2]).mean() >= 0.7
+
+    chunks = deduplicator.dedup([{"page_content": text, "metadata": {"page": i + 1}} for i, text in enumerate(texts)])
+    assert [chunk["page_content"] for chunk in chunks] == texts[:2]
+    assert chunks[1]["metadata"]["duplicate_sources"] == [{"page": 2}, {"page": 3}]
+
+
+class _StubEncoder:
+    """确定性的替身编码器：向量只取决于文本本身，与 batch 组成无关；token 长度即字符数"""
+    dimension = 8
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def tokenizer(self, texts, add_special_tokens=True, truncation=False, max_length=None):
+        return {"input_ids": [list(text) for text in texts]}
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=True, convert_to_numpy=True,
+               show_progress_bar=False):
+        vectors = np.array([[len(text), *(ord(ch) for ch in (text * self.dimension)[:self.dimension - 1])]
+                            for text in texts], dtype=np.float64)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _stub_loader(model_name, torch_threads, backend_kwargs):
+    """spawn 出的 worker 中加载替身编码器（模块级函数，可 pickle）"""
+    return _StubEncoder()
+
+
+EMBED_TEXTS = [f"第{i}段" + "西红柿炒蛋" * (i % 7 + 1) for i in range(50)]
+
+
+@pytest.fixture(scope="module")
+def embedding_pool():
+    pool = EmbeddingPool("stub", num_workers=3, torch_threads=1, loader=_stub_loader)
+    yield pool
+    pool.close()
+
+
+@pytest.mark.parametrize("max_batch_tokens", [None, 64])
+def test_embedding_pool_matches_single_process(embedding_pool, max_batch_tokens):
+    """多进程 + 共享内存的输出与单进程编码逐行一致（顺序与数值）"""
+    model = _StubEncoder()
+    expected = encode_texts(model, EMBED_TEXTS, batch_size=4, max_batch_tokens=max_batch_tokens)
+    pooled = encode_texts(model, EMBED_TEXTS, batch_size=4, max_batch_tokens=max_batch_tokens, pool=embedding_pool)
+    assert pooled.shape == (len(EMBED_TEXTS), _StubEncoder.dimension)
+    np.testing.assert_array_equal(pooled, expected)
+    np.testing.assert_array_equal(expected, model.encode(EMBED_TEXTS).astype(np.float32))
+
+
+def test_embedding_pool_fewer_chunks_than_workers(embedding_pool):
+    """chunk 数少于 worker 数时共享内存路径同样正确，空输入返回空矩阵"""
+    model = _StubEncoder()
+    texts = EMBED_TEXTS[:2]
+    pooled = encode_texts(model, texts, batch_size=1, pool=embedding_pool)
+    np.testing.assert_array_equal(pooled, encode_texts(model, texts, batch_size=1))
+    assert encode_texts(model, [], pool=embedding_pool).shape == (0, _StubEncoder.dimension)
+
+
+def test_plan_batches_caps_tokens_and_items():
+    """每个 batch 同时受 padding 后 token 上限与 batch_size 条数上限约束，且覆盖全部下标"""
+    lengths = [3] * 40 + [50, 9, 20, 1]
+    order, batches = plan_batches(lengths, max_batch_tokens=120, batch_size=8)
+    assert sorted(order) == list(range(len(lengths)))
+    assert [end - start for start, end in batches][0] == 8
+    assert batches[0][0] == 0 and batches[-1][1] == len(lengths)
+    for (start, end), (next_start, _) in zip(batches, batches[1:]):
+        assert end == next_start
+    for start, end in batches:
+        assert end - start <= 8
+        assert end - start == 1 or max(lengths[i] for i in order[start:end]) * (end - start) <= 120
+
+
+def test_encode_texts_restores_input_order():
+    """开启长度分桶后按长度重排编码，输出仍与输入顺序逐行对应"""
+    seen, sizes = [], []
+
+    class _RecordingEncoder(_StubEncoder):
+        def encode(self, texts, **kwargs):
+            seen.extend(texts)
+            sizes.append(len(texts))
+            return super().encode(texts, **kwargs)
+
+    model = _RecordingEncoder()
+    texts = list(reversed(EMBED_TEXTS))
+    embeddings = encode_texts(model, texts, batch_size=4, max_batch_tokens=64)
+    # 确实按长度重排过，且每批不超过 batch_size 条
+    assert seen != texts and sorted(seen) == sorted(texts)
+    assert [len(t) for t in seen] == sorted(len(t) for t in texts)
+    assert max(sizes) <= 4
+    np.testing.assert_array_equal(embeddings, _StubEncoder().encode(texts).astype(np.float32))
+
+
+class _CountingProcessor(DataProcessor):
+    """记录调用次数的 DataProcessor：整篇文本，或 stream=True 时逐行产出 Document"""
+    calls = 0
+
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+
+    def process(self, file_path: str, stream: bool = False):
+        type(self).calls += 1
+        with open(file_path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        if not stream:
+            return self.prefix + "\n".join(lines)
+        return (Document(page_content=self.prefix + line, metadata={"source": file_path, "line": i})
+                for i, line in enumerate(lines))
+
+
+@pytest.fixture
+def cache_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(_CountingProcessor, "calls", 0)
+    path = tmp_path / "doc.txt"
+    path.write_text("第一行\n第二行\n第三行", encoding="utf-8")
+    return ParseCache(str(tmp_path / "cache")), str(path)
+
+
+def test_parse_cache_hit_on_unchanged_file(cache_file):
+    """文件未变化时命中缓存，不再调用 processor；重新打开缓存目录后同样命中"""
+    cache, path = cache_file
+    first = cache.process(_CountingProcessor, path)
+    assert cache.process(_CountingProcessor, path) == first
+    assert _CountingProcessor.calls == 1
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+    cache.flush()
+    assert ParseCache(cache.cache_dir).process(_CountingProcessor, path) == first
+    assert _CountingProcessor.calls == 1
+
+
+def test_parse_cache_miss_after_content_args_or_version_change(cache_file, monkeypatch):
+    """内容、processor 参数或 DataProcessor.version 变化都会重新解析"""
+    cache, path = cache_file
+    cache.process(_CountingProcessor, path)
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("改过的内容，长度也不同")
+    assert cache.process(_CountingProcessor, path) == "改过的内容，长度也不同"
+    assert _CountingProcessor.calls == 2
+    assert cache.summary()["entries"] == 1  # 同一文件同一参数的旧结果被淘汰
+
+    assert cache.process(_CountingProcessor, path, init_args={"prefix": "> "}).startswith("> ")
+    assert _CountingProcessor.calls == 3
+
+    monkeypatch.setattr(_CountingProcessor, "version", 2)
+    cache.process(_CountingProcessor, path)
+    assert _CountingProcessor.calls == 4
+    assert cache.stats["hits"] == 0
+
+
+def test_parse_cache_stream_round_trip(cache_file):
+    """stream=True：边产出边写 .jsonl.gz，命中时逐行解码出相同的 Document"""
+    cache, path = cache_file
+    produced = list(cache.process(_CountingProcessor, path, process_args={"stream": True}))
+    blobs = [name for name in os.listdir(cache.cache_dir) if name.endswith(".jsonl.gz")]
+    assert len(blobs) == 1
+
+    replayed = cache.process(_CountingProcessor, path, process_args={"stream": True})
+    assert not isinstance(replayed, list)
+    replayed = list(replayed)
+    assert _CountingProcessor.calls == 1
+    assert [(doc.page_content, doc.metadata) for doc in replayed] == \
+        [(doc.page_content, doc.metadata) for doc in produced]
+    assert [doc.page_content for doc in replayed] == ["第一行", "第二行", "第三行"]
+
+
+def test_parse_cache_abandoned_stream_leaves_nothing(cache_file):
+    """流式结果中途停止消费：不登记条目，也不留下半个缓存文件或临时文件"""
+    cache, path = cache_file
+    stream = cache.process(_CountingProcessor, path, process_args={"stream": True})
+    next(stream)
+    stream.close()
+    assert cache.summary()["entries"] == 0
+    assert os.listdir(cache.cache_dir) == []
+    # 下一次完整消费后正常写入
+    assert len(list(cache.process(_CountingProcessor, path, process_args={"stream": True}))) == 3
+    assert cache.summary()["entries"] == 1
+
+
+def _records(n: int, abstract_size: int = 20, start: int = 0):
+    return [{"title": f"标题{i}", "abstract": f"摘要{i}" + "蛋" * abstract_size} for i in range(start, start + n)]
+
+
+def _write(path, content: str) -> str:
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+def _titles(processor: JsonProcessor, file_path: str):
+    return [doc.metadata["title"] for doc in processor.process(file_path)]
+
+
+@pytest.mark.parametrize("layout", ["array", "pretty_array", "concatenated", "jsonl"])
+def test_json_processor_layouts(tmp_path, layout):
+    """顶层数组、首尾相接的对象与 JSONL 解析出相同的记录"""
+    records = _records(5)
+    content = {
+        "array": json.dumps(records, ensure_ascii=False),
+        "pretty_array": json.dumps(records, ensure_ascii=False, indent=2),
+        "concatenated": "".join(json.dumps(r, ensure_ascii=False) for r in records),
+        "jsonl": "\n".join(json.dumps(r, ensure_ascii=False) for r in records) + "\n",
+    }[layout]
+    file_path = _write(tmp_path / "data.json", content)
+    assert JsonProcessor._is_jsonl(file_path) == (layout in ("jsonl", "array"))
+    assert _titles(JsonProcessor(block_size=64), file_path) == [r["title"] for r in records]
+
+
+def test_json_processor_jsonl_skips_bad_line(tmp_path):
+    """JSONL 中的坏行单独跳过，其余记录照常解析"""
+    lines = [json.dumps(r, ensure_ascii=False) for r in _records(3)]
+    lines.insert(1, '{"title": 坏记录}')
+    file_path = _write(tmp_path / "data.jsonl", "\n".join(lines))
+    assert _titles(JsonProcessor(), file_path) == ["标题0", "标题1", "标题2"]
+
+
+def test_json_processor_record_larger_than_block(tmp_path):
+    """单条记录远大于 block_size 时加倍读取量直到解析成功"""
+    records = _records(1, abstract_size=10) + _records(1, abstract_size=5000, start=1) + _records(1, start=2)
+    file_path = _write(tmp_path / "data.json", "\n".join(json.dumps(r, ensure_ascii=False, indent=1) for r in records))
+    documents = JsonProcessor(block_size=16).process(file_path)
+    assert [doc.metadata["title"] for doc in documents] == ["标题0", "标题1", "标题2"]
+    assert len(documents[1].page_content) == len(records[1]["abstract"])
+
+
+def test_json_processor_max_record_size(tmp_path, capsys):
+    """记录超过 max_record_size 视为格式错误并停止，缓冲区不会无限增长"""
+    records = _records(1) + _records(1, abstract_size=5000, start=1) + _records(1, start=2)
+    file_path = _write(tmp_path / "data.json", "".join(json.dumps(r, ensure_ascii=False) for r in records))
+    assert _titles(JsonProcessor(block_size=16, max_record_size=256), file_path) == ["标题0"]
+    assert "解析错误" in capsys.readouterr().out
+
+
+def test_json_processor_jsonl_sniff_then_other_layout(tmp_path):
+    """开头 64 KiB 都是 JSONL、之后出现多行缩进 / 首尾相接的对象时，后续记录不丢失"""
+    head = _records(800)
+    tail = _records(2, start=800)
+    more = _records(2, start=802)
+    content = "\n".join(json.dumps(r, ensure_ascii=False) for r in head) + "\n" \
+        + json.dumps(tail[0], ensure_ascii=False, indent=2) + "\n" \
+        + json.dumps(tail[1], ensure_ascii=False) + "".join(json.dumps(r, ensure_ascii=False) for r in more)
+    file_path = _write(tmp_path / "data.json", content)
+    assert content.encode("utf-8")[:64 * 1024].count(b"\n") < len(head)  # 嗅探范围内全是 JSONL
+    assert JsonProcessor._is_jsonl(file_path)
+    assert _titles(JsonProcessor(), file_path) == [f"标题{i}" for i in range(804)]